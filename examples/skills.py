@@ -6,6 +6,8 @@ from random import random
 
 from tagilmo.utils.vereya_wrapper import MCConnector, RobustObserver
 from tagilmo.utils.mathutils import *
+from tagilmo.utils.block_vocabulary import block_vocabulary
+from tagilmo.utils.grid_rays import marchRays, RayStatus
 
 from examples.goal import *
 
@@ -704,6 +706,7 @@ class GridAnalyzer:
     def __init__(self, rob, target, dist_thresh=1.5): #target=None, yaw=None, pitch=None
         self.dist_thresh = dist_thresh
         self.grid3D = rob.getNearGrid3D(False)
+        self.grid = rob.getNearGridArray(False)
         self.dimX = len(self.grid3D[0][0])
         self.dimZ = len(self.grid3D[0])
         self.dimY = len(self.grid3D)
@@ -760,11 +763,37 @@ class GridAnalyzer:
                 res = r
         return res
 
-    def analyzePath(self, pos):
-        # logging.debug(f"target {self.target},\tpa {self.pa}\tdist {self.dist}\tdp {self.dp}\n")
-        # print(f"target {self.target},\tpa {self.pa}\tdist {self.dist}\tdp {self.dp}\n")
-        DIST_CL = 9
-        self.last_r2 = 0
+    def analyzeLines(self, positions):
+        # analyzeLine for levels -2..2 of every position, all rays are marched at once
+        dx = 0.25 * self.dp[2]
+        dz = 0.25 * self.dp[0]
+        origins = []
+        for pos in positions:
+            origins += [pos[:3], [pos[0] + dx, pos[1], pos[2] - dz], [pos[0] - dx, pos[1], pos[2] + dz]]
+        levels = range(-2, 3)
+        d, status, xf, zf = marchRays(self.grid, self.p0, self.dp, origins, levels,
+                                      self.rob.blockMask(self.rob.passableBlocks),
+                                      self.rob.blockMask(RobustObserver.deadlyBlocks),
+                                      block_vocabulary.id('water'))
+        d, status, xf, zf = d.tolist(), status.tolist(), xf.tolist(), zf.tolist()
+        lines = []
+        for i, pos in enumerate(positions):
+            res = []
+            for l, level in enumerate(levels):
+                best = 3 * i
+                for r in (3 * i + 1, 3 * i + 2):
+                    if (level >= 0 and d[l][r] < d[l][best]) or (level < 0 and d[l][r] > d[l][best]):
+                        best = r
+                st = RayStatus(status[l][best])
+                line = {'d': d[l][best], 'status': st.name.lower()}
+                if st == RayStatus.OBSTACLE:
+                    line['o'] = [xf[l][best], origins[best][1]+level+0.5, zf[l][best]]
+                res.append(line)
+            lines.append(res)
+        return lines
+
+    def earlyDecision(self):
+        # decisions which don't depend on the path
         dy = self.target[1] - self.pa[1]
         EYE_HEIGHT = 1.62
         rd = math.hypot(self.dist, dy-EYE_HEIGHT)
@@ -778,7 +807,19 @@ class GridAnalyzer:
                 return ['mine', 0, [self.pa[0], self.pa[1]+2.5, self.pa[2]]]
         if dy < -0.5 and self.dist < 0.99:
             return ['dig', 0]
-        res = [self.analyzeLine(pos, level-2) for level in range(5)]
+        return None
+
+    def analyzePath(self, pos, res=None):
+        # logging.debug(f"target {self.target},\tpa {self.pa}\tdist {self.dist}\tdp {self.dp}\n")
+        # print(f"target {self.target},\tpa {self.pa}\tdist {self.dist}\tdp {self.dp}\n")
+        # res: lines of the path from analyzeLines
+        DIST_CL = 9
+        self.last_r2 = 0
+        early = self.earlyDecision()
+        if early is not None:
+            return early
+        if res is None:
+            res = self.analyzeLines([pos])[0]
         mt = min(res[2]['d'], res[3]['d'])
         md = min(self.dist * 10, DIST_CL)
         self.last_r2 = res[2]['d']
@@ -814,11 +855,20 @@ class GridAnalyzer:
         return ['ERROR', res]
 
     def analyzePaths(self):
-        res = self.analyzePath(self.pa)
+        early = self.earlyDecision()
+        if early is not None:
+            # the same for all paths
+            self.last_r2 = 0
+            return early
+        positions = [self.pa]
         for s in range(4):
             dx = (1.5 - s) * self.dp[2] / 1.5
             dz = (s - 1.5) * self.dp[0] / 1.5
-            r = self.analyzePath([self.pa[0] + dx, self.pa[1], self.pa[2] + dz])
+            positions.append([self.pa[0] + dx, self.pa[1], self.pa[2] + dz])
+        lines = self.analyzeLines(positions)
+        res = self.analyzePath(self.pa, lines[0])
+        for s in range(4):
+            r = self.analyzePath(positions[s + 1], lines[s + 1])
             if self.last_r2 < 3: # avoid considering strafing inside blocks (should be improved?)
                 continue
             if r[0] == res[0]:
@@ -0,0 +1,250 @@
+import itertools
+import logging
+import math
+import random
+from operator import itemgetter
+
+import numpy
+
+from tagilmo.utils.mathutils import *
+
+
+class BlockPositions:
+    """Remembered positions of one block type, oldest first.
+
+    Positions are hashed by vertical columns of dx by dx blocks, so a position
+    within dx of a stored one along every axis is found among 9 neighbouring columns.
+    """
+
+    def __init__(self, dx=4, max_len=None):
+        self.dx = dx
+        self.size = max(dx, 1)
+        self.max_len = max_len
+        self.columns = dict() # (x, z) column -> {position: sequence number}
+        self.order = dict() # position -> sequence number, in insertion order
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return (list(pos) for pos in self.order)
+
+    def __contains__(self, pos):
+        return tuple(pos) in self.order
+
+    def __getitem__(self, index):
+        if index == -1 and self.order:
+            return list(next(reversed(self.order)))
+        return list(list(self.order)[index])
+
+    def __column(self, pos):
+        return (math.floor(pos[0] / self.size), math.floor(pos[2] / self.size))
+
+    def findNear(self, pos):
+        """A stored position within dx of pos along every axis, or None"""
+        cx, cz = self.__column(pos)
+        dx = self.dx
+        for column in ((cx - 1, cz - 1), (cx - 1, cz), (cx - 1, cz + 1), (cx, cz - 1), (cx, cz),
+                       (cx, cz + 1), (cx + 1, cz - 1), (cx + 1, cz), (cx + 1, cz + 1)):
+            for p in self.columns.get(column, ()):
+                if abs(p[0] - pos[0]) <= dx and abs(p[1] - pos[1]) <= dx and abs(p[2] - pos[2]) <= dx:
+                    return list(p)
+        return None
+
+    def add(self, pos):
+        """Store pos unless there is a position within dx, the oldest one is
+        forgotten when there are more than max_len"""
+        if self.findNear(pos) is not None:
+            return False
+        pos = tuple(pos)
+        seq = next(self.counter)
+        self.columns.setdefault(self.__column(pos), dict())[pos] = seq
+        self.order[pos] = seq
+        if self.max_len is not None and len(self.order) > self.max_len:
+            self.remove(next(iter(self.order)))
+        return True
+
+    def remove(self, pos):
+        pos = tuple(pos)
+        if self.order.pop(pos, None) is None:
+            return False
+        column = self.__column(pos)
+        positions = self.columns[column]
+        del positions[pos]
+        if not positions:
+            del self.columns[column]
+        return True
+
+    def removeAll(self, positions):
+        return sum(self.remove(pos) for pos in positions)
+
+    def within(self, lo, hi):
+        """Stored positions p with lo <= p <= hi along every axis"""
+        (x0, z0), (x1, z1) = self.__column(lo), self.__column(hi)
+        if (x1 - x0 + 1) * (z1 - z0 + 1) < len(self.columns):
+            columns = (self.columns.get((x, z), ()) for x in range(x0, x1 + 1) for z in range(z0, z1 + 1))
+        else:
+            columns = self.columns.values()
+        return [list(p) for positions in columns for p in positions
+                if all(l <= c <= h for c, l, h in zip(p, lo, hi))]
+
+    def __ring(self, center, r):
+        # columns at Chebyshev distance r from the center column
+        cx, cz = center
+        if r == 0:
+            return [center]
+        ring = [(cx + i, cz - r) for i in range(-r, r + 1)] + [(cx + i, cz + r) for i in range(-r, r + 1)]
+        ring += [(cx - r, cz + i) for i in range(-r + 1, r)] + [(cx + r, cz + i) for i in range(-r + 1, r)]
+        return ring
+
+    def nearest(self, aPos, distance, maxDist=math.inf):
+        """Position with the smallest distance(aPos, pos) not greater than maxDist,
+        the oldest one of equal, and the distance; (None, maxDist) if there is none.
+
+        distance must not be less than the largest horizontal coordinate difference,
+        then columns are visited in rings around aPos until farther ones can't be closer.
+        """
+        cx, cz = center = self.__column(aPos)
+        best, bestKey = None, (maxDist, math.inf)
+        occupied = len(self.columns)
+        visited = 0
+        for r in itertools.count():
+            if visited >= occupied or (r - 1) * self.size >= bestKey[0]:
+                break
+            rest = (2 * r + 1) ** 2 >= occupied - visited
+            if rest:
+                # more columns would be looked up than remain, sort the rest by ring
+                rings = [(max(abs(x - cx), abs(z - cz)), positions)
+                         for (x, z), positions in self.columns.items()]
+                rings = sorted((item for item in rings if item[0] >= r), key=itemgetter(0))
+            else:
+                rings = [(r, self.columns[c]) for c in self.__ring(center, r) if c in self.columns]
+                visited += len(rings)
+            for ring, positions in rings:
+                if (ring - 1) * self.size >= bestKey[0]:
+                    break
+                for pos, seq in positions.items():
+                    key = (distance(aPos, pos), seq)
+                    if key < bestKey:
+                        best, bestKey = pos, key
+            if rest:
+                break
+        return (list(best) if best is not None else None), bestKey[0]
+
+
+def recallDistance(aPos, pos):
+    dy = aPos[1] + 0.5 - pos[1]
+    dr = math.hypot(aPos[0] - pos[0], aPos[2] - pos[2])
+    if dr < 1 and dy < 0: dr += 2 # avoid blocks under feet
+    return dr + abs(dy)*10 # y direction is more difficult
+
+
+class NoticeBlocks:
+
+    def __init__(self):
+        self.blocks = {}
+        self.max_len = 5000
+        self.ignore_blocks = ['air', 'grass', 'tallgrass', 'double_plant', 'dirt', 'stone']
+        self.dx = 4
+        self.focus_blocks = set()
+        self.block_probs = {'diamond_ore' : 0.0015, 'deepslate_diamond_ore' : 0.0015,
+                                        'iron_ore' : 0.0015, 'deepslate_iron_ore' : 0.0015}
+
+    def updateBlock(self, block, pos):
+        if block not in self.blocks:
+            self.blocks[block] = BlockPositions(self.dx, self.max_len)
+        self.blocks[block].add(pos)
+
+    def removeIfMissing(self, current_block, blocks, pos):
+        for block in blocks:
+            if block not in self.blocks or block == current_block:
+                continue
+            self.blocks[block].remove(pos)
+
+    def add_focus_blocks(self, blocks):
+        self.focus_blocks |= set(blocks)
+
+    def del_focus_blocks(self, blocks):
+        self.focus_blocks -= set(blocks)
+
+    def updateBlocksFromBigGrid(self, rob, intersection):
+        indexes = [i for i, e in enumerate(intersection) if e == True]
+        for index in indexes:
+            block_name = list(self.block_probs.keys())[index]
+            probability = list(self.block_probs.values())[index]
+            if (block_name not in self.blocks or len(self.blocks[block_name]) == 0) and random.random() < probability:
+                rob.sendCommandToFindBlock(block_name)
+            block_pos = None
+            find_block_observations = rob.getCachedObserve('getBlockFromBigGrid')
+            for obs in reversed(find_block_observations):
+                if obs[0] is not None:
+                    block_pos = obs[0]
+                    break
+            if block_pos is not None and block_pos != "Empty":
+                block_pos, block_name = block_pos[:3], block_pos[3]
+                pos = int_coords(block_pos)
+                self.updateBlock(block_name, pos)
+
+    def updateBlocks(self, rob):
+        grid = rob.cached['getNearGrid'][0]
+        if grid is None:
+            logging.warning('grid is None')
+            return
+        sight = rob.cached['getLineOfSights'][0]
+        bc = rob.blockCenterFromRay()
+        if bc is not None and \
+          (sight['type'] not in self.ignore_blocks or sight['type'] in self.focus_blocks):
+            self.updateBlock(sight['type'], int_coords(bc))
+        array = rob.mc.gridToArray(grid, rob.agentId)
+        ids = array.ravel()
+        bUpdate = (~rob.blockMask(self.ignore_blocks) | rob.blockMask(self.focus_blocks))[ids]
+        positions = numpy.floor(rob.gridAbsPositions(observeReq=False)).astype(int)
+        indices = numpy.flatnonzero(bUpdate)
+        if self.focus_blocks != set():
+            # only cells at remembered positions of focus blocks can remove them
+            indices = numpy.union1d(indices, self.__cellsOf(array.shape, positions))
+        bUpdate = bUpdate.tolist()
+        for i in indices.tolist():
+            pos = positions[i].tolist()
+            if self.focus_blocks != set():
+                self.removeIfMissing(grid[i], self.focus_blocks, pos)
+            if bUpdate[i]:
+                self.updateBlock(grid[i], pos)
+        intersection = [i in self.focus_blocks for i in self.block_probs]
+        if True in intersection:
+            self.updateBlocksFromBigGrid(rob, intersection)
+
+    def __cellsOf(self, shape, positions):
+        # grid cells at remembered positions of focus blocks
+        dimY, dimZ, dimX = shape
+        # cell coordinates along each axis, increasing
+        xs = positions[:dimX, 0]
+        ys = positions[::dimX * dimZ, 1]
+        zs = positions[:dimX * dimZ:dimX, 2]
+        lo, hi = positions[0].tolist(), positions[-1].tolist()
+        remembered = [p for block in self.focus_blocks if block in self.blocks
+                      for p in self.blocks[block].within(lo, hi)]
+        if not remembered:
+            return numpy.zeros(0, dtype=numpy.intp)
+        remembered = numpy.array(remembered)
+        x = numpy.searchsorted(xs, remembered[:, 0])
+        y = numpy.searchsorted(ys, remembered[:, 1])
+        z = numpy.searchsorted(zs, remembered[:, 2])
+        found = (xs[x] == remembered[:, 0]) & (ys[y] == remembered[:, 1]) & (zs[z] == remembered[:, 2])
+        return ((y * dimZ + z) * dimX + x)[found]
+
+    def recallNearest(self, targets, aPos=None, return_target_block=False, maxDist=math.inf):
+        if aPos is None: aPos = [0,0,0]
+        dist = maxDist
+        res = None
+        target_block = 'None'
+        for b in targets:
+            if b in self.blocks:
+                pos, d = self.blocks[b].nearest(aPos, recallDistance, dist)
+                # strictly closer, the first of targets wins otherwise
+                if pos is not None and (d < dist or res is None):
+                    dist = d
+                    res = pos
+                    target_block = b
+        return res if not return_target_block else [res, target_block]
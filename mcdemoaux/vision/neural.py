@@ -3,6 +3,9 @@ import logging
 import torch
 import numpy
 import cv2
+from functools import partial
+
+from tagilmo.utils.callback_executor import BatchExecutor
 
 
 model_cache = dict()
@@ -32,6 +35,31 @@ def get_image(img_frame, keep_aspect_ratio, maximum_size):
     return None
 
 
+def image_tensor(img_data):
+    """(1, C, H, W) float tensor in [0, 1] of an (H, W, C) image"""
+    img_data = torch.as_tensor(img_data).permute(2,0,1)
+    return img_data.unsqueeze(0) / 255.0
+
+
+def load_model():
+    from mcdemoaux import vision
+    pth = os.path.dirname(vision.__file__)
+    path = pth+'/goodpoint.pt'
+    logging.info('loading model from %s', path)
+    if path in model_cache:
+        return model_cache[path]
+    from mcdemoaux.vision.goodpoint import GoodPoint
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    n_classes = 5 # other, log, leaves, coal_ore, stone
+    depth = False
+    net = GoodPoint(8, n_classes, n_channels=3, depth=depth, batchnorm=False).to(device)
+    if os.path.exists(path):
+        model_weights = torch.load(path, map_location=device)['model']
+        net.load_state_dict(model_weights)
+    model_cache[path] = net
+    return net
+
+
 class NeuralWrapper:
     def __init__(self, rob, keep_aspect_ratio=True, maximum_size=(384, 240)):
         self.net = self.load_model()
@@ -43,8 +71,7 @@ class NeuralWrapper:
         img_name = 'getImageFrame'
         img_data = get_image(self.rob.getCachedObserve(img_name), self.keep_aspect_ratio, self.maximum_size)
         if img_data is not None:
-            img_data = torch.as_tensor(img_data).permute(2,0,1)
-            img_data = img_data.unsqueeze(0) / 255.0
+            img_data = image_tensor(img_data)
         return img_data
 
     def __call__(self):
@@ -55,20 +82,54 @@ class NeuralWrapper:
                 return heatmaps, img
 
     def load_model(self):
-        from mcdemoaux import vision
-        pth = os.path.dirname(vision.__file__)
-        path = pth+'/goodpoint.pt'
-        logging.info('loading model from %s', path)
-        if path in model_cache:
-            return model_cache[path]
-        from mcdemoaux.vision.goodpoint import GoodPoint
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        n_classes = 5 # other, log, leaves, coal_ore, stone
-        depth = False
-        net = GoodPoint(8, n_classes, n_channels=3, depth=depth, batchnorm=False).to(device)
-        if os.path.exists(path):
-            model_weights = torch.load(path, map_location=device)['model']
-            net.load_state_dict(model_weights)
-        model_cache[path] = net
-        return net
+        return load_model()
+
+
+class NeuralServer:
+    """Runs the network for many agents in batches.
+
+    Each attached RobustObserverWithCallbacks prepares its frames in its own
+    executor, frames arriving within window seconds of each other go through
+    one forward pass. Results are cached by each observer like NeuralWrapper's,
+    as (heatmaps, img) with the batch dimension of 1.
+    net: the network, loaded with load_model() if None
+    num_threads: intra-op thread budget, torch.set_num_threads is called once
+    if it is given; it is process-wide, so it applies to every model of the process
+    """
+    def __init__(self, net=None, keep_aspect_ratio=True, maximum_size=(384, 240),
+                 window=0.01, max_batch=8, num_threads=None):
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+        self.net = net if net is not None else load_model()
+        self.keep_aspect_ratio = keep_aspect_ratio
+        self.maximum_size = maximum_size
+        self.batcher = BatchExecutor(self.forward, window=window, max_batch=max_batch)
+
+    def attach(self, rob, name='getNeuralSegmentation', on_change='getImageFrame'):
+        rob.addBatchedCallback(name, on_change, partial(self.prepare, rob, on_change), self.batcher)
+
+    def prepare(self, rob, img_name='getImageFrame'):
+        img_data = get_image(rob.getCachedObserve(img_name), self.keep_aspect_ratio, self.maximum_size)
+        if img_data is not None:
+            img_data = image_tensor(img_data)
+        return img_data
+
+    def forward(self, images):
+        # frames of different sizes go in separate passes
+        results = [None] * len(images)
+        shapes = dict()
+        for i, img in enumerate(images):
+            shapes.setdefault(tuple(img.shape), []).append(i)
+        with torch.no_grad():
+            for indices in shapes.values():
+                heatmaps = self.net(torch.cat([images[i] for i in indices]))
+                for j, i in enumerate(indices):
+                    results[i] = (heatmaps[j:j + 1], images[i])
+        return results
+
+    def getStats(self):
+        """Batch sizes and queue latency, a BatchStats"""
+        return self.batcher.getStats()
 
+    def shutdown(self):
+        self.batcher.shutdown()
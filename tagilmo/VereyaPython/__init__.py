@@ -1,11 +1,13 @@
 from .mission_spec import MissionSpec
 from .mission_record_spec import MissionRecordSpec
 from .agent_host import AgentHost
+from .io_runtime import IoRuntime, getSharedRuntime
 from .client_info import ClientInfo
 from .mission_exception import MissionException
 from .mission_exception import MissionErrorCode
 from .timestamped_string import TimestampedString
 from .timestamped_video_frame import TimestampedVideoFrame, FrameType
+from .frame_publisher import FramePublisher, FrameSubscriber, SharedFrame
 import logging
 import logging.handlers
 
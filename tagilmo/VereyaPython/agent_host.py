@@ -1,11 +1,10 @@
 import threading
 import datetime
 import time
-import copy
 import logging
 import asyncio
 from asyncio import AbstractEventLoop
-from typing import List, Optional, Set, Callable
+from typing import Dict, List, Optional, Set, Callable, Tuple
 import xml.etree.ElementTree as ET
 from io import TextIOWrapper
 
@@ -13,18 +12,23 @@ from .string_server import StringServer
 from .timestamped_string import TimestampedString
 from .timestamped_video_frame import FrameType, TimestampedVideoFrame
 from .video_server import VideoServer
+from .tcp_server import DispatchMode, DispatchStats
+from .ring_buffer import RingBuffer, RingBufferStats
+from .frame_publisher import FramePublisher
 from .mission_spec import MissionSpec
 from .mission_init_spec import MissionInitSpec
 from .mission_record import MissionRecord
 from .client_info import ClientInfo
+from .client_liveness import ClientLiveness, client_liveness
 from .mission_record_spec import MissionRecordSpec
-from .world_state import WorldState
+from .world_state import WorldState, WorldStateSnapshot
 from .argument_parser import ArgumentParser
 from .mission_exception import MissionException, MissionErrorCode
 from .world_state_policy import VideoPolicy, RewardsPolicy, ObservationsPolicy
 from .timestamped_reward import TimestampedReward
 from .mission_ended_xml import MissionEndedXML
 from .client_connection import ClientConnection
+from .io_runtime import IoRuntime
 from . import rpc
 from .version import *
 from .consts import *
@@ -37,13 +41,28 @@ ET.register_namespace('xsi', XMLNS_XSI)
 
 logger = logging.getLogger()
 
+# default capacity of buffers for KEEP_RECENT_* policies
+FRAME_BUFFER_COUNT = 64
+FRAME_BUFFER_BYTES = 256 * 2 ** 20
+OBSERVATION_BUFFER_COUNT = 1024
+OBSERVATION_BUFFER_BYTES = 64 * 2 ** 20
+
 
 class AgentHost(ArgumentParser):
-    def __init__(self) -> None:
+    def __init__(self, runtime: Optional[IoRuntime] = None) -> None:
+        """runtime: loop and executor shared with other agent hosts,
+        by default agent host runs its own loop in a separate thread"""
         self.world_state_mutex = threading.RLock()
-        self.io_service: AbstractEventLoop = asyncio.new_event_loop()
-        self.th = threading.Thread(target=self.io_service.run_forever, daemon=True)
-        self.th.start()
+        self.runtime = runtime
+        self.stopped = False
+        if runtime is None:
+            self.io_service: AbstractEventLoop = asyncio.new_event_loop()
+            self.th = threading.Thread(target=self.io_service.run_forever, daemon=True)
+            self.th.start()
+        else:
+            runtime.attach()
+            self.io_service = runtime.loop
+            self.th = runtime.thread
         self.video_server: Optional[VideoServer] = None
         self.depth_server: Optional[VideoServer] = None
         self.luminance_server: Optional[VideoServer] = None
@@ -52,17 +71,29 @@ class AgentHost(ArgumentParser):
         self.mission_control_server: Optional[StringServer] = None
         self.observations_server: Optional[StringServer] = None
         self.commands_connection: Optional[ClientConnection] = None
+        self.command_batch_window = 0.0
         self.commands_stream: Optional[TextIOWrapper] = None
         self.rewards_server: Optional[StringServer] = None
         self.current_role = -1
         self.video_policy = VideoPolicy.LATEST_FRAME_ONLY
         self.observations_policy = ObservationsPolicy.LATEST_OBSERVATION_ONLY
+        self.observations_dispatch = DispatchMode.ORDERED
         self.current_mission_init: Optional[MissionInitSpec] = None
         self.current_mission_record: Optional[MissionRecord] = None
         self.rewards_policy = RewardsPolicy.SUM_REWARDS
         self.version: Optional[str] = None
         self._onObservationCallback: List[Callable[[TimestampedString], None]] = []
         self._onNewFrameCallback: List[Callable[[TimestampedVideoFrame], None]] = []
+        self.client_liveness: ClientLiveness = client_liveness
+        # used by KEEP_RECENT_FRAMES and KEEP_RECENT_OBSERVATIONS policies
+        self.frame_buffers: Dict[FrameType, RingBuffer[TimestampedVideoFrame]] = {
+            frametype: RingBuffer(lambda frame: frame.nbytes, FRAME_BUFFER_COUNT, FRAME_BUFFER_BYTES)
+            for frametype in (FrameType.VIDEO, FrameType.DEPTH_MAP, FrameType.LUMINANCE, FrameType.COLOUR_MAP)}
+        self.observation_buffer: RingBuffer[TimestampedString] = RingBuffer(
+            lambda message: len(message.text), OBSERVATION_BUFFER_COUNT, OBSERVATION_BUFFER_BYTES)
+        self.publisher_lock = threading.Lock()
+        self.frame_publishers: Dict[FrameType, FramePublisher] = dict()
+        self.background_tasks: Set[asyncio.Future] = set()
 
     def startMission(self, mission: MissionSpec, client_pool: List[ClientInfo],
                      mission_record: MissionRecordSpec, role: int,
@@ -113,8 +144,11 @@ class AgentHost(ArgumentParser):
 
         # work through the client pool until we find a client to run our mission for us
         assert pool
+        # clear before sending MissionInit, the client may reply with its MissionInit
+        # before findClient returns
+        with self.world_state_mutex:
+            self.world_state.clear()
         self.findClient( list(pool) )
-        self.world_state.clear()
         assert self.current_mission_record is not None
 
     def testSchemasCompatible(self):
@@ -126,67 +160,103 @@ class AgentHost(ArgumentParser):
         # TODO - currently reserved for 20 seconds (the 20000 below) - make self.configurable.
         request = "MALMO_REQUEST_CLIENT:" + MALMO_VERSION + ":20000:" +\
                     self.current_mission_init.getExperimentID() +"\n"
-        # could be run concurenlty??
-        for item in client_pool:
-            logger.info("Sending reservation request to " + str(item.ip_address) +\
-                         ':' + str(item.control_port))
-            try:
-                fut = rpc.sendStringAndGetShortReply(item.ip_address, item.control_port, request)
-                reply = await asyncio.wait_for(fut, timeout=3)
-            except asyncio.exceptions.TimeoutError as e:
-                logger.exception("timeout on reservation request", exc_info=e)
-                continue
-            except RuntimeError as e:
-                logging.exception("error on reservation request", exc_info=e)
-                continue
-            except ConnectionRefusedError as e:
-                logging.exception(f"error connecting to {item.ip_address}:{item.control_port}", exc_info=e)
-                continue
-            logger.info("Reserving client, received reply from " + str(item.ip_address) + ": " + reply)
-            malmo_reservation_prefix = "MALMOOK"
-            malmo_mismatch = "MALMOERRORVERSIONMISMATCH"
-            malmo_busy = "MALMOBUSY"
-            if reply.startswith(malmo_reservation_prefix):
-                # Successfully reserved self.client.
-                reservedClients.add(item)
-                clients_required -= 1
-                if clients_required == 0:
-                    break
-            elif reply.startswith(malmo_mismatch):
-                logger.warning("Version mismatch - throwing MissionException.")
-                raise MissionException( "Failed to find an available client for \
-                                        self.mission - tried all the clients in \
-                                        the supplied client pool.",
-                                        MissionErrorCode.MISSION_VERSION_MISMATCH)
-            else:
-                logger.error('unexpected reply ' + reply)
-        #  Were there enough clients available?
-        if clients_required > 0:
-            for item in reservedClients:
-                logger.info("Cancelling reservation request with " + item.ip_address + ":" +\
-                              str(item.control_port))
-                try:
-                    fut = rpc.sendStringAndGetShortReply(item.ip_address, item.control_port,
-                                                         "MALMO_CANCEL_REQUEST\n", False)
-                    reply = await asyncio.wait_for(fut, timeout=3)
-                    logger.info("Cancelling reservation, received reply from " + str(item.ip_address) + ": " + reply)
-                except RuntimeError as e:
-                    # This is not expected, and probably means something bad has happened.
-                    logger.exception("Failed to cancel reservation request with " +\
-                                   item.ip_address + ":" + str(item.control_port),
-                                   exc_info=e)
+        malmo_reservation_prefix = "MALMOOK"
+        malmo_mismatch = "MALMOERRORVERSIONMISMATCH"
+        # request all clients at once, keep the first ones to reply
+        pending = {asyncio.ensure_future(self.__reserveClient(item, request))
+                   for item in self.client_liveness.filterAlive(client_pool)}
+        unneeded = []
+        mismatch = False
+        while pending and clients_required > 0 and not mismatch:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item, reply = task.result()
+                if reply is None:
                     continue
-
+                if reply.startswith(malmo_reservation_prefix):
+                    # Successfully reserved self.client.
+                    if clients_required > 0:
+                        reservedClients.add(item)
+                        clients_required -= 1
+                    else:
+                        unneeded.append(item)
+                elif reply.startswith(malmo_mismatch):
+                    mismatch = True
+                else:
+                    logger.error('unexpected reply ' + reply)
+        # don't wait for the rest, release them if they get reserved
+        for task in pending:
+            self.__background(self.__releaseIfReserved(task))
+        #  Were there enough clients available?
+        if clients_required > 0 or mismatch:
+            unneeded.extend(reservedClients)
+        for item in unneeded:
+            self.__background(self.__cancelReservation(item))
+        if mismatch:
+            logger.warning("Version mismatch - throwing MissionException.")
+            raise MissionException( "Failed to find an available client for \
+                                    self.mission - tried all the clients in \
+                                    the supplied client pool.",
+                                    MissionErrorCode.MISSION_VERSION_MISMATCH)
         return reservedClients
 
+    async def __reserveClient(self, item: ClientInfo, request: str) -> Tuple[ClientInfo, Optional[str]]:
+        logger.info("Sending reservation request to " + str(item.ip_address) +\
+                     ':' + str(item.control_port))
+        try:
+            fut = rpc.sendStringAndGetShortReply(item.ip_address, item.control_port, request)
+            reply = await asyncio.wait_for(fut, timeout=3)
+        except asyncio.exceptions.TimeoutError as e:
+            logger.exception("timeout on reservation request", exc_info=e)
+            self.client_liveness.markDead(item)
+            return item, None
+        except (ConnectionError, OSError) as e:
+            logging.exception(f"error connecting to {item.ip_address}:{item.control_port}", exc_info=e)
+            self.client_liveness.markDead(item)
+            return item, None
+        except (RuntimeError, asyncio.exceptions.IncompleteReadError) as e:
+            logging.exception("error on reservation request", exc_info=e)
+            return item, None
+        self.client_liveness.markAlive(item)
+        logger.info("Reserving client, received reply from " + str(item.ip_address) + ": " + reply)
+        return item, reply
+
+    async def __cancelReservation(self, item: ClientInfo) -> None:
+        logger.info("Cancelling reservation request with " + item.ip_address + ":" +\
+                      str(item.control_port))
+        try:
+            fut = rpc.sendStringAndGetShortReply(item.ip_address, item.control_port,
+                                                 "MALMO_CANCEL_REQUEST\n", False)
+            reply = await asyncio.wait_for(fut, timeout=3)
+            logger.info("Cancelling reservation, received reply from " + str(item.ip_address) + ": " + reply)
+        except (RuntimeError, OSError, asyncio.exceptions.TimeoutError,
+                asyncio.exceptions.IncompleteReadError) as e:
+            # This is not expected, and probably means something bad has happened.
+            logger.exception("Failed to cancel reservation request with " +\
+                           item.ip_address + ":" + str(item.control_port),
+                           exc_info=e)
+
+    async def __releaseIfReserved(self, task: 'asyncio.Future[Tuple[ClientInfo, Optional[str]]]') -> None:
+        item, reply = await task
+        if reply is not None and reply.startswith("MALMOOK"):
+            await self.__cancelReservation(item)
+
+    def __background(self, coro) -> None:
+        # keep a reference until the task is done
+        task = asyncio.ensure_future(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
     def findClient(self, client_pool: List[ClientInfo]):
         logger.info("Looking for client...")
         # As a reasonable optimisation, assume that clients are started in the order of their role, for multi-agent missions.
         # So start looking at position <role> within the client pool.
         # Eg, if the first four agents get clients 1,2,3 and 4 respectively, agent 5 doesn't need to waste time checking
         # the first four clients.
-        pool = list(client_pool)
-        num_clients = len(client_pool)
+        # MissionInit starts the mission on the client that accepts it,
+        # so clients are tried one at a time, skipping those known to be dead
+        pool = self.client_liveness.filterAlive(client_pool)
+        num_clients = len(pool)
         assert self.current_mission_init is not None
         for i in range(num_clients):
             item = pool[(i + self.current_role) % num_clients]
@@ -198,14 +268,16 @@ class AgentHost(ArgumentParser):
                          item.ip_address + ":" + str(item.control_port))
 
             try:
-                reply = asyncio.run_coroutine_threadsafe(rpc.sendStringAndGetShortReply(
+                reply = asyncio.run_coroutine_threadsafe(asyncio.wait_for(rpc.sendStringAndGetShortReply(
                                                          item.ip_address,
                                                          item.control_port,
-                                                         mission_init_xml), self.io_service).result(3)
-            except (exceptions.TimeoutError, RuntimeError) as e:
+                                                         mission_init_xml), timeout=3), self.io_service).result()
+            except (asyncio.exceptions.TimeoutError, OSError, RuntimeError) as e:
                 logger.info("No response from %s: %i", item.ip_address, item.control_port)
                 logger.debug("error", exc_info=e)
                 # This is expected quite often - client is likely not running.
+                if not isinstance(e, RuntimeError):
+                    self.client_liveness.markDead(item)
                 continue
             except asyncio.exceptions.IncompleteReadError as e:
                 print(e)
@@ -222,19 +294,18 @@ class AgentHost(ArgumentParser):
                                 tried all the clients in the \
                                 supplied client pool.", MissionErrorCode.MISSION_INSUFFICIENT_CLIENTS_AVAILABLE )
 
-    def peekWorldState(self) -> WorldState:
+    def peekWorldState(self) -> WorldStateSnapshot:
+        """Read-only snapshot of the current state, frames are not copied"""
         with self.world_state_mutex:
-            # Copy while holding lock.
-            current_world_state = copy.deepcopy(self.world_state)
-        return current_world_state
+            return self.world_state.snapshot()
 
     def getWorldState(self) -> WorldState:
+        """Take the accumulated state, new messages go to a fresh WorldState"""
         with self.world_state_mutex:
-            old_world_state = copy.deepcopy(self.world_state)
-            self.world_state.clear()
-            self.world_state.is_mission_running = old_world_state.is_mission_running
-            self.world_state.has_mission_begun = old_world_state.has_mission_begun
-            return old_world_state
+            old_world_state = self.world_state
+            self.world_state = WorldState(has_mission_begun=old_world_state.has_mission_begun,
+                                          is_mission_running=old_world_state.is_mission_running)
+        return old_world_state
 
     def getRecordingTemporaryDirectory(self) -> str:
         return self.current_mission_record.getTemporaryDirectory() if self.current_mission_record and self.current_mission_record.isRecording() else ""
@@ -368,6 +439,7 @@ class AgentHost(ArgumentParser):
             self.commands_stream.close()
 
         if self.commands_connection:
+            self.commands_connection.close()
             self.commands_connection = None
 
     def generateMissionInit(self) -> str:
@@ -398,7 +470,8 @@ class AgentHost(ArgumentParser):
                 video_server.close()
 
             # Can't use the server passed in - create a new one.
-            ret_server = VideoServer(self.io_service, port, channels, frametype, self.onVideo)
+            ret_server = VideoServer(self.io_service, port, channels, frametype, self.onVideo,
+                                     self.videoDispatchMode(), width, height)
 
             if (self.current_mission_record.isRecordingMP4(frametype)):
                 ret_server.recordMP4(path,
@@ -420,12 +493,18 @@ class AgentHost(ArgumentParser):
                                        self.current_mission_record.isDroppingFrames(frametype))
             elif (self.current_mission_record.isRecordingBmps(frametype)):
                 video_server.recordBmps(self.current_mission_record.getTemporaryDirectory())
+            video_server.setDispatchMode(self.videoDispatchMode())
+            video_server.setFrameSize(width, height)
             ret_server = video_server
 
         ret_server.startRecording()
         return ret_server
 
     def sendCommand(self, command: str, key: str='') -> None:
+        self.sendCommands([command], key)
+
+    def sendCommands(self, commands: List[str], key: str='') -> None:
+        """Send several commands in one write, they arrive back-to-back"""
         with self.world_state_mutex:
             assert self.world_state.is_mission_running
         with self.world_state_mutex:
@@ -437,9 +516,9 @@ class AgentHost(ArgumentParser):
                                                   commands connection is not open. Is the mission running?")
                 self.world_state.errors.append(error_message)
                 raise RuntimeError(text)
-        full_command = command if not key else key + " " + command
+        full_commands = [command if not key else key + " " + command for command in commands]
         try:
-            self.commands_connection.send(full_command)
+            self.commands_connection.sendMany(full_commands)
         except RuntimeError as e:
             logger.exception('cant send command', exc_info=e)
             error_message = TimestampedString(time.time(),
@@ -449,8 +528,9 @@ class AgentHost(ArgumentParser):
 
         if self.commands_stream:
             timestamp = datetime.datetime.now().isoformat()
-            self.commands_stream.write(timestamp)
-            self.commands_stream.write(" " + command + '\n')
+            for command in commands:
+                self.commands_stream.write(timestamp)
+                self.commands_stream.write(" " + command + '\n')
 
     def openCommandsConnection(self) -> None:
         assert self.current_mission_init is not None
@@ -462,7 +542,8 @@ class AgentHost(ArgumentParser):
         assert self.current_mission_init is not None
         mod_address = self.current_mission_init.getClientAddress()
 
-        self.commands_connection = ClientConnection(self.io_service, mod_address, mod_commands_port )
+        self.commands_connection = ClientConnection(self.io_service, mod_address, mod_commands_port,
+                                                    self.command_batch_window)
 
     def listenForMissionControlMessages(self, port: int) -> None:
         if self.mission_control_server and ( port==0 or self.mission_control_server.getPort()==port ):
@@ -567,19 +648,25 @@ class AgentHost(ArgumentParser):
 
     def onVideo(self, message: TimestampedVideoFrame) -> None:
         with self.world_state_mutex:
-            if self.video_policy == VideoPolicy.LATEST_FRAME_ONLY:
+            if self.video_policy == VideoPolicy.KEEP_RECENT_FRAMES:
+                self.frame_buffers[message.frametype].append(message)
+            if self.video_policy != VideoPolicy.KEEP_ALL_FRAMES:
                 if (message.frametype == FrameType.COLOUR_MAP):
                     self.world_state.video_frames_colourmap.clear()
                 else:
                     self.world_state.video_frames.clear()
-            else:
-                print('append')
             if message.frametype == FrameType.COLOUR_MAP:
                 self.world_state.video_frames_colourmap.append(message)
             else:
                 self.world_state.video_frames.append(message)
             self.world_state.number_of_video_frames_since_last_state += 1
 
+        if self.frame_publishers:
+            with self.publisher_lock:
+                publisher = self.frame_publishers.get(message.frametype)
+                if publisher is not None:
+                    publisher.publish(message)
+
         for callback in self._onNewFrameCallback:
             callback(message)
 
@@ -612,8 +699,11 @@ class AgentHost(ArgumentParser):
             if (self.observations_server is not None):
                 self.observations_server.close()
 
-            self.observations_server = StringServer(self.io_service, port, self.onObservation, "obs")
+            self.observations_server = StringServer(self.io_service, port, self.onObservation, "obs",
+                                                    self.observationsDispatchMode())
             self.observations_server.start()
+        else:
+            self.observations_server.setDispatchMode(self.observationsDispatchMode())
 
         assert self.current_mission_record is not None
         if self.current_mission_record.isRecordingObservations():
@@ -625,7 +715,10 @@ class AgentHost(ArgumentParser):
                 self.world_state.observations.clear()
                 self.world_state.observations.append(message)
             elif self.observations_policy == ObservationsPolicy.KEEP_ALL_OBSERVATIONS:
-                print('append')
+                self.world_state.observations.append(message)
+            elif self.observations_policy == ObservationsPolicy.KEEP_RECENT_OBSERVATIONS:
+                self.observation_buffer.append(message)
+                self.world_state.observations.clear()
                 self.world_state.observations.append(message)
             else:
                 raise RuntimeError('unexpected observation policy ' + str(self.observations_policy))
@@ -638,24 +731,145 @@ class AgentHost(ArgumentParser):
     def closeRecording(self):
         pass
 
+    def setDeadClientTimeout(self, seconds: float) -> None:
+        """Skip clients which didn't respond for this many seconds,
+        shared by all agent hosts unless client_liveness is replaced"""
+        self.client_liveness.dead_timeout = seconds
+
+    def setCommandBatchWindow(self, seconds: float) -> None:
+        """Commands sent within this many seconds are written together,
+        0 - as soon as the event loop gets to them"""
+        self.command_batch_window = seconds
+        if self.commands_connection is not None:
+            self.commands_connection.batch_window = seconds
+
+    def setVideoPolicy(self, videoPolicy: VideoPolicy) -> None:
+        self.video_policy = videoPolicy
+        for server in (self.video_server, self.depth_server, self.luminance_server, self.colourmap_server):
+            if server is not None:
+                server.setDispatchMode(self.videoDispatchMode())
+
+    def setObservationsPolicy(self, observationsPolicy: ObservationsPolicy) -> None:
+        self.observations_policy = observationsPolicy
+
+    def setObservationsDispatchMode(self, dispatch: DispatchMode) -> None:
+        """ORDERED, the default, passes every observation to onObservation.
+        LATEST_ONLY drops superseded ones under backpressure together with
+        the events they carry: chat, inputs, block changes"""
+        self.observations_dispatch = dispatch
+        if self.observations_server is not None:
+            self.observations_server.setDispatchMode(dispatch)
+
+    def setRewardsPolicy(self, rewardsPolicy: RewardsPolicy) -> None:
+        self.rewards_policy = rewardsPolicy
+
+    def videoDispatchMode(self) -> DispatchMode:
+        # frames that would be discarded by the policy anyway are dropped before decoding
+        if self.video_policy == VideoPolicy.LATEST_FRAME_ONLY:
+            return DispatchMode.LATEST_ONLY
+        return DispatchMode.ORDERED
+
+    def observationsDispatchMode(self) -> DispatchMode:
+        return self.observations_dispatch
+
+    def setFrameBufferCapacity(self, max_count: int = 0, max_bytes: int = 0,
+                               frametype: Optional[FrameType] = None) -> None:
+        """Capacity of KEEP_RECENT_FRAMES buffer for frametype or for every stream, 0 - no limit"""
+        with self.world_state_mutex:
+            for ft, buffer in self.frame_buffers.items():
+                if frametype is None or ft == frametype:
+                    buffer.setCapacity(max_count, max_bytes)
+
+    def setObservationBufferCapacity(self, max_count: int = 0, max_bytes: int = 0) -> None:
+        """Capacity of KEEP_RECENT_OBSERVATIONS buffer, 0 - no limit"""
+        with self.world_state_mutex:
+            self.observation_buffer.setCapacity(max_count, max_bytes)
+
+    def drainFrames(self, frametype: FrameType = FrameType.VIDEO) -> List[TimestampedVideoFrame]:
+        """Take all frames buffered by KEEP_RECENT_FRAMES policy, oldest first"""
+        with self.world_state_mutex:
+            return self.frame_buffers[frametype].drain()
+
+    def drainObservations(self) -> List[TimestampedString]:
+        """Take all observations buffered by KEEP_RECENT_OBSERVATIONS policy, oldest first"""
+        with self.world_state_mutex:
+            return self.observation_buffer.drain()
+
+    def publishFrames(self, width: int, height: int, channels: int = 3, slots: int = 4,
+                      name: Optional[str] = None, frametype: FrameType = FrameType.VIDEO) -> FramePublisher:
+        """Copy frames of frametype into a ring in shared memory,
+        other processes read them with FrameSubscriber(publisher.name)"""
+        publisher = FramePublisher(width * height * channels, slots, name)
+        with self.publisher_lock:
+            old = self.frame_publishers.get(frametype)
+            self.frame_publishers[frametype] = publisher
+        if old is not None:
+            old.close()
+        return publisher
+
+    def stopPublishingFrames(self, frametype: Optional[FrameType] = None) -> None:
+        """Close publisher for frametype or all of them"""
+        with self.publisher_lock:
+            frametypes = list(self.frame_publishers) if frametype is None else [frametype]
+            publishers = [self.frame_publishers.pop(ft) for ft in frametypes if ft in self.frame_publishers]
+        for publisher in publishers:
+            publisher.close()
+
+    def getBufferStats(self) -> Dict[str, RingBufferStats]:
+        """size and drop counters of KEEP_RECENT_* buffers"""
+        names = {FrameType.VIDEO: 'video', FrameType.DEPTH_MAP: 'depth',
+                 FrameType.LUMINANCE: 'luminance', FrameType.COLOUR_MAP: 'colourmap'}
+        with self.world_state_mutex:
+            result = {names[ft]: buffer.getStats() for (ft, buffer) in self.frame_buffers.items()}
+            result['obs'] = self.observation_buffer.getStats()
+        return result
+
+    def getDispatchStats(self) -> Dict[str, DispatchStats]:
+        """received, processed, dropped and queued message counts for each running server"""
+        servers = {'mcp': self.mission_control_server,
+                   'obs': self.observations_server,
+                   'rew': self.rewards_server,
+                   'video': self.video_server,
+                   'depth': self.depth_server,
+                   'luminance': self.luminance_server,
+                   'colourmap': self.colourmap_server}
+        return {name: server.getDispatchStats() for (name, server) in servers.items() if server is not None}
+
     def __del__(self):
         self.stop()
 
     def stop(self):
-        if not self.io_service.is_running():
+        if self.stopped or self.io_service.is_closed():
             return
+        self.stopped = True
         self.close()
-        for task in asyncio.all_tasks(self.io_service):
-            task.cancel()
-            logger.info(task)
+        self.stopPublishingFrames()
+        try:
+            asyncio.run_coroutine_threadsafe(self.__cancelTasks(), self.io_service).result(5)
+        except Exception as e:
+            logger.exception('error cancelling tasks', exc_info=e)
+        if self.runtime is not None:
+            # the loop is shared with other agent hosts
+            self.runtime.detach()
+            return
 
         self.io_service.call_soon_threadsafe(self.io_service.stop)
         logger.debug('stopping loop')
-        while self.io_service.is_running():
-            time.sleep(1)
+        self.th.join()
         self.io_service.close()
         logger.debug('loop stopped')
 
+    async def __cancelTasks(self) -> None:
+        if self.runtime is None:
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        else:
+            tasks = list(self.background_tasks)
+        for task in tasks:
+            task.cancel()
+            logger.info(task)
+        if tasks:
+            await asyncio.wait(tasks, timeout=1)
+
     def processReceivedReward(self, reward: TimestampedReward) -> None:
         if self.rewards_policy ==  RewardsPolicy.LATEST_REWARD_ONLY:
             self.world_state.rewards.clear()
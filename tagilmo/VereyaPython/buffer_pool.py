@@ -0,0 +1,86 @@
+import threading
+import logging
+from dataclasses import dataclass
+from typing import List, Union
+
+
+logger = logging.getLogger()
+
+
+@dataclass(slots=True, frozen=True)
+class BufferPoolStats:
+    allocated: int  # buffers created by the pool
+    reused: int     # acquisitions served from the free list
+    free: int       # buffers ready to be reused
+
+
+class BufferPool:
+    """Preallocated receive buffers of fixed size.
+
+    A buffer returned with release is reused only if nothing references
+    its memory anymore, so numpy views kept by the consumer stay valid.
+    """
+    def __init__(self, size: int, count: int = 2, max_count: int = 8):
+        self.size = size
+        self.max_count = max_count
+        self.lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+        self.free: List[bytearray] = [self.__allocate(size) for _ in range(count)]
+
+    def __allocate(self, size: int) -> bytearray:
+        self.allocated += 1
+        # one spare byte of capacity makes the check in __exported cheap
+        buf = bytearray(size + 1)
+        del buf[-1]
+        return buf
+
+    @staticmethod
+    def __exported(buf: bytearray) -> bool:
+        # bytearray can't be resized while memoryview or numpy array points to it
+        try:
+            buf.append(0)
+        except BufferError:
+            return True
+        del buf[-1]
+        return False
+
+    def acquire(self, size: int) -> bytearray:
+        """Get buffer at least size bytes long"""
+        if size > self.size:
+            # doesn't fit, such buffer won't be taken back
+            return bytearray(size)
+        with self.lock:
+            if self.free:
+                self.reused += 1
+                return self.free.pop()
+            return self.__allocate(self.size)
+
+    def release(self, data: Union[bytearray, memoryview]) -> bool:
+        """Return buffer to the pool, returns False if it is still in use or doesn't belong to the pool"""
+        buf = data
+        if isinstance(data, memoryview):
+            buf = data.obj
+            try:
+                data.release()
+            except BufferError:
+                return False
+        if not isinstance(buf, bytearray) or len(buf) != self.size:
+            return False
+        if self.__exported(buf):
+            return False
+        with self.lock:
+            if len(self.free) >= self.max_count or any(b is buf for b in self.free):
+                return False
+            self.free.append(buf)
+        return True
+
+    def resize(self, size: int) -> None:
+        """Change size of buffers, buffers of the old size are not taken back"""
+        with self.lock:
+            self.size = size
+            self.free.clear()
+
+    def getStats(self) -> BufferPoolStats:
+        with self.lock:
+            return BufferPoolStats(allocated=self.allocated, reused=self.reused, free=len(self.free))
@@ -1,21 +1,43 @@
 import asyncio
 from asyncio import AbstractEventLoop
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
 import logging
+import socket
+import threading
 
 
 logger = logging.getLogger()
 
 
+@dataclass(slots=True, frozen=True)
+class CommandWriterStats:
+    commands: int  # commands written to the socket
+    writes: int    # socket writes, several commands can go in one write
+
+
 class ClientConnection:
     def __init__(self, io_service: AbstractEventLoop,
-                 address: str, port: int):
+                 address: str, port: int, batch_window: float = 0.0):
         self.loop = io_service
         self.address = address
         self.port = port
         self.timeout = 60
+        # commands sent within the window are written together,
+        # 0 - everything sent before the loop gets to the writer
+        self.batch_window = batch_window
+        self.lock = threading.Lock()
+        self.pending: List[str] = []
+        self.flush_scheduled = False
+        self.drain_task: Optional[asyncio.Task] = None
+        self.commands = 0
+        self.writes = 0
         fut = asyncio.run_coroutine_threadsafe(asyncio.open_connection(self.address, self.port), self.loop)
         logger.info(f'open command connection {self.address}:{self.port}')
         self.reader, self.writer = fut.result(self.timeout)
+        sock = self.writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
     def getTimeout(self) -> int:
         """Get the request/reply timeout.
@@ -33,21 +55,56 @@ class ClientConnection:
     def send(self, message: str) -> None:
         """Sends a string over the open connection.
         param message The string to send. Will have newline appended if needed."""
-        asyncio.run_coroutine_threadsafe(self.__send(message + '\n'), self.loop).add_done_callback(self.__on_done)
+        self.sendMany((message,))
+
+    def sendMany(self, messages: Iterable[str]) -> None:
+        """Sends strings back-to-back in a single write.
+        Commands from other threads can't get between them."""
+        lines = [m if m.endswith('\n') else m + '\n' for m in messages]
+        if not lines:
+            return
+        with self.lock:
+            self.pending.extend(lines)
+            if self.flush_scheduled:
+                return
+            self.flush_scheduled = True
+        if self.batch_window > 0:
+            self.loop.call_soon_threadsafe(self.loop.call_later, self.batch_window, self.__flush)
+        else:
+            self.loop.call_soon_threadsafe(self.__flush)
 
-    def __on_done(self, fut) -> None:
-        res = fut.result()
-        e = fut.exception()
-        if e is not None:
+    def __flush(self) -> None:
+        with self.lock:
+            lines, self.pending = self.pending, []
+            self.flush_scheduled = False
+        if not lines:
+            # written by an earlier flush
+            return
+        if self.writer.is_closing():
+            logger.error('error writing commands %s: connection is closed', lines)
+            return
+        logger.debug(f'writing commands {lines}')
+        self.commands += len(lines)
+        self.writes += 1
+        self.writer.write(''.join(lines).encode())
+        if self.writer.transport.get_write_buffer_size() and self.drain_task is None:
+            self.drain_task = self.loop.create_task(self.__drain())
+
+    async def __drain(self) -> None:
+        try:
+            await asyncio.wait_for(self.writer.drain(), self.timeout)
+        except Exception as e:
             logger.exception('error writing command', exc_info=e)
+        finally:
+            self.drain_task = None
 
-    async def __send(self, message: str) -> None:
-        logger.debug(f'writing command {message}')
-        self.writer.write(message.encode())
-        await asyncio.wait_for(self.writer.drain(), self.timeout)
-        logger.debug(f'done writing command {message}')
+    def getStats(self) -> CommandWriterStats:
+        return CommandWriterStats(commands=self.commands, writes=self.writes)
 
     def close(self) -> None:
-        self.writer.close()
-        asyncio.run_coroutine_threadsafe(self.writer.wait_closed(), self.loop)
+        self.loop.call_soon_threadsafe(self.__close)
 
+    def __close(self) -> None:
+        # commands waiting for the batch window are written first
+        self.__flush()
+        self.writer.close()
@@ -0,0 +1,50 @@
+import threading
+import time
+import logging
+from typing import Dict, Iterable, List
+
+from .client_info import ClientInfo
+
+
+logger = logging.getLogger()
+
+
+class ClientLiveness:
+    """Remembers clients which didn't respond, so they are skipped for dead_timeout seconds"""
+    def __init__(self, dead_timeout: float = 10.0):
+        self.dead_timeout = dead_timeout
+        self.lock = threading.Lock()
+        self.dead: Dict[ClientInfo, float] = dict()
+
+    def markDead(self, item: ClientInfo) -> None:
+        logger.debug('client %s:%i marked dead', item.ip_address, item.control_port)
+        with self.lock:
+            self.dead[item] = time.monotonic()
+
+    def markAlive(self, item: ClientInfo) -> None:
+        with self.lock:
+            self.dead.pop(item, None)
+
+    def isDead(self, item: ClientInfo) -> bool:
+        with self.lock:
+            t = self.dead.get(item)
+            if t is None:
+                return False
+            if time.monotonic() - t > self.dead_timeout:
+                del self.dead[item]
+                return False
+            return True
+
+    def filterAlive(self, client_pool: Iterable[ClientInfo]) -> List[ClientInfo]:
+        """Clients not known to be dead, all of them if every client is dead"""
+        pool = list(client_pool)
+        alive = [item for item in pool if not self.isDead(item)]
+        return alive if alive else pool
+
+    def clear(self) -> None:
+        with self.lock:
+            self.dead.clear()
+
+
+# shared by all agent hosts in the process
+client_liveness = ClientLiveness()
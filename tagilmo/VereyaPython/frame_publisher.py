@@ -0,0 +1,215 @@
+import time
+import logging
+from dataclasses import dataclass
+from multiprocessing import shared_memory, resource_tracker
+from typing import Iterator, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from .timestamped_video_frame import TimestampedVideoFrame, FrameType
+
+
+logger = logging.getLogger()
+
+MAGIC = 0x56455246  # 'VERF'
+
+# Shared memory layout: header, then slots, each slot is a slot header followed by pixels.
+# A frame is published by writing seq_begin, the data, seq_end, and then latest in the header,
+# a reader checks that both sequence numbers of the slot are equal to the one it expects.
+HEADER = np.dtype([('magic', '<u4'), ('slots', '<u4'), ('slot_size', '<u8'), ('latest', '<u8')])
+HEADER_SIZE = 64
+SLOT_HEADER = np.dtype([('seq_begin', '<u8'), ('seq_end', '<u8'),
+                        ('timestamp', '<f8'),
+                        ('pos', '<f8', (5,)),  # x, y, z, yaw, pitch
+                        ('shape', '<u4', (3,)),  # height, width, channels
+                        ('frametype', '<u4'),
+                        ('nbytes', '<u8'),
+                        ('modelViewMatrix', '<f4', (4, 4)),
+                        ('calibrationMatrix', '<f4', (4, 4))])
+SLOT_HEADER_SIZE = 256
+
+
+def slotStride(slot_size: int) -> int:
+    # keep pixels 64 bytes aligned
+    return SLOT_HEADER_SIZE + (slot_size + 63) // 64 * 64
+
+
+class FramePublisher:
+    """Copies incoming frames into a ring of slots in shared memory,
+    FrameSubscriber in another process maps them without pickling.
+    """
+    def __init__(self, slot_size: int, slots: int = 4, name: Optional[str] = None):
+        assert slots >= 2
+        self.slots = slots
+        self.slot_size = slot_size
+        self.stride = slotStride(slot_size)
+        self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                              size=HEADER_SIZE + self.stride * slots)
+        self.name = self.shm.name
+        self.header = np.ndarray((), dtype=HEADER, buffer=self.shm.buf)
+        self.slot_headers = [np.ndarray((), dtype=SLOT_HEADER, buffer=self.shm.buf,
+                                        offset=HEADER_SIZE + i * self.stride) for i in range(slots)]
+        self.slot_pixels = [np.ndarray((slot_size,), dtype=np.uint8, buffer=self.shm.buf,
+                                       offset=HEADER_SIZE + i * self.stride + SLOT_HEADER_SIZE)
+                            for i in range(slots)]
+        self.header['slots'] = slots
+        self.header['slot_size'] = slot_size
+        self.header['latest'] = 0
+        self.header['magic'] = MAGIC
+        self.published = 0
+        self.skipped = 0
+
+    def publish(self, frame: TimestampedVideoFrame) -> bool:
+        """Write frame into the next slot, returns False if it doesn't fit"""
+        pixels = frame.rawPixels.reshape(-1)
+        if pixels.nbytes > self.slot_size:
+            self.skipped += 1
+            logger.error('frame of %i bytes does not fit into shared memory slot of %i bytes',
+                         pixels.nbytes, self.slot_size)
+            return False
+        seq = int(self.header['latest']) + 1
+        i = seq % self.slots
+        slot = self.slot_headers[i]
+        slot['seq_begin'] = seq
+        self.slot_pixels[i][:pixels.nbytes] = pixels
+        slot['timestamp'] = frame.timestamp
+        slot['pos'] = (frame.xPos, frame.yPos, frame.zPos, frame.yaw, frame.pitch)
+        slot['shape'] = (frame.iHeight, frame.iWidth, frame.iCh)
+        slot['frametype'] = int(frame.frametype)
+        slot['nbytes'] = pixels.nbytes
+        slot['modelViewMatrix'] = frame.modelViewMatrix
+        slot['calibrationMatrix'] = frame.calibrationMatrix
+        slot['seq_end'] = seq
+        self.header['latest'] = seq
+        self.published += 1
+        return True
+
+    def close(self) -> None:
+        """Release and remove shared memory, subscribers keep their mapping until they close"""
+        if self.shm is None:
+            return
+        self.header = self.slot_headers = self.slot_pixels = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+
+@dataclass(slots=True, frozen=True)
+class SharedFrame:
+    seq: int
+    timestamp: float
+    frametype: FrameType
+    xPos: float
+    yPos: float
+    zPos: float
+    yaw: float
+    pitch: float
+    modelViewMatrix: npt.NDArray[np.float32]
+    calibrationMatrix: npt.NDArray[np.float32]
+    # all channels as received, bottom row first, view into shared memory
+    rawPixels: npt.NDArray[np.uint8]
+    # seq_begin field of the slot, to check the frame wasn't overwritten
+    _slot: np.ndarray
+
+    @property
+    def pixels(self) -> npt.NDArray[np.uint8]:
+        """Top-to-bottom image, negative-stride view into shared memory"""
+        return np.flip(self.rawPixels[:, :, :3], 0)
+
+    def isValid(self) -> bool:
+        """False if the publisher started overwriting the slot, the views are garbage then"""
+        return int(self._slot['seq_begin']) == self.seq
+
+
+class FrameSubscriber:
+    """Maps shared memory of FramePublisher, usually in another process"""
+    def __init__(self, name: str):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # python < 3.13, don't let resource tracker remove memory owned by publisher
+            self.shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.header = np.ndarray((), dtype=HEADER, buffer=self.shm.buf)
+        if int(self.header['magic']) != MAGIC:
+            raise RuntimeError(f'shared memory {name} is not a frame ring')
+        self.slots = int(self.header['slots'])
+        self.slot_size = int(self.header['slot_size'])
+        self.stride = slotStride(self.slot_size)
+        self.last_seq = int(self.header['latest'])
+        self.received = 0
+        self.missed = 0
+
+    def __frame(self, seq: int) -> Optional[SharedFrame]:
+        offset = HEADER_SIZE + (seq % self.slots) * self.stride
+        slot = np.ndarray((), dtype=SLOT_HEADER, buffer=self.shm.buf, offset=offset)
+        if int(slot['seq_end']) != seq or int(slot['seq_begin']) != seq:
+            return None
+        # copies of small fields, views of pixels
+        shape = tuple(int(v) for v in slot['shape'])
+        pos = slot['pos'].copy()
+        frame = SharedFrame(seq=seq, timestamp=float(slot['timestamp']),
+                            frametype=FrameType(int(slot['frametype'])),
+                            xPos=pos[0], yPos=pos[1], zPos=pos[2], yaw=pos[3], pitch=pos[4],
+                            modelViewMatrix=slot['modelViewMatrix'].copy(),
+                            calibrationMatrix=slot['calibrationMatrix'].copy(),
+                            rawPixels=np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf,
+                                                 offset=offset + SLOT_HEADER_SIZE),
+                            _slot=slot)
+        # the slot could be overwritten while reading
+        return frame if frame.isValid() else None
+
+    def latestSeq(self) -> int:
+        return int(self.header['latest'])
+
+    def latest(self) -> Optional[SharedFrame]:
+        """The most recent frame, None if there are no new frames"""
+        seq = self.latestSeq()
+        if seq <= self.last_seq:
+            return None
+        frame = self.__frame(seq)
+        self.missed += seq - self.last_seq - (frame is not None)
+        self.last_seq = seq
+        if frame is not None:
+            self.received += 1
+        return frame
+
+    def next(self) -> Optional[SharedFrame]:
+        """The oldest frame not seen yet, None if there are no new frames.
+        Frames that were already overwritten are counted as missed"""
+        while True:
+            latest = self.latestSeq()
+            if latest <= self.last_seq:
+                return None
+            # the slot after latest may be being written
+            oldest = max(latest - self.slots + 2, 1)
+            seq = max(self.last_seq + 1, oldest)
+            self.missed += seq - self.last_seq - 1
+            self.last_seq = seq
+            frame = self.__frame(seq)
+            if frame is not None:
+                self.received += 1
+                return frame
+            self.missed += 1
+
+    def frames(self, timeout: Optional[float] = None, poll: float = 0.001) -> Iterator[SharedFrame]:
+        """Yield frames in order, stops after timeout seconds without new frames"""
+        t0 = time.monotonic()
+        while True:
+            frame = self.next()
+            if frame is not None:
+                yield frame
+                t0 = time.monotonic()
+                continue
+            if timeout is not None and time.monotonic() - t0 > timeout:
+                return
+            time.sleep(poll)
+
+    def close(self) -> None:
+        """Frames returned before must not be used after that"""
+        self.header = None
+        try:
+            self.shm.close()
+        except BufferError:
+            logger.warning('shared frames are still referenced, memory will be unmapped on exit')
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import logging
+from asyncio import AbstractEventLoop
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+logger = logging.getLogger()
+
+
+@dataclass(slots=True, frozen=True)
+class IoRuntimeStats:
+    attached: int      # agent hosts using the runtime
+    max_workers: int   # executor threads running callbacks
+    uvloop: bool
+
+
+def newEventLoop(use_uvloop: bool = True) -> AbstractEventLoop:
+    if use_uvloop and uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+class IoRuntime:
+    """Event loop running in its own thread with a bounded executor for callbacks.
+
+    Several AgentHosts may share one runtime instead of each running
+    its own loop, thread and default executor.
+    """
+    def __init__(self, max_workers: Optional[int] = None, use_uvloop: bool = True):
+        self.loop = newEventLoop(use_uvloop)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='vereya-cb')
+        self.loop.set_default_executor(self.executor)
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True, name='vereya-io')
+        self.thread.start()
+        self.lock = threading.Lock()
+        self.attached = 0
+        logger.info('io runtime started, loop %s', type(self.loop).__name__)
+
+    def attach(self) -> None:
+        with self.lock:
+            self.attached += 1
+
+    def detach(self) -> None:
+        with self.lock:
+            self.attached -= 1
+
+    def isRunning(self) -> bool:
+        return not self.loop.is_closed()
+
+    def stop(self) -> None:
+        """Stop the loop, agent hosts attached to the runtime can't be used after that"""
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.executor.shutdown(wait=False)
+
+    def getStats(self) -> IoRuntimeStats:
+        with self.lock:
+            return IoRuntimeStats(attached=self.attached,
+                                  max_workers=self.executor._max_workers,
+                                  uvloop=uvloop is not None and isinstance(self.loop, uvloop.Loop))
+
+
+shared_runtime: Optional[IoRuntime] = None
+shared_runtime_lock = threading.Lock()
+
+
+def getSharedRuntime() -> IoRuntime:
+    """Process-wide runtime, started on first use"""
+    global shared_runtime
+    with shared_runtime_lock:
+        if shared_runtime is None or not shared_runtime.isRunning():
+            shared_runtime = IoRuntime()
+        return shared_runtime
@@ -0,0 +1,76 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Generic, Iterator, List, TypeVar
+
+
+T = TypeVar('T')
+
+
+@dataclass(slots=True, frozen=True)
+class RingBufferStats:
+    count: int      # items in the buffer
+    size: int       # bytes in the buffer
+    appended: int   # items appended since creation
+    dropped: int    # oldest items discarded to stay within capacity
+
+
+class RingBuffer(Generic[T]):
+    """Bounded FIFO, the oldest items are dropped when the buffer exceeds
+    max_count items or max_bytes bytes, 0 means no limit.
+
+    Not thread-safe, AgentHost accesses it under world_state_mutex.
+    """
+    def __init__(self, sizeof: Callable[[T], int], max_count: int = 0, max_bytes: int = 0):
+        self.sizeof = sizeof
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.items: Deque[T] = deque()
+        self.sizes: Deque[int] = deque()
+        self.size = 0
+        self.appended = 0
+        self.dropped = 0
+
+    def setCapacity(self, max_count: int = 0, max_bytes: int = 0) -> None:
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.__trim()
+
+    def append(self, item: T) -> None:
+        size = self.sizeof(item)
+        self.items.append(item)
+        self.sizes.append(size)
+        self.size += size
+        self.appended += 1
+        self.__trim()
+
+    def __trim(self) -> None:
+        # the newest item is kept even if it alone exceeds max_bytes
+        while len(self.items) > 1 and ((self.max_count and len(self.items) > self.max_count) or
+                                       (self.max_bytes and self.size > self.max_bytes)):
+            self.items.popleft()
+            self.size -= self.sizes.popleft()
+            self.dropped += 1
+
+    def drain(self) -> List[T]:
+        """Take all items, oldest first"""
+        result = list(self.items)
+        self.items.clear()
+        self.sizes.clear()
+        self.size = 0
+        return result
+
+    def clear(self) -> None:
+        self.dropped += len(self.items)
+        self.items.clear()
+        self.sizes.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.items)
+
+    def getStats(self) -> RingBufferStats:
+        return RingBufferStats(count=len(self.items), size=self.size,
+                               appended=self.appended, dropped=self.dropped)
@@ -7,7 +7,7 @@ import asyncio
 from asyncio import AbstractEventLoop
 import logging
 from typing import Callable, Optional
-from .tcp_server import TCPServer
+from .tcp_server import TCPServer, DispatchMode, DispatchStats
 from .timestamped_string import TimestampedString
 from .timestamped_unsigned_char_vector import TimestampedUnsignedCharVector
 from .timestamped_string_writer import TimestampedStringWriter
@@ -18,12 +18,13 @@ class StringServer:
                  io_service: AbstractEventLoop,
                  port: int,
                  handle_string: Callable[[TimestampedString], None],
-                 log_name: str):
+                 log_name: str,
+                 dispatch: DispatchMode = DispatchMode.ORDERED):
         self.io_service = io_service
         self.port = port
         self.handle_string = handle_string
         self.log_name = log_name
-        self.server = TCPServer(self.io_service, self.port, self.__cb, self.log_name)
+        self.server = TCPServer(self.io_service, self.port, self.__cb, self.log_name, dispatch)
         self.writer: TimestampedStringWriter = None
 
     def start(self) -> None:
@@ -51,6 +52,12 @@ class StringServer:
     def getPort(self) -> int:
         return self.server.getPort()
 
+    def setDispatchMode(self, dispatch: DispatchMode) -> None:
+        self.server.setDispatchMode(dispatch)
+
+    def getDispatchStats(self) -> DispatchStats:
+        return self.server.getDispatchStats()
+
     def close(self) -> None:
         self.server.close()
 
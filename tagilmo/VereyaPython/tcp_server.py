@@ -1,23 +1,91 @@
 import asyncio
-import functools
 from asyncio import exceptions
-from asyncio import AbstractEventLoop, Server, Future
+from asyncio import AbstractEventLoop, Server, Task
+from dataclasses import dataclass
+from enum import IntEnum, auto
 import logging
 import random
 import time
 from typing import List, Callable, Optional
 from .timestamped_unsigned_char_vector import TimestampedUnsignedCharVector
+from .buffer_pool import BufferPool
 
 
 logger = logging.getLogger()
 
 
+class DispatchMode(IntEnum):
+    """Specifies how received messages are passed to the callback.
+    Messages are always delivered one at a time in the order they were received.
+    """
+    ORDERED = auto()      # Queue every message, stop reading the socket when the queue is full.
+    LATEST_ONLY = auto()  # Keep only the most recent pending message, superseded ones are dropped.
+
+
+@dataclass(slots=True, frozen=True)
+class DispatchStats:
+    received: int   # messages read from the socket
+    processed: int  # messages passed to the callback
+    dropped: int    # messages superseded before reaching the callback
+    queued: int     # messages waiting for the callback now
+    max_queued: int # largest queue length seen
+
+
+class PooledReceiver(asyncio.BufferedProtocol):
+    """Reads size-prefixed messages directly into buffers taken from the server's pool"""
+
+    def __init__(self, server: 'TCPServer'):
+        self.server = server
+        self.transport: Optional[asyncio.Transport] = None
+        self.header = bytearray(4)
+        self.body: Optional[memoryview] = None
+        self.expected = 0
+        self.pos = 0
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+        self.server.transports.append(transport)
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self.body is None:
+            return memoryview(self.header)[self.pos:]
+        return self.body[self.pos:]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self.pos += nbytes
+        if self.body is None:
+            if self.pos < len(self.header):
+                return
+            self.expected = int.from_bytes(self.header, byteorder='big', signed=False)
+            self.pos = 0
+            assert self.server.buffer_pool is not None
+            self.body = memoryview(self.server.buffer_pool.acquire(self.expected))[:self.expected]
+        if self.pos < self.expected:
+            return
+        message = TimestampedUnsignedCharVector(data=self.body, timestamp=time.time())
+        self.body = None
+        self.pos = 0
+        if self.server.confirm_with_fixed_reply:
+            self.transport.write(self.server.fixed_reply)
+        self.server.deliver(message, self.transport)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self.body is not None:
+            self.server.discard(self.body)
+            self.body = None
+        if self.transport in self.server.transports:
+            self.server.transports.remove(self.transport)
+
+
 class TCPServer:
     def __init__(self,
                  io_service: AbstractEventLoop,
                  port: int,
                  callback: Callable[[TimestampedUnsignedCharVector], None],
-                 log_name: str):
+                 log_name: str,
+                 dispatch: DispatchMode = DispatchMode.ORDERED,
+                 queue_size: int = 64,
+                 buffer_pool: Optional[BufferPool] = None):
         self.io_service = io_service
         self.port = port
         self.onMessageReceived = callback
@@ -28,6 +96,17 @@ class TCPServer:
         self.server: Optional[Server] = None
         self.writer: List[asyncio.StreamWriter] = []
         self.closing = False
+        self.dispatch = dispatch
+        self.queue_size = queue_size
+        # if set, messages are received into pooled buffers and passed as memoryview
+        self.buffer_pool = buffer_pool
+        self.transports: List[asyncio.BaseTransport] = []
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[Task] = None
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.max_queued = 0
 
         assert(not asyncio.iscoroutinefunction(callback))
 
@@ -35,6 +114,11 @@ class TCPServer:
         asyncio.run_coroutine_threadsafe(self.startAccept(), self.io_service).result()
 
     async def startAccept(self) -> None:
+        if self.worker is None:
+            # single worker per server keeps messages in order
+            # and limits the number of busy executor threads
+            self.queue = asyncio.Queue(self.queue_size)
+            self.worker = asyncio.create_task(self.__dispatch())
         port = self.port
         if port == 0:
             # attempt to assign a port from a predefined range
@@ -44,7 +128,7 @@ class TCPServer:
                 port = random.randint(port_min, port_max)
                 try:
                     logger.info('starting sever with port %i', port)
-                    self.server = await asyncio.start_server(self.__cb, None, port)
+                    self.server = await self.__listen(port)
                     logger.info('ok')
                     self.port = port
                     return
@@ -52,52 +136,117 @@ class TCPServer:
                     logger.exception(e)
                     continue
         else:
-            self.server = await asyncio.start_server(self.__cb, None, self.port)
+            self.server = await self.__listen(self.port)
+
+    async def __listen(self, port: int) -> Server:
+        if self.buffer_pool is None:
+            return await asyncio.start_server(self.__cb, None, port)
+        return await self.io_service.create_server(lambda: PooledReceiver(self), None, port)
 
     async def __cb(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
         self.writer.append(writer)
-        while not self.closing:
-            # read header
-            try:
-                err = 'reading size in bytes'
-                data = await reader.readexactly(4)
-                expected = int.from_bytes(data, byteorder='big', signed=False)
-                err = 'reading bytes'
-                data = await reader.readexactly(expected)
-                result = TimestampedUnsignedCharVector(data=data, timestamp=time.time())
-            except exceptions.IncompleteReadError as e:
-                if self.closing:
-                    continue
-                logger.debug("exception reading from stream in " + err
-                        + " " + self.log_name, exc_info=e)
-                await asyncio.sleep(1)
-                continue
+        try:
+            while not self.closing:
+                # read header
+                try:
+                    err = 'reading size in bytes'
+                    data = await reader.readexactly(4)
+                    expected = int.from_bytes(data, byteorder='big', signed=False)
+                    err = 'reading bytes'
+                    data = await reader.readexactly(expected)
+                    result = TimestampedUnsignedCharVector(data=data, timestamp=time.time())
+                except exceptions.IncompleteReadError as e:
+                    # the client closed the connection, it will open a new one
+                    if not self.closing:
+                        logger.debug("connection closed while " + err
+                                + " in " + self.log_name, exc_info=e)
+                    break
+
+                if self.confirm_with_fixed_reply:
+                    writer.write(self.fixed_reply)
+                    await writer.drain()
+
+                await self.__enqueue(result)
+        except asyncio.CancelledError:
+            # the agent host is stopping
+            pass
+        finally:
+            writer.close()
+
+    async def __enqueue(self, message: TimestampedUnsignedCharVector) -> None:
+        assert self.queue is not None
+        if self.dispatch == DispatchMode.ORDERED:
+            # blocks reading from the socket if the callback is too slow
+            await self.queue.put(message)
+            self.__count()
+        else:
+            self.__put(message)
+
+    def __put(self, message: TimestampedUnsignedCharVector) -> None:
+        assert self.queue is not None
+        if self.dispatch == DispatchMode.LATEST_ONLY:
+            # drop superseded messages before they are decoded
+            while not self.queue.empty():
+                self.discard(self.queue.get_nowait().data)
+                self.queue.task_done()
+                self.dropped += 1
+        self.queue.put_nowait(message)
+        self.__count()
 
-            if self.confirm_with_fixed_reply:
-                writer.write(self.fixed_reply)
-                await writer.drain()
+    def __count(self) -> None:
+        assert self.queue is not None
+        self.received += 1
+        self.max_queued = max(self.max_queued, self.queue.qsize())
 
+    def deliver(self, message: TimestampedUnsignedCharVector, transport: asyncio.BaseTransport) -> None:
+        """enqueue message read by PooledReceiver"""
+        assert self.queue is not None
+        if self.dispatch == DispatchMode.ORDERED and self.queue.full():
+            # same backpressure as in __cb: stop reading until there is space in the queue
+            transport.pause_reading()
+            task = self.io_service.create_task(self.__enqueue(message))
+            task.add_done_callback(lambda _: transport.is_closing() or transport.resume_reading())
+        else:
+            self.__put(message)
+
+    def discard(self, data) -> None:
+        """give buffer of the message, which won't be passed to the callback, back to the pool"""
+        if self.buffer_pool is not None:
+            self.buffer_pool.release(data)
+
+    async def __dispatch(self) -> None:
+        assert self.queue is not None
+        while True:
+            message = await self.queue.get()
             try:
                 # run in threadpool, who knows how fast is our callback
-                fut = self.io_service.run_in_executor(None, functools.partial(self.onMessageReceived, result))
-                fut.add_done_callback(self.__done)
+                fut = self.io_service.run_in_executor(None, self.onMessageReceived, message)
             except RuntimeError as e:
                 # work around https://github.com/python/cpython/issues/99704
                 logger.debug('error scheduling callback, closing the server', exc_info=e)
-                self.close()
+                self.closing = True
                 break
-        writer.close()
+            try:
+                result = await fut
+                if result is not None:
+                    logger.info(f'done with result {result}')
+            except Exception as e:
+                logger.exception(f"Error running callback in {self.log_name}", exc_info=e)
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+                # don't keep the last message alive, its buffer may go back to the pool
+                message = fut = None
 
-    def __done(self, fut: Future) -> None:
-        e = fut.exception()
-        if e is not None:
-            logger.exception(f"Error running callback in {self.log_name}", exc_info=e)
-            return
-        if not fut.done():
-            return
-        result = fut.result()
-        if result is not None:
-            logger.info(f'done with result {result}')
+    def setDispatchMode(self, dispatch: DispatchMode) -> None:
+        self.dispatch = dispatch
+
+    def getDispatchStats(self) -> DispatchStats:
+        return DispatchStats(received=self.received,
+                             processed=self.processed,
+                             dropped=self.dropped,
+                             queued=self.queue.qsize() if self.queue is not None else 0,
+                             max_queued=self.max_queued)
 
     def expectSizeHeader(self, expect_size_header: bool):
         pass
@@ -116,7 +265,12 @@ class TCPServer:
             self.server.close()
         except TypeError as e:
             logger.error(f"error on stopping server {self}", exc_info=e)
+        for transport in list(self.transports):
+            self.io_service.call_soon_threadsafe(transport.close)
         asyncio.run_coroutine_threadsafe(self.server.wait_closed(), self.io_service).result()
+        if self.worker is not None:
+            # close may be called from the callback itself, don't wait for the worker
+            self.io_service.call_soon_threadsafe(self.worker.cancel)
         for writer in self.writer:
             logger.debug(f'closing {writer}')
             self.io_service.call_soon_threadsafe(writer.close)
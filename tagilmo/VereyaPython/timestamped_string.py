@@ -1,4 +1,3 @@
-import time
 from dataclasses import dataclass
 from .timestamped_unsigned_char_vector import TimestampedUnsignedCharVector
 
@@ -10,4 +9,4 @@ class TimestampedString:
 
     @staticmethod
     def from_vector(message: TimestampedUnsignedCharVector) -> 'TimestampedString':
-        return TimestampedString(time.time(), message.data.decode())
+        return TimestampedString(message.timestamp, message.data.decode())
@@ -3,4 +3,4 @@ from dataclasses import dataclass
 @dataclass(slots=True, frozen=True)
 class TimestampedUnsignedCharVector:
     timestamp: float
-    data: bytes
+    data: bytes  # or memoryview over a pooled buffer
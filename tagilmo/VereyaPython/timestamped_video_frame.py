@@ -1,5 +1,7 @@
 from enum import IntEnum
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from typing import Callable, Optional, Union
+import copy
 import logging
 import json
 
@@ -26,6 +28,11 @@ class FrameType(IntEnum):
     COLOUR_MAP=3                # !< 24bpp colour map
     _MAX_FRAME_TYPE=4
 
+# header fields decoded on first access
+HEADER_FIELDS = frozenset(('calibrationMatrix', 'modelViewMatrix', 'pitch', 'yaw',
+                           'xPos', 'yPos', 'zPos', 'iHeight', 'iWidth', 'iCh'))
+
+
 # should be frozen but init will be too ugly
 @dataclass(slots=True, frozen=False, init=False)
 class TimestampedVideoFrame:
@@ -40,7 +47,8 @@ class TimestampedVideoFrame:
     frametype: FrameType
 
     # BMP image stored in bytes received by TCP from Vereya
-    _pixels: bytes
+    # or memoryview over pooled receive buffer
+    _pixels: Union[bytes, memoryview]
 
     # The pitch of the player at render time
     pitch: float = 0
@@ -63,14 +71,40 @@ class TimestampedVideoFrame:
 
     iCh: int = 0
 
+    # gives receive buffer back to the pool
+    _release: Optional[Callable[[memoryview], bool]] = None
+
+    # json header, decoded on first access to any of HEADER_FIELDS
+    _header: bytes = b''
+
+    # cached result of pixels
+    _rgb: Optional[npt.NDArray[np.uint8]] = None
+
     def __init__(self, message: TimestampedUnsignedCharVector,
-                 frametype: FrameType = FrameType.VIDEO):
+                 frametype: FrameType = FrameType.VIDEO,
+                 release: Optional[Callable[[memoryview], bool]] = None):
 
         self.timestamp = message.timestamp
         self.frametype = frametype
+        self._release = release
+        self._rgb = None
         jo_len = int.from_bytes(message.data[0:4], byteorder='big', signed=False)
-        json_string = message.data[4:jo_len+4].decode('utf-8')
-        loadedjson = json.loads(json_string)
+        # copy header, so it doesn't keep the receive buffer exported
+        self._header = bytes(message.data[4:jo_len+4])
+        jo_len = jo_len + 4
+        # no copy if data is memoryview
+        received_img_bytes = message.data[jo_len:]
+        self._pixels = received_img_bytes
+
+    def __getattr__(self, name: str):
+        # called only for slots not set yet
+        if name not in HEADER_FIELDS or not self._header:
+            raise AttributeError(name)
+        self.__decode()
+        return object.__getattribute__(self, name)
+
+    def __decode(self) -> None:
+        loadedjson = json.loads(self._header.decode('utf-8'))
         self.xPos = loadedjson['x']
         self.yPos = loadedjson['y']
         self.zPos = loadedjson['z']
@@ -82,10 +116,81 @@ class TimestampedVideoFrame:
         self.modelViewMatrix = np.reshape(np.asarray(loadedjson['modelViewMatrix'], dtype=np.dtype(np.float32)), (4,4))
 
         self.calibrationMatrix = np.reshape(np.asarray(loadedjson['projectionMatrix'], dtype=np.dtype(np.float32)), (4,4))
-        jo_len = jo_len + 4
-        received_img_bytes = message.data[jo_len:]
-        self._pixels = received_img_bytes
+        self._header = b''
+
+    def release(self) -> None:
+        """Give the receive buffer back to the pool.
+        Pixels can't be accessed after that, unless they were already cached by
+        pixels, the buffer is reused only if no views over it are alive."""
+        release, self._release = getattr(self, '_release', None), None
+        if release is None:
+            return
+        pixels, self._pixels = self._pixels, b''
+        release(pixels)
+
+    def __del__(self):
+        self.release()
+
+    def __deepcopy__(self, memo) -> 'TimestampedVideoFrame':
+        result = TimestampedVideoFrame.__new__(TimestampedVideoFrame)
+        for f in fields(self):
+            if f.name == '_pixels':
+                # the copy owns its pixels
+                value = bytes(self._pixels)
+            elif f.name == '_release':
+                value = None
+            elif f.name == '_rgb':
+                # read-only, can be shared
+                value = self._rgb
+            else:
+                value = copy.deepcopy(getattr(self, f.name), memo)
+            setattr(result, f.name, value)
+        return result
+
+    def __getstate__(self) -> dict:
+        # for process callbacks: the copy owns its pixels, header fields
+        # not decoded yet stay in the header
+        state = dict()
+        for f in fields(self):
+            try:
+                value = object.__getattribute__(self, f.name)
+            except AttributeError:
+                continue
+            if f.name == '_pixels':
+                value = bytes(value)
+            elif f.name in ('_release', '_rgb'):
+                value = None
+            state[f.name] = value
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of pixel data as received"""
+        return len(self._pixels)
+
+    @property
+    def rawPixels(self) -> npt.NDArray[np.uint8]:
+        """All channels as received (BGRA for 4-channel frames), bottom row first, no copy"""
+        return np.frombuffer(self._pixels, dtype="uint8").reshape((self.iHeight, self.iWidth, self.iCh))
+
+    @property
+    def pixelsView(self) -> npt.NDArray[np.uint8]:
+        """Top-to-bottom image without copying: negative-stride view over the received buffer"""
+        return np.flip(self.rawPixels[:,:,:3], 0)
 
     @property
-    def pixels(self):
-        return np.flip(np.frombuffer(self._pixels, dtype="uint8").reshape((self.iHeight, self.iWidth, self.iCh))[:,:,:3],0)
+    def pixels(self) -> npt.NDArray[np.uint8]:
+        """Top-to-bottom C-contiguous image, computed once per frame and shared, read-only"""
+        if self._rgb is None:
+            rgb = np.ascontiguousarray(self.pixelsView)
+            rgb.flags.writeable = False
+            self._rgb = rgb
+        return self._rgb
+
+    def copyPixels(self) -> npt.NDArray[np.uint8]:
+        """Writable C-contiguous copy of pixels owned by the caller"""
+        return np.array(self.pixels, order='C')
@@ -1,20 +1,26 @@
 import asyncio
 from asyncio import AbstractEventLoop
 import logging
-from typing import Callable
+from typing import Callable, Optional
 import numpy
-from .tcp_server import TCPServer
+from .tcp_server import TCPServer, DispatchMode, DispatchStats
+from .buffer_pool import BufferPool
 from .timestamped_unsigned_char_vector import TimestampedUnsignedCharVector
 from .timestamped_video_frame import Transform, FrameType, TimestampedVideoFrame
 
 logger = logging.getLogger()
 
+# room for the json header in front of the pixels
+FRAME_HEADER_RESERVE = 4096
+
 
 class VideoServer:
     def __init__(self, loop: AbstractEventLoop,
                  port: int,
                  channels: int, frametype: FrameType,
-                 handle_frame: Callable[[TimestampedVideoFrame], None]):
+                 handle_frame: Callable[[TimestampedVideoFrame], None],
+                 dispatch: DispatchMode = DispatchMode.LATEST_ONLY,
+                 width: int = 0, height: int = 0):
         self.io_service = loop
         self.handle_frame = handle_frame
         self.channels = channels
@@ -25,7 +31,13 @@ class VideoServer:
         self.transform = Transform.REVERSE_SCANLINE
         self.port = port
         self.writers = list()
-        self.server = TCPServer(self.io_service, port=self.port, callback=self.__cb, log_name="video")
+        # frames are received into pooled buffers if their size is known
+        self.buffer_pool: Optional[BufferPool] = None
+        if width and height:
+            self.buffer_pool = BufferPool(self.frameBufferSize(width, height))
+        self.server = TCPServer(self.io_service, port=self.port, callback=self.__cb,
+                                log_name="video", dispatch=dispatch,
+                                buffer_pool=self.buffer_pool)
 
     def start(self) -> None:
         fut = asyncio.run_coroutine_threadsafe(self.server.startAccept(), self.io_service)
@@ -38,8 +50,18 @@ class VideoServer:
         else:
             logger.warn('failed to start video server on port %d', self.getPort())
 
+    def frameBufferSize(self, width: int, height: int) -> int:
+        return width * height * self.channels + FRAME_HEADER_RESERVE
+
+    def setFrameSize(self, width: int, height: int) -> None:
+        """Resize pooled buffers, frames bigger than the buffers are received into new ones"""
+        if self.buffer_pool is None or self.buffer_pool.size == self.frameBufferSize(width, height):
+            return
+        self.buffer_pool.resize(self.frameBufferSize(width, height))
+
     def __cb(self, message: TimestampedUnsignedCharVector) -> None:
-        frame = TimestampedVideoFrame(message, self.frametype)
+        release = self.buffer_pool.release if self.buffer_pool is not None else None
+        frame = TimestampedVideoFrame(message, self.frametype, release)
         self.received_frames += 1
         self.handle_frame(frame)
 
@@ -56,6 +78,12 @@ class VideoServer:
     def getPort(self) -> int:
         return self.server.getPort()
 
+    def setDispatchMode(self, dispatch: DispatchMode) -> None:
+        self.server.setDispatchMode(dispatch)
+
+    def getDispatchStats(self) -> DispatchStats:
+        return self.server.getDispatchStats()
+
     def getChannels(self) -> int:
         return self.channels
 
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List
+from typing import List, Tuple
 from .video_server import TimestampedVideoFrame
 from .timestamped_reward import TimestampedReward
 from .timestamped_string import TimestampedString
@@ -31,3 +31,34 @@ class WorldState:
         self.video_frames_colourmap.clear()
         self.mission_control_messages.clear()
         self.errors.clear()
+
+    def snapshot(self) -> 'WorldStateSnapshot':
+        """Shallow read-only copy, frames and messages are shared"""
+        return WorldStateSnapshot(
+            has_mission_begun=self.has_mission_begun,
+            is_mission_running=self.is_mission_running,
+            number_of_video_frames_since_last_state=self.number_of_video_frames_since_last_state,
+            number_of_rewards_since_last_state=self.number_of_rewards_since_last_state,
+            number_of_observations_since_last_state=self.number_of_observations_since_last_state,
+            video_frames=tuple(self.video_frames),
+            video_frames_colourmap=tuple(self.video_frames_colourmap),
+            rewards=tuple(self.rewards),
+            observations=tuple(self.observations),
+            mission_control_messages=tuple(self.mission_control_messages),
+            errors=tuple(self.errors))
+
+
+@dataclass(slots=True, frozen=True)
+class WorldStateSnapshot:
+    """WorldState as returned by AgentHost.peekWorldState"""
+    has_mission_begun: bool
+    is_mission_running: bool
+    number_of_video_frames_since_last_state: int
+    number_of_rewards_since_last_state: int
+    number_of_observations_since_last_state: int
+    video_frames: Tuple[TimestampedVideoFrame, ...]
+    video_frames_colourmap: Tuple[TimestampedVideoFrame, ...]
+    rewards: Tuple[TimestampedReward, ...]
+    observations: Tuple[TimestampedString, ...]
+    mission_control_messages: Tuple[TimestampedString, ...]
+    errors: Tuple[TimestampedString, ...]
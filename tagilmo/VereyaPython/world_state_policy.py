@@ -6,6 +6,7 @@ class VideoPolicy(IntEnum):
     """
     LATEST_FRAME_ONLY = auto() #  Discard all but the most recent frame. This is the default.
     KEEP_ALL_FRAMES = auto()           # Attempt to store all of the frames.
+    KEEP_RECENT_FRAMES = auto()        # Store frames in a bounded buffer, see AgentHost.drainFrames, world state gets the most recent one.
 
 
 class RewardsPolicy(IntEnum):
@@ -20,5 +21,6 @@ class ObservationsPolicy(IntEnum):
     """
     LATEST_OBSERVATION_ONLY = auto()   # Discard all but the most recent observation. This is the default.
     KEEP_ALL_OBSERVATIONS = auto()      # Attempt to store all the observations.
+    KEEP_RECENT_OBSERVATIONS = auto()   # Store observations in a bounded buffer, see AgentHost.drainObservations, world state gets the most recent one.
 
 
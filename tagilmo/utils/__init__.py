@@ -1,2 +1 @@
-
-from .segments import segment_mapping
+from .segments import segment_mapping, segmentation_decoder, SegmentationDecoder
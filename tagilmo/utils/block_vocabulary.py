@@ -0,0 +1,67 @@
+import threading
+from typing import Dict, Iterable, List, Sequence
+
+import numpy
+
+
+# ids are 0 .. MAX_BLOCKS - 1, masks have MAX_BLOCKS + 1 entries, the last one,
+# at index -1, is never an id
+MAX_BLOCKS = int(numpy.iinfo(numpy.int16).max)
+
+
+class BlockVocabulary:
+    """Interned block names, every name gets an int16 id which never changes.
+
+    Sets of blocks are boolean arrays indexed by block id, so
+    vocabulary.mask(names)[grid] marks cells of a grid of ids with one of names.
+    Masks cover all possible ids, so they stay valid as new names are added.
+    """
+
+    def __init__(self, names: Iterable[str] = ('air',)):
+        self.lock = threading.Lock()
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = dict()
+        for name in names:
+            self.id(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def id(self, name: str) -> int:
+        i = self.ids.get(name)
+        if i is not None:
+            return i
+        with self.lock:
+            i = self.ids.get(name)
+            if i is None:
+                i = len(self.names)
+                if i >= MAX_BLOCKS:
+                    raise OverflowError('too many block names')
+                self.names.append(name)
+                self.ids[name] = i
+        return i
+
+    def name(self, i: int) -> str:
+        return self.names[i]
+
+    def encode(self, names: Sequence[str]) -> numpy.ndarray:
+        """int16 ids of names, new names are added"""
+        try:
+            return numpy.fromiter(map(self.ids.__getitem__, names), dtype=numpy.int16, count=len(names))
+        except KeyError:
+            return numpy.fromiter(map(self.id, names), dtype=numpy.int16, count=len(names))
+
+    def decode(self, ids: numpy.ndarray) -> List[str]:
+        names = self.names
+        return [names[i] for i in numpy.ravel(ids).tolist()]
+
+    def mask(self, names: Iterable[str]) -> numpy.ndarray:
+        """Boolean array of MAX_BLOCKS + 1 entries, True for ids of names"""
+        ids = [self.id(name) for name in names]
+        table = numpy.zeros(MAX_BLOCKS + 1, dtype=bool)
+        table[ids] = True
+        return table
+
+
+# shared by all agents of the process, so ids are the same everywhere
+block_vocabulary = BlockVocabulary()
@@ -0,0 +1,341 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import concurrent.futures
+from dataclasses import dataclass
+from enum import IntEnum, auto
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger('vereya')
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    NORMAL = auto()
+    LOW = auto()
+
+
+@dataclass(slots=True, frozen=True)
+class CallbackPolicy:
+    priority: Priority = Priority.NORMAL
+    # a trigger while the callback is queued or running makes it run once more
+    # on the newest data, otherwise such triggers are dropped
+    coalesce: bool = True
+    # seconds, results finished later than that after the trigger are discarded
+    deadline: Optional[float] = None
+    # run in the process pool, the callback must be picklable,
+    # it gets the arguments instead of reading the observer
+    process: bool = False
+
+
+@dataclass(slots=True, frozen=True)
+class CallbackStats:
+    triggered: int
+    runs: int
+    coalesced: int        # triggers served by a queued or a repeated run
+    dropped: int          # triggers ignored while running, without coalescing
+    expired: int          # results discarded after the deadline
+    failed: int
+    queue_time: float     # mean seconds from trigger to start
+    run_time: float       # mean seconds
+    max_queue_time: float
+    max_run_time: float
+
+
+@dataclass(slots=True, frozen=True)
+class BatchStats:
+    batches: int
+    items: int
+    replaced: int         # items replaced by a newer one of the same client before running
+    failed: int           # batches which raised
+    batch_size: float     # mean items per batch
+    max_batch_size: int
+    queue_time: float     # mean seconds from submit to the start of the item's batch
+    max_queue_time: float
+    run_time: float       # mean seconds per batch
+    max_run_time: float
+
+
+class CallbackTask:
+    """Callback registered in CallbackExecutor with its state and counters"""
+    def __init__(self, fn: Callable, policy: CallbackPolicy,
+                 on_result: Callable[[Any, float], None],
+                 get_args: Optional[Callable[[], Tuple]] = None):
+        self.fn = fn
+        self.policy = policy
+        self.on_result = on_result
+        self.get_args = get_args
+        self.queued = False
+        self.running = False
+        # triggered while running
+        self.dirty = False
+        # first trigger waiting for a run, latest trigger served by it
+        self.trigger_time = 0.0
+        self.latest_trigger_time = 0.0
+        self.triggered = 0
+        self.runs = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.expired = 0
+        self.failed = 0
+        self.queue_time = 0.0
+        self.run_time = 0.0
+        self.max_queue_time = 0.0
+        self.max_run_time = 0.0
+
+
+class CallbackExecutor:
+    """Runs callbacks in worker threads, or in a process pool, by priority.
+
+    A callback is never queued twice, triggers that arrive meanwhile are merged
+    into one run on the newest data, so a slow callback can't pile up work.
+    """
+    def __init__(self, max_workers: int = 2, process_workers: int = 0):
+        self.condition = threading.Condition()
+        self.queue: List[Tuple[int, int, CallbackTask]] = []
+        self.counter = itertools.count()
+        self.stopped = False
+        self.process_workers = process_workers
+        self.process_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self.threads = [threading.Thread(target=self.__work, daemon=True, name='rob-cb')
+                        for _ in range(max_workers)]
+        for th in self.threads:
+            th.start()
+
+    def add(self, fn: Callable, policy: CallbackPolicy, on_result: Callable[[Any, float], None],
+            get_args: Optional[Callable[[], Tuple]] = None) -> CallbackTask:
+        """on_result(result, timestamp) is called in the worker thread,
+        get_args provides arguments for process callbacks"""
+        if policy.process:
+            if not self.process_workers:
+                raise ValueError('process callbacks need process_workers > 0')
+            with self.condition:
+                if self.process_pool is None:
+                    self.process_pool = concurrent.futures.ProcessPoolExecutor(self.process_workers)
+        return CallbackTask(fn, policy, on_result, get_args)
+
+    def trigger(self, task: CallbackTask) -> None:
+        now = time.time()
+        with self.condition:
+            if self.stopped:
+                return
+            task.triggered += 1
+            task.latest_trigger_time = now
+            if task.queued or (task.running and task.dirty):
+                task.coalesced += 1
+            elif task.running:
+                if task.policy.coalesce:
+                    task.dirty = True
+                    task.trigger_time = now
+                else:
+                    task.dropped += 1
+            else:
+                task.trigger_time = now
+                self.__push(task)
+
+    def __push(self, task: CallbackTask) -> None:
+        # called with condition held
+        task.queued = True
+        heapq.heappush(self.queue, (int(task.policy.priority), next(self.counter), task))
+        self.condition.notify()
+
+    def __work(self) -> None:
+        while True:
+            with self.condition:
+                while not self.queue and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                _, _, task = heapq.heappop(self.queue)
+                task.queued = False
+                task.running = True
+                t_start = time.time()
+                queue_time = t_start - task.trigger_time
+                task.queue_time += queue_time
+                task.max_queue_time = max(task.max_queue_time, queue_time)
+                trigger_time = task.latest_trigger_time
+            if task.policy.process:
+                self.__runInProcess(task, t_start, trigger_time)
+                continue
+            result, exception = None, None
+            try:
+                result = task.fn()
+            except Exception as e:
+                exception = e
+            self.__finish(task, t_start, trigger_time, result, exception)
+
+    def __runInProcess(self, task: CallbackTask, t_start: float, trigger_time: float) -> None:
+        try:
+            args = task.get_args() if task.get_args is not None else ()
+            future = self.process_pool.submit(task.fn, *args)
+        except Exception as e:
+            self.__finish(task, t_start, trigger_time, None, e)
+            return
+
+        def done(fut):
+            exception = fut.exception()
+            self.__finish(task, t_start, trigger_time,
+                          None if exception is not None else fut.result(), exception)
+        future.add_done_callback(done)
+
+    def __finish(self, task: CallbackTask, t_start: float, trigger_time: float,
+                 result: Any, exception: Optional[BaseException]) -> None:
+        t_end = time.time()
+        deliver = False
+        with self.condition:
+            task.runs += 1
+            run_time = t_end - t_start
+            task.run_time += run_time
+            task.max_run_time = max(task.max_run_time, run_time)
+            if exception is not None:
+                task.failed += 1
+            elif task.policy.deadline is not None and t_end - trigger_time > task.policy.deadline:
+                task.expired += 1
+            else:
+                deliver = True
+            task.running = False
+            if task.dirty:
+                task.dirty = False
+                if not self.stopped:
+                    self.__push(task)
+        if exception is not None:
+            logger.error('callback %s failed', getattr(task.fn, '__name__', task.fn), exc_info=exception)
+        elif deliver:
+            try:
+                task.on_result(result, t_end)
+            except Exception as e:
+                logger.exception(e)
+
+    def getStats(self, task: CallbackTask) -> CallbackStats:
+        with self.condition:
+            runs = max(task.runs, 1)
+            return CallbackStats(triggered=task.triggered, runs=task.runs, coalesced=task.coalesced,
+                                 dropped=task.dropped, expired=task.expired, failed=task.failed,
+                                 queue_time=task.queue_time / runs, run_time=task.run_time / runs,
+                                 max_queue_time=task.max_queue_time, max_run_time=task.max_run_time)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop workers, queued callbacks are not run"""
+        with self.condition:
+            self.stopped = True
+            self.queue.clear()
+            self.condition.notify_all()
+        if wait:
+            for th in self.threads:
+                if th is not threading.current_thread():
+                    th.join()
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=wait, cancel_futures=True)
+
+
+class BatchExecutor:
+    """Runs fn on batches of items submitted by many clients, in one worker thread.
+
+    After an item arrives the worker waits at most window seconds for more,
+    or until there are max_batch, then fn(items) returns a result for each item.
+    A client has at most one item waiting, a newer item replaces it,
+    so a slow fn can't pile up stale work.
+    """
+    def __init__(self, fn: Callable[[List[Any]], Sequence[Any]], window: float = 0.005, max_batch: int = 8):
+        self.fn = fn
+        self.window = window
+        self.max_batch = max_batch
+        self.condition = threading.Condition()
+        # client -> (item, on_result, submit time), oldest first
+        self.pending: Dict[Hashable, Tuple[Any, Callable[[Any, float], None], float]] = dict()
+        # submit time of the oldest pending item
+        self.first_time = 0.0
+        self.stopped = False
+        self.batches = 0
+        self.items = 0
+        self.replaced = 0
+        self.failed = 0
+        self.max_batch_size = 0
+        self.queue_time = 0.0
+        self.max_queue_time = 0.0
+        self.run_time = 0.0
+        self.max_run_time = 0.0
+        self.thread = threading.Thread(target=self.__work, daemon=True, name='rob-batch')
+        self.thread.start()
+
+    def submit(self, client: Hashable, item: Any, on_result: Callable[[Any, float], None]) -> None:
+        """on_result(result, timestamp) is called in the worker thread"""
+        now = time.time()
+        with self.condition:
+            if self.stopped:
+                return
+            if not self.pending:
+                self.first_time = now
+            if client in self.pending:
+                self.replaced += 1
+            self.pending[client] = (item, on_result, now)
+            self.condition.notify()
+
+    def __work(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                deadline = self.first_time + self.window
+                while not self.stopped and len(self.pending) < self.max_batch:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        break
+                    self.condition.wait(timeout)
+                if self.stopped:
+                    return
+                clients = list(itertools.islice(self.pending, self.max_batch))
+                batch = [self.pending.pop(client) for client in clients]
+                if self.pending:
+                    # the rest waits since the oldest of it
+                    self.first_time = min(t for (_, _, t) in self.pending.values())
+                t_start = time.time()
+                for (_, _, t) in batch:
+                    self.queue_time += t_start - t
+                    self.max_queue_time = max(self.max_queue_time, t_start - t)
+            results, exception = None, None
+            try:
+                results = self.fn([item for (item, _, _) in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f'{len(results)} results for a batch of {len(batch)}')
+            except Exception as e:
+                exception = e
+            t_end = time.time()
+            with self.condition:
+                self.batches += 1
+                self.items += len(batch)
+                self.max_batch_size = max(self.max_batch_size, len(batch))
+                self.run_time += t_end - t_start
+                self.max_run_time = max(self.max_run_time, t_end - t_start)
+                if exception is not None:
+                    self.failed += 1
+            if exception is not None:
+                logger.error('batch of %d failed', len(batch), exc_info=exception)
+                continue
+            for (_, on_result, _), result in zip(batch, results):
+                try:
+                    on_result(result, t_end)
+                except Exception as e:
+                    logger.exception(e)
+
+    def getStats(self) -> BatchStats:
+        with self.condition:
+            batches = max(self.batches, 1)
+            return BatchStats(batches=self.batches, items=self.items, replaced=self.replaced,
+                              failed=self.failed, batch_size=self.items / batches,
+                              max_batch_size=self.max_batch_size,
+                              queue_time=self.queue_time / max(self.items, 1),
+                              max_queue_time=self.max_queue_time,
+                              run_time=self.run_time / batches, max_run_time=self.max_run_time)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker, pending items are not run"""
+        with self.condition:
+            self.stopped = True
+            self.pending.clear()
+            self.condition.notify_all()
+        if wait and self.thread is not threading.current_thread():
+            self.thread.join()
@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+import numpy
+
+
+
+# height of the camera above the feet of a standing player
+EYE_HEIGHT = 1.62
+
+# (xmin, ymin, xmax, ymax) of pixels, inclusive, like SegmentStats.boxes
+Roi = Tuple[int, int, int, int]
+
+
+@dataclass(slots=True, frozen=True)
+class PointCloud:
+    points: numpy.ndarray               # (N, 3) float32 [x, y, z]
+    labels: Optional[numpy.ndarray]     # (N,) label of each point, if labels were given
+
+
+def depthImage(frame) -> numpy.ndarray:
+    """Depth buffer values of a DEPTH_MAP frame, float32 (H, W), top row first, no copy.
+    frame is a TimestampedVideoFrame or a SharedFrame"""
+    raw = frame.rawPixels
+    return numpy.flip(raw.view(numpy.float32).reshape(raw.shape[:2]), 0)
+
+
+def eyePosition(frame) -> Tuple[float, float, float]:
+    return (frame.xPos, frame.yPos + EYE_HEIGHT, frame.zPos)
+
+
+class DepthUnprojector:
+    """Depth frames to point clouds.
+
+    Normalized device coordinates of pixel centers are computed once for each
+    resolution, stride and roi, then a frame takes a few vector operations
+    with the inverse of its projection and model-view matrices.
+    Minecraft renders the world relative to the camera, so modelViewMatrix only
+    rotates and points are shifted by the eye position of the frame.
+    """
+    def __init__(self, max_cached: int = 16):
+        self.max_cached = max_cached
+        # (height, width, stride, roi) -> (rows, cols, x, y)
+        self.rays: 'OrderedDict[tuple, Tuple[slice, slice, numpy.ndarray, numpy.ndarray]]' = OrderedDict()
+        self.lock = threading.Lock()
+
+    def sampling(self, height: int, width: int, stride: int = 1,
+                 roi: Optional[Roi] = None) -> Tuple[slice, slice, numpy.ndarray, numpy.ndarray]:
+        """Slices of sampled rows and columns of a top-first image and
+        float32 x and y device coordinates of their pixel centers, shape (rows, cols)"""
+        key = (height, width, stride, None if roi is None else tuple(int(c) for c in roi))
+        with self.lock:
+            cached = self.rays.get(key)
+            if cached is not None:
+                self.rays.move_to_end(key)
+                return cached
+        x0, y0, x1, y1 = (0, 0, width - 1, height - 1) if roi is None else key[3]
+        rows = slice(max(y0, 0), min(y1, height - 1) + 1, stride)
+        cols = slice(max(x0, 0), min(x1, width - 1) + 1, stride)
+        # opengl window coordinates start at the bottom row
+        y = 1 - (numpy.arange(height, dtype=numpy.float64)[rows] + 0.5) * 2 / height
+        x = (numpy.arange(width, dtype=numpy.float64)[cols] + 0.5) * 2 / width - 1
+        x, y = (numpy.ascontiguousarray(a, dtype=numpy.float32) for a in numpy.meshgrid(x, y))
+        x.flags.writeable = False
+        y.flags.writeable = False
+        result = (rows, cols, x, y)
+        with self.lock:
+            self.rays[key] = result
+            if len(self.rays) > self.max_cached:
+                self.rays.popitem(last=False)
+        return result
+
+    def unprojectDepth(self, depth: numpy.ndarray, projection: numpy.ndarray, modelView: numpy.ndarray,
+                       origin: Sequence[float] = (0, 0, 0), stride: int = 1, roi: Optional[Roi] = None,
+                       labels: Optional[numpy.ndarray] = None, far: float = 1.0) -> PointCloud:
+        """Points of sampled pixels of depth buffer (H, W), top row first, with depth below far;
+        labels is an (H, W) image of the same frame to pick a label for each point"""
+        rows, cols, x, y = self.sampling(depth.shape[0], depth.shape[1], stride, roi)
+        # matrices are sent column-major, so the arrays are transposed
+        inverse = numpy.linalg.inv(numpy.asarray(projection, dtype=numpy.float64).T
+                                   @ numpy.asarray(modelView, dtype=numpy.float64).T)
+        inverse = inverse.astype(numpy.float32)
+        z = depth[rows, cols]
+        valid = z < far
+        if valid.all():
+            valid = None
+            x, y, z = x.ravel(), y.ravel(), z.ravel()
+        else:
+            x, y, z = x[valid], y[valid], z[valid]
+        # depth buffer values to device z in [-1, 1]
+        z = z * 2
+        z -= 1
+        # homogeneous coordinates inverse @ [x, y, z, 1], divided by w
+        w = x * inverse[3, 0]
+        w += y * inverse[3, 1]
+        w += z * inverse[3, 2]
+        w += inverse[3, 3]
+        numpy.reciprocal(w, out=w)
+        points = numpy.empty((len(z), 3), dtype=numpy.float32)
+        for k in range(3):
+            c = x * inverse[k, 0]
+            c += y * inverse[k, 1]
+            c += z * inverse[k, 2]
+            c += inverse[k, 3]
+            c *= w
+            c += origin[k]
+            points[:, k] = c
+        if labels is not None:
+            labels = labels[rows, cols]
+            labels = labels.ravel() if valid is None else labels[valid]
+        return PointCloud(points=points, labels=labels)
+
+    def unproject(self, frame, stride: int = 1, roi: Optional[Roi] = None,
+                  labels: Optional[numpy.ndarray] = None, origin: Optional[Sequence[float]] = None,
+                  far: float = 1.0) -> PointCloud:
+        """Point cloud of a DEPTH_MAP frame in world coordinates, or relative to the eye
+        with origin=(0, 0, 0); labels is the label image of the colour map frame,
+        e.g. MCConnector.getSegmentationLabels()"""
+        if origin is None:
+            origin = eyePosition(frame)
+        return self.unprojectDepth(depthImage(frame), frame.calibrationMatrix, frame.modelViewMatrix,
+                                   origin, stride, roi, labels, far)
+
+
+depth_unprojector = DepthUnprojector()
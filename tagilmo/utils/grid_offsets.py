@@ -0,0 +1,49 @@
+from typing import List, Optional, Sequence
+
+import numpy
+
+
+# eye height used by the height penalty of nearest block queries
+EYE_HEIGHT = 1.66
+
+
+class GridOffsets:
+    """Tables of a grid box, built once for it.
+
+    positions: int (N, 3) positions of grid_near cells relative to the agent, in grid_near order
+    distances: squared distances from the agent's eyes with vertical distance counted twice
+    order: cell indices sorted by distance, ties by index
+    """
+    def __init__(self, gridBox: Sequence[Sequence[int]]):
+        self.box = [list(b) for b in gridBox]
+        xs, ys, zs = (numpy.arange(b[0], b[1] + 1) for b in self.box)
+        y, z, x = numpy.meshgrid(ys, zs, xs, indexing='ij')
+        self.positions = numpy.stack([x.ravel(), y.ravel(), z.ravel()], axis=1)
+        self.positions.flags.writeable = False
+        self.positionList = self.positions.tolist()
+        x, y, z = self.positions.T
+        self.distances = x * x + (y - EYE_HEIGHT) * (y - EYE_HEIGHT) * 4 + z * z
+        self.distances.flags.writeable = False
+        self.order = numpy.argsort(self.distances, kind='stable')
+        self.order.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self.positionList)
+
+    def indexToPos(self, index: int) -> List[int]:
+        return list(self.positionList[index])
+
+    def absPositions(self, pos: Sequence[float]) -> numpy.ndarray:
+        """float (N, 3) positions of cells for the agent at pos"""
+        return self.positions + numpy.asarray(pos[:3], dtype=float)
+
+    def nearest(self, mask: numpy.ndarray, maxDist: float = numpy.inf) -> int:
+        """Index of the nearest cell where mask is True, -1 if there is none closer than maxDist"""
+        d = numpy.where(mask, self.distances, numpy.inf)
+        i = int(numpy.argmin(d))
+        return i if d[i] < maxDist else -1
+
+    def nearestK(self, mask: numpy.ndarray, k: Optional[int] = None) -> numpy.ndarray:
+        """Indices of up to k nearest cells where mask is True, nearest first"""
+        order = self.order[mask[self.order]]
+        return order if k is None else order[:k]
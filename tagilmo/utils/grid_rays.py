@@ -0,0 +1,56 @@
+from enum import IntEnum, auto
+from typing import Sequence, Tuple
+
+import numpy
+
+
+class RayStatus(IntEnum):
+    CLEAN = 0     # no obstacle within max_steps
+    FREE = auto()      # left the grid
+    DEADLY = auto()
+    OBSTACLE = auto()
+
+
+def marchRays(grid: numpy.ndarray, p0: Sequence[int], dp: Sequence[float],
+              origins: numpy.ndarray, levels: Sequence[int],
+              passable: numpy.ndarray, deadly: numpy.ndarray, water: int,
+              max_steps: int = 100, step: float = 0.1) -> Tuple[numpy.ndarray, ...]:
+    """Horizontal rays along dp from every origin at every level of the grid, all at once.
+
+    grid: block ids of shape (Y, Z, X) centered at block p0
+    origins: (N, 3) ray starts, levels: grid levels relative to the center
+    passable, deadly: boolean tables indexed by block id
+
+    A ray stops where it leaves the grid, at a deadly block, or at an obstacle:
+    an impassable block at levels >= 0 or a passable block except water below.
+    Returns d, status, xf, zf of shape (len(levels), N): the step the ray stopped at
+    (max_steps if it left the grid or is clean) and coordinates of that step.
+    """
+    dimY, dimZ, dimX = grid.shape
+    origins = numpy.asarray(origins, dtype=float).reshape(-1, 3)
+    levels = numpy.asarray(levels, dtype=numpy.intp)
+    t = numpy.arange(max_steps, dtype=float)
+    # the same operations as pos[0] + t * dp[0] * 0.1 for each t
+    xf = origins[:, 0, None] + t * dp[0] * step
+    zf = origins[:, 2, None] + t * dp[2] * step
+    x = numpy.floor(xf).astype(numpy.intp) - p0[0] + dimX // 2
+    z = numpy.floor(zf).astype(numpy.intp) - p0[2] + dimZ // 2
+    outside = (x < 0) | (x >= dimX) | (z < 0) | (z >= dimZ)
+    numpy.clip(x, 0, dimX - 1, out=x)
+    numpy.clip(z, 0, dimZ - 1, out=z)
+    blocks = grid[(dimY // 2 + levels)[:, None, None], z[None], x[None]]
+    isDeadly = deadly[blocks]
+    isPassable = passable[blocks]
+    obstacle = numpy.where((levels >= 0)[:, None, None], ~isPassable, isPassable & (blocks != water))
+    stop = outside[None] | isDeadly | obstacle
+    stopped = stop.any(axis=2)
+    first = numpy.argmax(stop, axis=2)
+    rays = numpy.arange(len(origins))[None]
+    lv = numpy.arange(len(levels))[:, None]
+    status = numpy.full(stop.shape[:2], RayStatus.CLEAN, dtype=numpy.int8)
+    status[stopped] = RayStatus.OBSTACLE
+    status[stopped & isDeadly[lv, rays, first]] = RayStatus.DEADLY
+    # leaving the grid is checked first
+    status[stopped & outside[rays, first]] = RayStatus.FREE
+    d = numpy.where((status == RayStatus.CLEAN) | (status == RayStatus.FREE), max_steps, first)
+    return d, status, xf[rays, first], zf[rays, first]
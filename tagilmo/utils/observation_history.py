@@ -0,0 +1,127 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy
+
+
+class TimeSeries:
+    """Bounded history of samples of fixed width ordered by time,
+    the oldest samples are overwritten.
+
+    Every sample is written twice, at i and i + capacity, so the history
+    is always a contiguous slice and can be searched with searchsorted.
+    Columns listed in angular hold angles in degrees and are interpolated
+    along the shortest arc.
+
+    Not thread-safe, RobustObserver accesses it under its lock.
+    """
+    def __init__(self, capacity: int, width: int, angular: Sequence[int] = ()):
+        assert capacity >= 2
+        self.capacity = capacity
+        self.width = width
+        self.angular = numpy.zeros(width, dtype=bool)
+        self.angular[list(angular)] = True
+        self._times = numpy.zeros(2 * capacity)
+        self._values = numpy.zeros((2 * capacity, width))
+        self.start = 0
+        self.count = 0
+
+    def append(self, t: float, values, keys: Optional[Sequence[str]] = None) -> bool:
+        """Add a sample, samples older than the latest one are ignored.
+        values is a sequence, or a mapping with the sample in keys"""
+        if self.count and t < self._times[self.start + self.count - 1]:
+            return False
+        i = (self.start + self.count) % self.capacity
+        self._times[i] = self._times[i + self.capacity] = t
+        row, mirror = self._values[i], self._values[i + self.capacity]
+        for j in range(self.width):
+            row[j] = mirror[j] = values[j if keys is None else keys[j]]
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+        return True
+
+    def clear(self) -> None:
+        self.start = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def times(self) -> numpy.ndarray:
+        """Timestamps, oldest first, view valid until the next append"""
+        return self._times[self.start:self.start + self.count]
+
+    @property
+    def values(self) -> numpy.ndarray:
+        """Samples, oldest first, view valid until the next append"""
+        return self._values[self.start:self.start + self.count]
+
+    def latest(self) -> Optional[Tuple[float, numpy.ndarray]]:
+        if not self.count:
+            return None
+        i = self.start + self.count - 1
+        return float(self._times[i]), self._values[i].copy()
+
+    def index(self, t: float) -> int:
+        """Index of the latest sample not newer than t, -1 if all samples are newer"""
+        return int(numpy.searchsorted(self.times, t, side='right')) - 1
+
+    def at(self, t: float) -> Optional[numpy.ndarray]:
+        """Sample interpolated at time t, clamped to the first and the latest sample"""
+        if not self.count:
+            return None
+        i = self.index(t)
+        if i < 0:
+            return self.values[0].copy()
+        if i >= self.count - 1:
+            return self.values[-1].copy()
+        t0, t1 = self.times[i], self.times[i + 1]
+        v0, v1 = self.values[i], self.values[i + 1]
+        w = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+        return v0 + w * self.__delta(v0, v1)
+
+    def __delta(self, v0: numpy.ndarray, v1: numpy.ndarray) -> numpy.ndarray:
+        delta = v1 - v0
+        delta[self.angular] = (delta[self.angular] + 180) % 360 - 180
+        return delta
+
+    def velocity(self, t: Optional[float] = None, dt: float = 0.2) -> Optional[numpy.ndarray]:
+        """Average rate of change over [t - dt, t] per second, t is the latest sample by default"""
+        if self.count < 2:
+            return None
+        if t is None:
+            t = float(self.times[-1])
+        t0 = max(t - dt, float(self.times[0]))
+        t = min(t, float(self.times[-1]))
+        if t <= t0:
+            return None
+        return self.__delta(self.at(t0), self.at(t)) / (t - t0)
+
+
+class ObservationHistory:
+    """Recent numeric observations by receive time"""
+    # stream -> observation keys, angular column indices
+    streams: Dict[str, Tuple[Tuple[str, ...], Tuple[int, ...]]] = {
+        'pose': (('XPos', 'YPos', 'ZPos', 'Pitch', 'Yaw'), (3, 4)),
+        'life': (('Life',), ()),
+        'air': (('Air',), ()),
+        'food': (('Food',), ()),
+    }
+
+    def __init__(self, capacity: int = 256):
+        self.series = {name: TimeSeries(capacity, len(keys), angular)
+                       for (name, (keys, angular)) in self.streams.items()}
+
+    def append(self, t: float, data: dict) -> None:
+        for name, (keys, _) in self.streams.items():
+            if keys[0] in data:
+                self.series[name].append(t, data, keys)
+
+    def clear(self) -> None:
+        for series in self.series.values():
+            series.clear()
+
+    def __getitem__(self, name: str) -> TimeSeries:
+        return self.series[name]
@@ -0,0 +1,229 @@
+import heapq
+import math
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy
+
+from tagilmo.utils.block_vocabulary import MAX_BLOCKS
+from tagilmo.utils.voxel_map import VoxelMap, UNKNOWN
+
+
+Cell = Tuple[int, int, int]
+
+
+def _idTable(mask: numpy.ndarray) -> numpy.ndarray:
+    # a copy of mask with MAX_BLOCKS + 1 entries, False past its end
+    n = min(len(mask), MAX_BLOCKS)
+    table = numpy.zeros(MAX_BLOCKS + 1, dtype=bool)
+    table[:n] = mask[:n]
+    return table
+
+
+class PathPlanner:
+    """A* over standing cells of a box of the world, with cached paths.
+
+    A cell [x, y, z] is where the agent's feet are: it and the cell above are
+    passable and not deadly, the cell below is known, solid and not deadly.
+    Moves go to the 4 horizontal neighbours: on the same level, one step up
+    if there is headroom, or falling down at most max_fall cells.
+    Unknown cells count as passable, but can't be stood on.
+
+    Paths are cached by (start, goal) and a path is reused from any of its cells;
+    update() writes changed cells and drops cached paths going near them.
+    """
+    STEP_UP_COST = 1.5
+    FALL_COST = 1.0
+
+    def __init__(self, blocks: numpy.ndarray, lo: Sequence[int], passable: numpy.ndarray,
+                 deadly: numpy.ndarray, max_fall: int = 3, max_cached: int = 256):
+        """blocks: ids of shape (Y, Z, X), UNKNOWN for cells not seen,
+        with its lowest corner at lo = [x, y, z],
+        passable, deadly: boolean tables indexed by block id,
+        ids past their ends are neither, like those of blocks added later"""
+        self.lock = threading.RLock()
+        self.lo = [int(c) for c in lo[:3]]
+        self.max_fall = max_fall
+        self.max_cached = max_cached
+        # tables cover all ids, so update() may bring in any of them
+        passable, deadly = _idTable(passable), _idTable(deadly)
+        self.clear_table = passable & ~deadly
+        self.clear_table[UNKNOWN] = True
+        self.support_table = ~passable & ~deadly
+        self.support_table[UNKNOWN] = False
+        self.blocks = numpy.array(blocks, dtype=numpy.int16)
+        self.dimY, self.dimZ, self.dimX = self.blocks.shape
+        self.stepY = self.dimZ * self.dimX
+        # flat tables indexed by (y * dimZ + z) * dimX + x, for the search:
+        # number of clear cells from this one up (at most 255) and standing cells,
+        # with (Y, Z, X) array views for updates
+        self.up = bytearray(self.blocks.size)
+        self.stand = bytearray(self.blocks.size)
+        self.up_array = numpy.frombuffer(self.up, dtype=numpy.uint8).reshape(self.blocks.shape)
+        self.stand_array = numpy.frombuffer(self.stand, dtype=bool).reshape(self.blocks.shape)
+        self.__tables(self.dimY, slice(None), slice(None))
+        # (start, goal) -> path, least recently used first
+        self.paths: 'OrderedDict[Tuple[Cell, Cell], List[Cell]]' = OrderedDict()
+        self.searches = 0
+        self.hits = 0
+
+    @classmethod
+    def fromVoxelMap(cls, vmap: VoxelMap, lo: Sequence[int], hi: Sequence[int],
+                     passable: numpy.ndarray, deadly: numpy.ndarray, **kwargs) -> 'PathPlanner':
+        blocks, _ = vmap.region(lo, hi)
+        return cls(blocks, lo, passable, deadly, **kwargs)
+
+    def __tables(self, y1: int, zs: slice, xs: slice) -> None:
+        # recompute tables of levels below y1 in the columns, levels from y1 up are up to date
+        clear = self.clear_table[self.blocks[:y1, zs, xs]]
+        up = numpy.zeros((y1 + 1,) + clear.shape[1:], dtype=numpy.int32)
+        if y1 < self.dimY:
+            up[-1] = self.up_array[y1, zs, xs]
+        for y in range(y1 - 1, -1, -1):
+            up[y] = numpy.where(clear[y], numpy.minimum(up[y + 1] + 1, 255), 0)
+        up = up[:-1]
+        self.up_array[:y1, zs, xs] = up
+        # level 0 has nothing below it
+        self.stand_array[0, zs, xs] = False
+        self.stand_array[1:y1, zs, xs] = (up[1:] >= 2) & self.support_table[self.blocks[:y1 - 1, zs, xs]]
+
+    def update(self, blocks: numpy.ndarray, lo: Sequence[int]) -> None:
+        """Write changed cells, shape (Y, Z, X) with the lowest corner at lo,
+        the part outside of the planner's box is ignored"""
+        with self.lock:
+            a = [lo[1] - self.lo[1], lo[2] - self.lo[2], lo[0] - self.lo[0]]
+            dims = (self.dimY, self.dimZ, self.dimX)
+            dst = tuple(slice(max(c, 0), min(c + n, d)) for c, n, d in zip(a, blocks.shape, dims))
+            if any(s.start >= s.stop for s in dst):
+                return
+            src = tuple(slice(s.start - c, s.stop - c) for s, c in zip(dst, a))
+            self.blocks[dst] = blocks[src]
+            # clear runs below and standing on the cells above change too
+            self.__tables(min(dst[0].stop + 1, self.dimY), dst[1], dst[2])
+            self.__invalidate([dst[2].start, dst[0].start, dst[1].start],
+                              [dst[2].stop - 1, dst[0].stop - 1, dst[1].stop - 1])
+
+    def __invalidate(self, lo: Sequence[int], hi: Sequence[int]) -> None:
+        # local coordinates; a path depends on cells up to 2 above its cells
+        # and 1 below, and on cells it falls through
+        lo = [lo[0] - 1, lo[1] - 2 - self.max_fall, lo[2] - 1]
+        hi = [hi[0] + 1, hi[1] + 1, hi[2] + 1]
+        stale = [key for key, path in self.paths.items()
+                 if any(lo[0] <= x <= hi[0] and lo[1] <= y <= hi[1] and lo[2] <= z <= hi[2]
+                        for x, y, z in self.__local(path))]
+        for key in stale:
+            del self.paths[key]
+
+    def __local(self, path: List[Cell]):
+        x0, y0, z0 = self.lo
+        return ((x - x0, y - y0, z - z0) for x, y, z in path)
+
+    def __index(self, cell: Sequence[int]) -> int:
+        x, y, z = cell[0] - self.lo[0], cell[1] - self.lo[1], cell[2] - self.lo[2]
+        if not (0 <= x < self.dimX and 0 <= y < self.dimY and 0 <= z < self.dimZ):
+            return -1
+        return (y * self.dimZ + z) * self.dimX + x
+
+    def canStand(self, cell: Sequence[int]) -> bool:
+        i = self.__index(cell)
+        return i >= 0 and bool(self.stand[i])
+
+    def plan(self, start: Sequence[float], goal: Sequence[float]) -> Optional[List[Cell]]:
+        """Cells from start to goal, both included, None if there is no path.
+        Positions are floored to cells."""
+        start = tuple(math.floor(c) for c in start[:3])
+        goal = tuple(math.floor(c) for c in goal[:3])
+        with self.lock:
+            path = self.__cached(start, goal)
+            if path is not None:
+                self.hits += 1
+                return path
+            self.searches += 1
+            path = self.__search(start, goal)
+            if path is not None:
+                self.paths[(start, goal)] = path
+                if len(self.paths) > self.max_cached:
+                    self.paths.popitem(last=False)
+            return path
+
+    def __cached(self, start: Cell, goal: Cell) -> Optional[List[Cell]]:
+        path = self.paths.get((start, goal))
+        if path is not None:
+            self.paths.move_to_end((start, goal))
+            return list(path)
+        # the rest of a path to the same goal passing through start
+        for (s, g), path in reversed(self.paths.items()):
+            if g == goal and start in path:
+                return path[path.index(start):]
+        return None
+
+    def __search(self, start: Cell, goal: Cell) -> Optional[List[Cell]]:
+        i_start, i_goal = self.__index(start), self.__index(goal)
+        if i_start < 0 or i_goal < 0 or not self.stand[i_goal]:
+            return None
+        stand, up = self.stand, self.up
+        dimX, dimZ, stepY = self.dimX, self.dimZ, self.stepY
+        max_fall = self.max_fall
+        gx, gy, gz = goal[0] - self.lo[0], goal[1] - self.lo[1], goal[2] - self.lo[2]
+
+        def h(i):
+            y, r = divmod(i, stepY)
+            z, x = divmod(r, dimX)
+            return max(abs(x - gx) + abs(z - gz), self.STEP_UP_COST * (gy - y))
+
+        g = {i_start: 0.0}
+        parent = {i_start: -1}
+        heap = [(h(i_start), 0.0, i_start)]
+        closed = set()
+        while heap:
+            _, gi, i = heapq.heappop(heap)
+            if i == i_goal:
+                break
+            if i in closed:
+                continue
+            closed.add(i)
+            y, r = divmod(i, stepY)
+            z, x = divmod(r, dimX)
+            headroom = up[i] >= 3
+            for ok, d in ((x > 0, -1), (x < dimX - 1, 1), (z > 0, -dimX), (z < dimZ - 1, dimX)):
+                if not ok:
+                    continue
+                n = i + d
+                if stand[n]:
+                    j, cost = n, 1.0
+                elif headroom and y + 1 < self.dimY and stand[n + stepY]:
+                    j, cost = n + stepY, self.STEP_UP_COST
+                elif up[n] >= 2:
+                    # fall to the first standing cell below
+                    j = -1
+                    m = n
+                    for _ in range(min(max_fall, y)):
+                        m -= stepY
+                        if stand[m]:
+                            j = m
+                            break
+                        if not up[m]:
+                            break
+                    if j < 0:
+                        continue
+                    cost = self.FALL_COST
+                else:
+                    continue
+                gj = gi + cost
+                if gj < g.get(j, math.inf):
+                    g[j] = gj
+                    parent[j] = i
+                    heapq.heappush(heap, (gj + h(j), gj, j))
+        else:
+            return None
+        path = []
+        i = i_goal
+        x0, y0, z0 = self.lo
+        while i >= 0:
+            y, r = divmod(i, stepY)
+            z, x = divmod(r, dimX)
+            path.append((x + x0, y + y0, z + z0))
+            i = parent[i]
+        path.reverse()
+        return path
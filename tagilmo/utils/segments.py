@@ -1,3 +1,9 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+
 
 
 s = """
@@ -36,3 +42,72 @@ for line in s.split('\n'):
         code, name = line.split(' ')
         code = [int(x) for x in code.split(',')]
         segment_mapping[tuple(code)] = name.strip()
+
+
+@dataclass(slots=True, frozen=True)
+class SegmentStats:
+    counts: numpy.ndarray   # pixels of each label
+    boxes: numpy.ndarray    # [xmin, ymin, xmax, ymax] of each label, -1 if there are no pixels
+
+
+class SegmentationDecoder:
+    """Colour map frames to label images.
+
+    Label 0 is for colours not in the mapping, names[label] for the rest.
+    Colours are packed into 24-bit keys of a dense lookup table,
+    which is built on the first decode.
+    """
+    def __init__(self, mapping: Dict[Tuple[int, int, int], str] = segment_mapping):
+        self.mapping = dict(mapping)
+        self.names: List[str] = ['unknown'] + list(dict.fromkeys(self.mapping.values()))
+        self.dtype = numpy.uint8 if len(self.names) <= 256 else numpy.uint16
+        self.lut: Optional[numpy.ndarray] = None
+        self.lock = threading.Lock()
+
+    def label(self, name: str) -> int:
+        return self.names.index(name)
+
+    def __table(self) -> numpy.ndarray:
+        with self.lock:
+            if self.lut is None:
+                lut = numpy.zeros(1 << 24, dtype=self.dtype)
+                labels = {name: i for i, name in enumerate(self.names)}
+                for (r, g, b), name in self.mapping.items():
+                    lut[(r << 16) | (g << 8) | b] = labels[name]
+                lut.flags.writeable = False
+                self.lut = lut
+            return self.lut
+
+    @staticmethod
+    def keys(pixels: numpy.ndarray) -> numpy.ndarray:
+        """uint32 (H, W) keys r << 16 | g << 8 | b of (H, W, C) pixels"""
+        keys = pixels[..., 0].astype(numpy.uint32)
+        keys <<= 8
+        keys |= pixels[..., 1]
+        keys <<= 8
+        keys |= pixels[..., 2]
+        return keys
+
+    def decode(self, pixels: numpy.ndarray) -> numpy.ndarray:
+        """Label image of the shape (H, W) for (H, W, C) pixels, C >= 3"""
+        return self.__table().take(self.keys(pixels))
+
+    def stats(self, labels: numpy.ndarray) -> SegmentStats:
+        """Pixel counts and bounding boxes of all labels"""
+        n = len(self.names)
+        h, w = labels.shape
+        # pixels of each label in each row and column
+        rows = numpy.bincount((numpy.arange(h, dtype=numpy.int32)[:, None] * n + labels).ravel(),
+                              minlength=h * n).reshape(h, n)
+        cols = numpy.bincount((numpy.arange(w, dtype=numpy.int32)[None, :] * n + labels).ravel(),
+                              minlength=w * n).reshape(w, n) > 0
+        counts = rows.sum(axis=0)
+        rows = rows > 0
+        boxes = numpy.stack([cols.argmax(axis=0), rows.argmax(axis=0),
+                             w - 1 - cols[::-1].argmax(axis=0), h - 1 - rows[::-1].argmax(axis=0)], axis=1)
+        boxes[counts == 0] = -1
+        return SegmentStats(counts=counts, boxes=boxes)
+
+
+# decoder of segment_mapping, its table takes 16MB once used
+segmentation_decoder = SegmentationDecoder()
@@ -1,22 +1,29 @@
 import json
+import asyncio
 import uuid
 import time
 import math
 import sys
-import concurrent.futures
 import threading
 import logging
 import re
 import os
 import errno
 from collections import defaultdict
-from typing import Optional, Any
+from functools import partial
+from typing import Optional, Any, AsyncIterator
 
 from tagilmo import VereyaPython as VP
 
 import numpy
 import tagilmo.utils.mission_builder as mb
 from tagilmo.utils.mathutils import *
+from tagilmo.utils.observation_history import ObservationHistory
+from tagilmo.utils.callback_executor import CallbackExecutor, CallbackPolicy, BatchExecutor
+from tagilmo.utils.block_vocabulary import block_vocabulary
+from tagilmo.utils.grid_offsets import GridOffsets
+from tagilmo.utils.voxel_map import VoxelMap
+from tagilmo.utils.segments import segmentation_decoder
 from tagilmo.VereyaPython import TimestampedString, TimestampedVideoFrame, FrameType
 
 logger = logging.getLogger('vereya')
@@ -58,7 +65,13 @@ class MCConnector:
         self.mission = module.MissionSpec(missionXML.xml(), True)
         self.mission_record = module.MissionRecordSpec()
 
-    def __init__(self, missionXML, clientIp='127.0.0.1', agentId=0, setupAll=False, serverIp=None, serverPort=None):
+    def __init__(self, missionXML, clientIp='127.0.0.1', agentId=0, setupAll=False, serverIp=None, serverPort=None,
+                 runtime=None, command_batch_window=0.0):
+        """runtime: VP.IoRuntime shared by agent hosts, e.g. VP.getSharedRuntime(),
+        by default each agent host runs its own event loop thread
+        command_batch_window: seconds to collect commands into one write, see AgentHost.setCommandBatchWindow"""
+        self.runtime = runtime
+        self.command_batch_window = command_batch_window
         self.missionDesc = None
         self.mission = None
         self.mission_record = None
@@ -76,9 +89,9 @@ class MCConnector:
         agentIds = len(missionXML.agentSections)
         self.agent_hosts = dict()
         if self.setupAll:
-            self.agent_hosts.update({n: module.AgentHost() for n in range(agentIds)})
+            self.agent_hosts.update({n: self._newAgentHost(module) for n in range(agentIds)})
         else:
-            self.agent_hosts[self.agentId] = module.AgentHost()
+            self.agent_hosts[self.agentId] = self._newAgentHost(module)
         self.agent_hosts[self.agentId].parse( sys.argv )
         if self.receivedArgument('recording_dir'):
             recordingsDirectory = get_recordings_directory(self.agent_hosts[self.agentId])
@@ -97,8 +110,19 @@ class MCConnector:
         self.frames = dict({n: None for n in range(agentIds)})
         self.segmentation_frames = dict({n: None for n in range(agentIds)})
         self._last_obs = dict() # agent_host -> TimestampedString
+        self._grid_arrays = dict() # agentId -> grid_near list, its array
+        self._grid_offsets = dict() # agentId -> GridOffsets of its grid box
+        self._segmentation_labels = dict() # agentId -> colour map frame, its labels
         self._all_mobs = set()
 
+    def _newAgentHost(self, module):
+        if module is not VP:
+            return module.AgentHost()
+        agent_host = VP.AgentHost(self.runtime) if self.runtime is not None else VP.AgentHost()
+        if self.command_batch_window:
+            agent_host.setCommandBatchWindow(self.command_batch_window)
+        return agent_host
+
     def getVersion(self, num=None) -> str:
         if num is None:
             num = self.agentId
@@ -189,8 +213,8 @@ class MCConnector:
                     print(e.text)
                     print("Quiting.")
                     return False
+            if not all(start_flags):
                 time.sleep(0.1)
-                print(".", end=' ')
             if time.time() - start_time >= time_out:
                 print("Timed out while waiting for mission to start - quiting.")
                 return False
@@ -230,6 +254,21 @@ class MCConnector:
             return
         self.agent_hosts[agentId].sendCommand(command)
 
+    def sendCommands(self, commands, agentId=None):
+        """send commands in one write, so they arrive back-to-back"""
+        if agentId is None:
+            agentId = self.agentId
+        if agentId not in self.agent_hosts:
+            logger.error(f"can't send commands to {agentId}, it's not in agent_hosts")
+            return
+        agent_host = self.agent_hosts[agentId]
+        if not hasattr(agent_host, 'sendCommands'):
+            # MalmoPython
+            for command in commands:
+                agent_host.sendCommand(command)
+            return
+        agent_host.sendCommands(commands)
+
     def observeProc(self, agentId=None):
         r = self.agent_hosts.keys()
         if agentId is not None:
@@ -307,6 +346,22 @@ class MCConnector:
             agentId = self.agentId
         return self.segmentation_frames[agentId]
 
+    def getSegmentationLabels(self, agentId=None):
+        """Labels of segmentation_decoder for the colour map frame, shape (H, W),
+        it's decoded once for each frame"""
+        if agentId is None:
+            agentId = self.agentId
+        frame = self.segmentation_frames[agentId]
+        if frame is None:
+            return None
+        cached = self._segmentation_labels.get(agentId)
+        if cached is not None and cached[0] is frame:
+            return cached[1]
+        labels = segmentation_decoder.decode(frame.pixels)
+        labels.flags.writeable = False
+        self._segmentation_labels[agentId] = (frame, labels)
+        return labels
+
     def getImage(self, agentId=None):
         if agentId is None:
             agentId = self.agentId
@@ -348,6 +403,8 @@ class MCConnector:
     def getLineOfSights(self, agentId=None):
         los = self.getParticularObservation('LineOfSight', agentId)
         if los is not None and los['hitType'] != 'MISS':
+            # copy, observation data is compared with the next one by RobustObserver
+            los = dict(los)
             los['type'] = los['type'].replace("minecraft:", "")
             return los
         return los
@@ -362,11 +419,13 @@ class MCConnector:
         if data is None:
             return
 
+        entities = []
         for e in data:
             if 'name' in e:
-                name = e['name']
-                e['name'] = name.lower().replace(' ', '_')
-        return data
+                e = dict(e)
+                e['name'] = e['name'].lower().replace(' ', '_')
+            entities.append(e)
+        return entities
 
     def getNearPickableEntities(self, agentId=None):
         entities = self.getNearEntities(agentId)
@@ -381,6 +440,26 @@ class MCConnector:
     def getNearGrid(self, agentId=None):
         return self.getParticularObservation('grid_near', agentId)
 
+    def getNearGridArray(self, agentId=None):
+        """grid_near as int16 ids of block_vocabulary, shape (Y, Z, X)"""
+        return self.gridToArray(self.getNearGrid(agentId), agentId)
+
+    def gridToArray(self, grid, agentId=None):
+        """Decode grid_near list of the agent, it's done once for each list"""
+        if grid is None:
+            return None
+        if agentId is None:
+            agentId = self.agentId
+        cached = self._grid_arrays.get(agentId)
+        if cached is not None and cached[0] is grid:
+            return cached[1]
+        gridBox = self.getGridBox(agentId)
+        gridSz = [gridBox[i][1]-gridBox[i][0]+1 for i in range(3)]
+        array = block_vocabulary.encode(grid).reshape(gridSz[1], gridSz[2], gridSz[0])
+        array.flags.writeable = False
+        self._grid_arrays[agentId] = (grid, array)
+        return array
+
     def getLife(self, agentId=None):
         return self.getParticularObservation('Life', agentId)
 
@@ -430,15 +509,18 @@ class MCConnector:
         id = 0 if agentId is None else agentId
         return self.getParticularObservation('actionStatus', agentId)
 
-    def gridIndexToPos(self, index, agentId=None):
+    def getGridOffsets(self, agentId=None):
+        """Position and distance tables of the grid box, rebuilt when the box changes"""
+        if agentId is None:
+            agentId = self.agentId
         gridBox = self.getGridBox(agentId)
-        gridSz = [gridBox[i][1]-gridBox[i][0]+1 for i in range(3)]
-        y = index // (gridSz[0] * gridSz[2])
-        index -= y * (gridSz[0] * gridSz[2])
-        y += gridBox[1][0]
-        z = index // gridSz[0] + gridBox[2][0]
-        x = index % gridSz[0] + gridBox[0][0]
-        return [x, y, z]
+        offsets = self._grid_offsets.get(agentId)
+        if offsets is None or offsets.box != gridBox:
+            offsets = self._grid_offsets[agentId] = GridOffsets(gridBox)
+        return offsets
+
+    def gridIndexToPos(self, index, agentId=None):
+        return self.getGridOffsets(agentId).indexToPos(index)
 
     def dirToPos(self, aPos, pos):
         '''
@@ -469,12 +551,15 @@ class MCConnector:
             agentId = self.agentId
         self.agent_hosts[agentId].sendCommand("placeBlock {} {} {} {} {}".format(x, y, z, block_name, placement))
 
-    def _sendMotionCommand(self, command, value, agentId=None):
+    def _motionCommand(self, command, value, agentId=None):
         if agentId is None: agentId = self.agentId
         if agentId in self._all_mobs:
-            self.sendCommand(f'{command} {agentId} {value}', agentId)
-        else:
-            self.sendCommand(f'{command} {value}', agentId)
+            return f'{command} {agentId} {value}'
+        return f'{command} {value}'
+
+    def _sendMotionCommand(self, command, value, agentId=None):
+        if agentId is None: agentId = self.agentId
+        self.sendCommand(self._motionCommand(command, value, agentId), agentId)
 
     def strafe(self, value, agentId=None):
         return self._sendMotionCommand('strafe', value, agentId)
@@ -513,6 +598,27 @@ class RobustObserver:
     # Should we merge these types of commands in one list?
     explicitlyPoseChangingCommands = ['move', 'jump', 'pitch', 'turn']
     implicitlyPoseChangingCommands = ['attack']
+    # observation keys each getter depends on,
+    # getters not listed here are recomputed on every update
+    observationKeys = {
+        'getNearEntities': ('ents_near',),
+        'getNearPickableEntities': ('ents_near',),
+        'getNearGrid': ('grid_near',),
+        'getAgentPos': ('XPos', 'YPos', 'ZPos', 'Pitch', 'Yaw'),
+        'getLineOfSights': ('LineOfSight',),
+        'getLife': ('Life',),
+        'getAir': ('Air',),
+        'getInventory': ('inventory',),
+        'getChat': ('Chat',),
+        'getRecipeList': ('recipes',),
+        'getItemList': ('item_list',),
+        'getHumanInputs': ('input_events',),
+        'getBlocksDropsList': ('block_item_tool_triple',),
+        'getNonSolidBlocks': ('nonsolid_blocks',),
+        'getBlockFromBigGrid': ('block_pos_big_grid',),
+        'getControlledMobs': ('ControlledMobs',),
+        'getOnGround': ('onGround',),
+    }
 
     def __init__(self, mc, agentId=0):
         self.mc = mc
@@ -538,12 +644,25 @@ class RobustObserver:
         if not self.mc.supportsSegmentation():
             self.canBeNone.append('getSegmentationFrame')
         self.max_dt = 1.0
+        self._ray_cache = None
+        self._block_masks = dict()
         self.cached = {method : (None, 0) for method in self.methods}
         for event in self.events:
             self.cached[event] = [(None, 0)]
         self.cbuff_history_len = 10
         self.cached_buffer = {method: (None, 0) for method in self.methods}
         self.cached_buffer_list = [self.cached_buffer]
+        # observation values the cached results were computed from
+        self._inputs = dict()
+        self._last_data = None
+        # cache entry -> sequence number, incremented on every update
+        self._versions = dict()
+        # cache entry -> condition on self.lock, created for waiters
+        self._conditions = dict()
+        # pose, life, air and food by observation time
+        self.history = ObservationHistory()
+        # map of grid_near observations, see enableVoxelMap
+        self.voxelMap = None
         self.commandBuffer = []
         self.expectedCommandsBuffer = []
         self.thread = None
@@ -558,8 +677,29 @@ class RobustObserver:
 
     def onObservationChanged(self, obs: TimestampedString) -> None:
         self.mc.updateObservations(obs, self.agentId)
+        data = self.mc.observe.get(self.agentId, None)
+        if data is not None and data is not self._last_data:
+            with self.lock:
+                self.history.append(obs.timestamp, data)
+            if self.voxelMap is not None:
+                self.__fuseVoxelMap(obs.timestamp, data)
         self._observeProcCached()
 
+    def enableVoxelMap(self, path=None, size=16):
+        """Fuse every grid_near observation into a VoxelMap,
+        with path its chunks are stored on disk"""
+        if self.voxelMap is None:
+            self.voxelMap = VoxelMap(size=size, path=path)
+        return self.voxelMap
+
+    def __fuseVoxelMap(self, t, data):
+        grid = data.get('grid_near')
+        pos = [data.get('XPos'), data.get('YPos'), data.get('ZPos')]
+        if grid is None or None in pos:
+            return
+        array = self.mc.gridToArray(grid, self.agentId)
+        self.voxelMap.fuseObservation(array, self.mc.getGridBox(self.agentId), pos, t)
+
     def onNewFrameCallback(self, frame: TimestampedVideoFrame) -> None:
         if frame.frametype == FrameType.COLOUR_MAP:
             self.mc.updateSegmentation(frame, self.agentId)
@@ -585,8 +725,27 @@ class RobustObserver:
     def clear(self):
         with self.lock:
             self.cached = {k: (None, 0) for k in self.cached}
+            self._inputs.clear()
+            self._last_data = None
+            self.history.clear()
             for event in self.events:
                 self.cached[event] = [(None, 0)]
+            for k in self.cached:
+                self._notify(k)
+
+    def getPoseAt(self, t):
+        """[x, y, z, pitch, yaw] interpolated at time t from observation history,
+        e.g. at frame timestamp"""
+        with self.lock:
+            pose = self.history['pose'].at(t)
+        return None if pose is None else pose.tolist()
+
+    def getVelocity(self, stream='pose', t=None, dt=0.2):
+        """Rate of change of the stream per second over dt seconds before t,
+        angles in degrees per second"""
+        with self.lock:
+            velocity = self.history[stream].velocity(t, dt)
+        return None if velocity is None else velocity.tolist()
 
     def getCachedObserve(self, method, key=None, readEvent=True):
         with self.lock:
@@ -602,7 +761,7 @@ class RobustObserver:
         else:
             return val[key] if val is not None and key in val else None
 
-    def __peekCache(self, method):
+    def _peekCache(self, method):
         with self.lock:
             val = self.cached[method]
         if method in self.events:
@@ -613,12 +772,52 @@ class RobustObserver:
         self._observeProcCached()
 
     def _observeProcCached(self):
+        """Recompute getters whose observation values changed, changed() is
+        called only for them. Results of the other getters are just marked as fresh."""
+        data = self.mc.observe.get(self.agentId, None)
+        new_data = data is not self._last_data
+        self._last_data = data
+        t_new = time.time()
+        fresh = []
         for method in self.methods:
-            self._update_cache(method)
+            keys = self.observationKeys.get(method)
+            if keys is None:
+                # frames, compared by identity
+                v_new = getattr(self.mc, method)(self.agentId)
+                if v_new is not None and v_new is self.cached[method][0]:
+                    fresh.append(method)
+                else:
+                    self._store_cache(method, v_new, t_new)
+                continue
+            inputs = None if data is None else tuple(map(data.get, keys))
+            if inputs is None or inputs[0] is None:
+                # the getter returns None, that matters only if the result is outdated
+                self._inputs.pop(method, None)
+                if t_new - self.__get_cached_time(method) > self.max_dt:
+                    self._store_cache(method, None, t_new)
+            elif method in self.events:
+                # events are sent once, with the observation they happened in
+                if new_data:
+                    self._update_cache(method)
+            elif inputs == self._inputs.get(method):
+                fresh.append(method)
+            else:
+                self._inputs[method] = inputs
+                self._update_cache(method)
+        with self.lock:
+            for method in fresh:
+                v, t = self.cached[method]
+                if v is not None:
+                    self.cached_buffer[method] = (v, t)
+                    self.cached[method] = (v, t_new)
+                    self._notify(method)
 
     def _update_cache(self, method):
         t_new = time.time()
         v_new = getattr(self.mc, method)(self.agentId)
+        self._store_cache(method, v_new, t_new)
+
+    def _store_cache(self, method, v_new, t_new):
         outdated = False
         with self.lock:
             if method not in self.events:
@@ -636,8 +835,31 @@ class RobustObserver:
                     self.readEvents[method] = False
                 else:
                     self.cached[method] = (v_new, t_new)
+                self._notify(method)
             self.changed(method)
 
+    def _notify(self, method):
+        # called with self.lock held
+        self._versions[method] = self._versions.get(method, 0) + 1
+        condition = self._conditions.get(method)
+        if condition is not None:
+            condition.notify_all()
+
+    def getCacheVersion(self, method):
+        """Sequence number of the cache entry, it grows on every update"""
+        with self.lock:
+            return self._versions.get(method, 0)
+
+    def waitCacheUpdate(self, method, version, timeout=None):
+        """Block until the cache entry is newer than version or timeout seconds pass,
+        returns the current version"""
+        with self.lock:
+            condition = self._conditions.get(method)
+            if condition is None:
+                condition = self._conditions[method] = threading.Condition(self.lock)
+            condition.wait_for(lambda: self._versions.get(method, 0) > version, timeout)
+            return self._versions.get(method, 0)
+
     def changed(self, name):
         pass
 
@@ -690,35 +912,38 @@ class RobustObserver:
         # Do not force observeProcCached if the value was updated less than tick ago
         if time.time() - tm > self.tick and observeReq:
             self.observeProcCached()
-            tm = self.__get_cached_time(method)
-
-        # if updated observation is required, observation time should be changed
-        # (is not recommended while moving)
-        while all(x is None for x in self.__peekCache(method)) or\
-              (self.__get_cached_time(method)  == tm and updateReq):
-            time.sleep(self.tick)
-            self.observeProcCached()
-            if self.__get_cached_time(method) - tm > self.max_dt:
-                # It's better to return None rather than hanging too long
+        version = self.getCacheVersion(method)
+
+        # if updated observation is required, the cache entry should be updated
+        # by a new observation (is not recommended while moving)
+        deadline = time.time() + self.max_dt
+        while all(x is None for x in self._peekCache(method)) or\
+              (self.getCacheVersion(method) == version and updateReq):
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                # It's better to return None rather than hanging too long,
+                # expire outdated values before that
+                self.observeProcCached()
                 break
+            self.waitCacheUpdate(method, self.getCacheVersion(method), timeout)
         return self.getCachedObserve(method)
 
     def updateAllObservations(self):
         # we don't require observations to be updated in fact, but we try to do an update
         self.observeProcCached()
         start = time.time()
-        while not all([self.cached[method][0] is not None or (method in self.canBeNone or method in self.events) for method in self.methods]):
-            nones = []
-            time.sleep(self.tick)
-            self.observeProcCached()
-            now = time.time()
-            delta = now - start
-            if 2 < delta:
-                for method in self.methods:
-                    if self.cached[method][0] is None:
-                        if method not in self.canBeNone:
-                            nones.append(method)
+        while True:
+            with self.lock:
+                nones = [method for method in self.methods if self.cached[method][0] is None
+                         and method not in self.canBeNone and method not in self.events]
+                versions = [self._versions.get(method, 0) for method in nones]
+            if not nones:
+                break
+            if 2 < time.time() - start:
                 logger.warning("can't update cache for these methods %s", str(nones))
+            # cache entries are updated by observation callbacks
+            if self.waitCacheUpdate(nones[0], versions[0], self.max_dt) == versions[0]:
+                self.observeProcCached()
 
     def addCommandsToBuffer(self, commanList):
         self.commandBuffer.append(commanList)
@@ -743,6 +968,13 @@ class RobustObserver:
             self.addCommandsToBuffer(command)
             self.mc.sendCommand(' '.join(command), self.agentId)
 
+    def sendCommands(self, commands):
+        """send several commands, they arrive back-to-back"""
+        cmds = [command if isinstance(command, str) else ' '.join(command) for command in commands]
+        for cmd in cmds:
+            self.addCommandsToBuffer(cmd.split(' '))
+        self.mc.sendCommands(cmds, self.agentId)
+
     # ===== specific methods =====
 
     def dirToAgentPos(self, pos, observeReq=True):
@@ -769,6 +1001,16 @@ class RobustObserver:
         # TODO? Round to the center of the block (0.5)?
         return [x + pos[0], y + pos[1], z + pos[2]]
 
+    def gridAbsPositions(self, observeReq=True):
+        """float (N, 3) array of gridIndexToAbsPos for all grid_near cells"""
+        pos = self.waitNotNoneObserve('getAgentPos', observeReq=observeReq)
+        return self.mc.getGridOffsets(self.agentId).absPositions(pos)
+
+    def getNearGridArray(self, observeReq=True):
+        """Cached grid as int16 block ids, shape (Y, Z, X), see block_vocabulary"""
+        grid = self.waitNotNoneObserve('getNearGrid', observeReq=observeReq)
+        return self.mc.gridToArray(grid, self.agentId)
+
     def getNearGrid3D(self, observeReq=True):
         grid = self.waitNotNoneObserve('getNearGrid', observeReq=observeReq)
         gridBox = self.mc.getGridBox(self.agentId)
@@ -780,65 +1022,90 @@ class RobustObserver:
         pos = self.waitNotNoneObserve('getAgentPos', observeReq=observeReq)
         return MCConnector.yawDelta(degree2rad(pos[4]))
 
+    def _yawRay(self, x, z, yaw, dimZ, dimX):
+        """(z, x) grid indices of cells the ray from (x, z) in yaw direction crosses,
+        the same for all levels, so they are found once and gathered by numpy"""
+        key = (x, z, yaw, dimZ, dimX)
+        if self._ray_cache is not None and self._ray_cache[0] == key:
+            return self._ray_cache[1]
+        deltas = MCConnector.yawDelta(degree2rad(yaw))
+        deltas[0] /= 4
+        deltas[2] /= 4
+        x0int = int(x)
+        z0int = int(z)
+        zi = []
+        xi = []
+        for t in range(dimX + dimZ):
+            if int(x + deltas[0]) != int(x) or int(z + deltas[2]) != int(z):
+                dxGrid = int(x + deltas[0]) - x0int
+                dzGrid = int(z + deltas[2]) - z0int
+                # FixMe? Works for symmetric grids only
+                if abs(dxGrid)*2+1 >= dimX or abs(dzGrid)*2+1 >= dimZ:
+                    break
+                zi.append(dzGrid+(dimZ-1)//2)
+                xi.append(dxGrid+(dimX-1)//2)
+            x += deltas[0]
+            z += deltas[2]
+        ray = (numpy.array(zi, dtype=numpy.intp), numpy.array(xi, dtype=numpy.intp))
+        self._ray_cache = (key, ray)
+        return ray
+
+    def gridInYawArray(self, observeReq=True):
+        """Vertical slice of the grid in the line-of-sight direction,
+        int16 block ids of shape (Y, cells along the ray)"""
+        grid = self.getNearGridArray(observeReq)
+        self.waitNotNoneObserve('getAgentPos', observeReq=observeReq)
+        pos = self.getCachedObserve('getAgentPos')
+        if grid is None or pos is None:
+            return None
+        zi, xi = self._yawRay(pos[0], pos[2], pos[4], grid.shape[1], grid.shape[2])
+        return grid[:, zi, xi]
+
     def gridInYaw(self, observeReq=True):
         '''Vertical slice of the grid in the line-of-sight direction'''
-        grid3D = self.getNearGrid3D(observeReq)
-        deltas = self.getYawDeltas(observeReq)
-        pos = self.getCachedObserve('getAgentPos')
-        if grid3D is None or deltas is None:
+        # TODO? It works, but when the agent is still partly standing
+        # on the previous block, it will not show the next block (on which
+        # the agent is formally standing, but which can be air, so the agent
+        # will fall down if it moves forward within this block)
+        gridSlice = self.gridInYawArray(observeReq)
+        if gridSlice is None:
             return None
-        dimX = len(grid3D[0][0])
-        dimZ = len(grid3D[0])
-        dimY = len(grid3D)
-        deltas[0] /= 4
-        deltas[2] /= 4
-        objs = []
-        for y in range(dimY):
-            grid2D = grid3D[y]
-            line = []
-            x = pos[0]
-            z = pos[2]
-            x0int = int(x)
-            z0int = int(z)
-            for t in range(dimX + dimZ):
-                # TODO? It works, but when the agent is still partly standing
-                # on the previous block, it will not show the next block (on which
-                # the agent is formally standing, but which can be air, so the agent
-                # will fall down if it moves forward within this block)
-                if int(x + deltas[0]) != int(x) or int(z + deltas[2]) != int(z):
-                    dxGrid = int(x + deltas[0]) - x0int
-                    dzGrid = int(z + deltas[2]) - z0int
-                    # FixMe? Works for symmetric grids only
-                    if abs(dxGrid)*2+1 >= dimX or abs(dzGrid)*2+1 >= dimZ:
-                        break
-                    line += [grid2D[dzGrid+(dimZ-1)//2][dxGrid+(dimX-1)//2]]
-                x += deltas[0]
-                z += deltas[2]
-            objs += [line]
-        return objs
+        return [block_vocabulary.decode(line) for line in gridSlice]
+
+    def blockMask(self, names):
+        """Read-only boolean array indexed by block_vocabulary ids, True for names,
+        e.g. blockMask(self.passableBlocks)[getNearGridArray()].
+        It covers all possible ids, so it can be kept"""
+        key = tuple(names)
+        mask = self._block_masks.get(key)
+        if mask is None:
+            if len(self._block_masks) > 8:
+                self._block_masks.clear()
+            mask = block_vocabulary.mask(key)
+            mask.flags.writeable = False
+            self._block_masks[key] = mask
+        return mask
 
     def analyzeGridInYaw(self, observeReq=True):
-        passableBlocks = self.passableBlocks
-        deadlyBlocks = RobustObserver.deadlyBlocks
-        gridSlice = self.gridInYaw(observeReq)
-        underground = gridSlice[(len(gridSlice) - 1) // 2 - 2]
-        ground = gridSlice[(len(gridSlice) - 1) // 2 - 1]
-        solid = all([b not in passableBlocks for b in ground])
-        wayLv0 = gridSlice[(len(gridSlice) - 1) // 2]
-        wayLv1 = gridSlice[(len(gridSlice) - 1) // 2 + 1]
-        passWay = all([b in passableBlocks for b in wayLv0]) and \
-                  all([b in passableBlocks for b in wayLv1])
+        gridSlice = self.gridInYawArray(observeReq)
+        passable = self.blockMask(self.passableBlocks)[gridSlice]
+        deadly = self.blockMask(RobustObserver.deadlyBlocks)[gridSlice].any(axis=1).tolist()
+        anyPassable = passable.any(axis=1).tolist()
+        allPassable = passable.all(axis=1).tolist()
+        mid = (len(gridSlice) - 1) // 2
+        underground, ground, wayLv0, wayLv1 = mid - 2, mid - 1, mid, mid + 1
+        solid = not anyPassable[ground]
+        passWay = allPassable[wayLv0] and allPassable[wayLv1]
         lvl = (len(gridSlice) + 1) // 2
-        for h in range(len(gridSlice)):
-            if gridSlice[-h-1][0] not in passableBlocks:
+        for passableStart in passable[::-1, 0].tolist():
+            if not passableStart:
                 break
             lvl -= 1
-        safe = all([b not in deadlyBlocks for b in ground]) and \
-               all([b not in deadlyBlocks for b in wayLv0]) and \
-               all([b not in deadlyBlocks for b in wayLv1])
+        safe = not (deadly[ground] or deadly[wayLv0] or deadly[wayLv1])
         if lvl < -1:
-            safe = safe and all([b not in deadlyBlocks for b in underground])
-            if ground[0] != 'water' and underground[0] != 'water':
+            safe = safe and not deadly[underground]
+            water = block_vocabulary.id('water')
+            if gridSlice[ground, 0] != water and gridSlice[underground, 0] != water:
                 safe = False
         return {'solid': solid, 'passWay': passWay, 'level': lvl, 'safe': safe}
 
@@ -849,11 +1116,8 @@ class RobustObserver:
         time.sleep(0.2)
 
     def stopMove(self):
-        self.mc.move("0", self.agentId)
-        self.mc.turn("0", self.agentId)
-        self.mc.pitch("0", self.agentId)
-        self.mc.jump("0", self.agentId)
-        self.mc.strafe("0", self.agentId)
+        self.mc.sendCommands([self.mc._motionCommand(command, "0", self.agentId)
+                              for command in ('move', 'turn', 'pitch', 'jump', 'strafe')], self.agentId)
 
     def filterInventoryItem(self, item, observeReq=True):
         inv = self.waitNotNoneObserve('getInventory', True, observeReq=observeReq)
@@ -868,21 +1132,38 @@ class RobustObserver:
             objs = [objs]
         grid = self.waitNotNoneObserve('getNearGrid', observeReq=observeReq)
         pos  = self.waitNotNoneObserve('getAgentPos', observeReq=observeReq)
-        d2 = 10000
-        target = None
-        for i in range(len(grid)):
-            if grid[i] not in objs: continue
-            [x, y, z] = self.mc.gridIndexToPos(i)
-            # penalty for height
-            d2c = x * x + (y - 1.66) * (y - 1.66) * 4 + z * z
-            if d2c < d2:
-                d2 = d2c
-                # target = self.gridIndexToAbsPos(i, observeReq)
-                target = [x + pos[0], y + pos[1], z + pos[2]]
-                if return_target_block:
-                    target = [target, grid[i]]
+        offsets = self.mc.getGridOffsets(self.agentId)
+        i = offsets.nearest(self.__gridMask(grid, objs), maxDist=10000)
+        if i < 0:
+            return None
+        [x, y, z] = offsets.positionList[i]
+        target = [x + pos[0], y + pos[1], z + pos[2]]
+        if return_target_block:
+            target = [target, grid[i]]
         return target
 
+    def nearest_k(self, blocks, k, observeReq=True):
+        """Positions of up to k nearest blocks from the grid, nearest first,
+        with the same height penalty as nearestFromGrid"""
+        return self.__gridPositions(blocks, k, observeReq)
+
+    def all_positions(self, blocks, observeReq=True):
+        """Positions of all blocks from the grid, nearest first"""
+        return self.__gridPositions(blocks, None, observeReq)
+
+    def __gridPositions(self, blocks, k, observeReq):
+        if not isinstance(blocks, list):
+            blocks = [blocks]
+        grid = self.waitNotNoneObserve('getNearGrid', observeReq=observeReq)
+        pos = self.waitNotNoneObserve('getAgentPos', observeReq=observeReq)
+        offsets = self.mc.getGridOffsets(self.agentId)
+        indices = offsets.nearestK(self.__gridMask(grid, blocks), k)
+        return offsets.absPositions(pos)[indices].tolist()
+
+    def __gridMask(self, grid, blocks):
+        ids = self.mc.gridToArray(grid, self.agentId).ravel()
+        return self.blockMask(blocks)[ids]
+
     def nearestFromEntities(self, obj, observeReq=True):
         ent = self.waitNotNoneObserve('getNearEntities', observeReq=observeReq)
         pos = self.waitNotNoneObserve('getAgentPos', observeReq=observeReq)
@@ -900,26 +1181,22 @@ class RobustObserver:
 
 
 class RobustObserverWithCallbacks(RobustObserver):
-    def __init__(self, mc, agentId=0):
+    def __init__(self, mc, agentId=0, max_workers=2, process_workers=0):
         super().__init__(mc, agentId)
-        # name, on_change, function triples
+        # name, on_change, task triples
         self.callbacks = []
-        # future -> name, cb pairs
-        self._futures = dict()
-        self._in_process = set()
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.executor = CallbackExecutor(max_workers=max_workers, process_workers=process_workers)
         self.mlogy = None
 
     def set_mlogy(self, mlogy):
         self.mlogy = mlogy
 
     def changed(self, name):
-        for (cb_name, on_change, cb) in self.callbacks:
-            if name == on_change and cb not in self._in_process:
-                # submit to the thread pool
-                self.submit(cb, cb_name)
+        for (cb_name, on_change, task) in self.callbacks:
+            if name == on_change:
+                self.executor.trigger(task)
 
-    def addCallback(self, name, on_change, cb):
+    def addCallback(self, name, on_change, cb, policy=None):
         """
         add callback to be called if data in robust observer's cache
         is changed
@@ -930,34 +1207,185 @@ class RobustObserverWithCallbacks(RobustObserver):
         on_change: str
            key to be monitored for change event
         cb: Callable
-           callback
+           callback, called without arguments, with process policy
+           it gets the cached value of on_change
+        policy: CallbackPolicy
+           priority, coalescing, deadline and process pool use
+        """
+        if policy is None:
+            policy = CallbackPolicy()
+        if name is not None:
+            self.cached[name] = (None, 0)
+        task = self.executor.add(cb, policy, partial(self._on_callback_result, name),
+                                 lambda: (self.getCachedObserve(on_change, readEvent=False),))
+        self.callbacks.append((name, on_change, task))
+
+    def addBatchedCallback(self, name, on_change, prepare, batcher: BatchExecutor, policy=None):
+        """
+        like addCallback, but the work is run by batcher together with
+        items of other observers sharing it
+
+        prepare: Callable
+           called without arguments in this observer's executor, returns
+           the item to submit to batcher, or None to skip
+        batcher: BatchExecutor
+           its result for the item is stored in the cache under name
         """
         if name is not None:
             self.cached[name] = (None, 0)
-        self.callbacks.append((name, on_change, cb))
+        on_result = partial(self._on_callback_result, name)
 
-    def done_callback(self, fut):
-        if fut in self._futures:
-            tm = time.time()
+        def submit():
+            item = prepare()
+            if item is not None:
+                batcher.submit(self, item, on_result)
+        submit.__name__ = getattr(prepare, '__name__', type(prepare).__name__)
+        self.addCallback(None, on_change, submit, policy)
+
+    def _on_callback_result(self, name, result, tm):
+        if name is None:
+            return
+        with self.lock:
+            self.cached[name] = (result, tm)
+            self._notify(name)
+        self.changed(name)
+
+    def getCallbackStats(self):
+        """Queueing delay, run time and counters per callback,
+        keyed by callback name or by function name for unnamed callbacks"""
+        stats = dict()
+        for (name, on_change, task) in self.callbacks:
+            if name is None:
+                name = getattr(task.fn, '__name__', type(task.fn).__name__)
+            stats[name] = self.executor.getStats(task)
+        return stats
+
+
+class AsyncRobustObserver(RobustObserver):
+    """RobustObserver for asyncio code, coroutines wait for cache updates and
+    observations without blocking the event loop or polling.
+
+    AgentHost delivers observations and frames in its own threads,
+    they are passed to the waiting event loops with call_soon_threadsafe.
+    """
+    def __init__(self, mc, agentId=0, queue_size=16):
+        # maximal number of observations or frames waiting in a subscriber queue
+        self.queue_size = queue_size
+        # cache entry -> (loop, future) pairs
+        self._async_waiters = dict()
+        # (loop, queue) pairs
+        self._observation_queues = []
+        # (loop, queue, frametype) triples
+        self._frame_queues = []
+        # callbacks are added here
+        super().__init__(mc, agentId)
+
+    def onObservationChanged(self, obs: TimestampedString) -> None:
+        data = self.mc.observe.get(self.agentId, None)
+        super().onObservationChanged(obs)
+        new_data = self.mc.observe.get(self.agentId, None)
+        if new_data is not None and new_data is not data:
+            with self.lock:
+                queues = list(self._observation_queues)
+            for loop, queue in queues:
+                self.__put(loop, queue, new_data)
+
+    def onNewFrameCallback(self, frame: TimestampedVideoFrame) -> None:
+        super().onNewFrameCallback(frame)
+        with self.lock:
+            queues = [(loop, queue) for (loop, queue, frametype) in self._frame_queues
+                      if frametype is None or frametype == frame.frametype]
+        for loop, queue in queues:
+            self.__put(loop, queue, frame)
+
+    def _notify(self, method):
+        super()._notify(method)
+        for loop, future in self._async_waiters.pop(method, ()):
+            self.__call_soon(loop, self.__wake, future)
+
+    @staticmethod
+    def __call_soon(loop, callback, *args):
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # the loop is closed, nobody waits anymore
+            pass
+
+    @staticmethod
+    def __wake(future):
+        if not future.done():
+            future.set_result(None)
+
+    def __put(self, loop, queue, item):
+        def put():
+            if queue.full():
+                # the consumer is behind, drop the oldest item
+                queue.get_nowait()
+            queue.put_nowait(item)
+        self.__call_soon(loop, put)
+
+    async def wait_for(self, method, newer_than=None, timeout=None):
+        """Wait for the cached value of method.
+
+        newer_than: int
+           cache version from getCacheVersion, wait until the entry is updated after it,
+           if None wait until the value is not None
+        timeout: float
+           seconds, asyncio.TimeoutError is raised after that
+        """
+        return await asyncio.wait_for(self.__wait(method, newer_than), timeout)
+
+    async def __wait(self, method, newer_than):
+        loop = asyncio.get_running_loop()
+        while True:
             with self.lock:
-                name, cb = self._futures[fut]
-                del self._futures[fut]
-                result = None
-                exception = fut.exception()
-                if exception is None:
-                    result = fut.result()
+                if newer_than is None:
+                    ready = any(x is not None for x in self._peekCache(method))
                 else:
-                    logger.exception(exception)
-                if name is not None:
-                    # logger.debug('adding results from %s', name)
-                    self.cached[name] = (result, tm)
-                    self.changed(name)
-                self._in_process.discard(cb)
-
-    def submit(self, cb, name):
-        future = self.executor.submit(cb)
+                    ready = self._versions.get(method, 0) > newer_than
+                if ready:
+                    return self.getCachedObserve(method)
+                future = loop.create_future()
+                waiter = (loop, future)
+                self._async_waiters.setdefault(method, []).append(waiter)
+            try:
+                await future
+            finally:
+                with self.lock:
+                    waiters = self._async_waiters.get(method, [])
+                    if waiter in waiters:
+                        waiters.remove(waiter)
+
+    async def observations(self) -> AsyncIterator[dict]:
+        """Yield observations as they arrive, already parsed by the connector.
+        If the consumer falls behind more than queue_size observations, the oldest are dropped."""
+        queue = asyncio.Queue(self.queue_size)
+        entry = (asyncio.get_running_loop(), queue)
+        with self.lock:
+            self._observation_queues.append(entry)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            with self.lock:
+                self._observation_queues.remove(entry)
+
+    async def frames(self, frametype: Optional[FrameType] = None) -> AsyncIterator[TimestampedVideoFrame]:
+        """Yield video frames of frametype, or of all types, as they arrive.
+        If the consumer falls behind more than queue_size frames, the oldest are dropped."""
+        queue = asyncio.Queue(self.queue_size)
+        entry = (asyncio.get_running_loop(), queue, frametype)
         with self.lock:
-            self._futures[future] = (name, cb)
-            self._in_process.add(cb)
-        future.add_done_callback(self.done_callback)
+            self._frame_queues.append(entry)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            with self.lock:
+                self._frame_queues.remove(entry)
 
+    async def send_commands(self, commands):
+        """Send several commands, they arrive back-to-back.
+        AgentHost only queues them for its io loop, so the calling loop isn't blocked."""
+        self.sendCommands(commands)
+        await asyncio.sleep(0)
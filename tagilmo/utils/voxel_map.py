@@ -0,0 +1,233 @@
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy
+from numpy.lib.format import open_memmap
+
+from tagilmo.utils.block_vocabulary import block_vocabulary
+
+
+# block id of cells which were never seen
+UNKNOWN = -1
+
+
+class Chunk:
+    """size^3 cells, arrays are indexed [y, z, x] like grid_near"""
+    __slots__ = ('blocks', 'seen')
+
+    def __init__(self, blocks: numpy.ndarray, seen: numpy.ndarray):
+        self.blocks = blocks
+        self.seen = seen
+
+    @classmethod
+    def empty(cls, size: int) -> 'Chunk':
+        return cls(numpy.full((size, size, size), UNKNOWN, dtype=numpy.int16),
+                   numpy.zeros((size, size, size), dtype=numpy.float64))
+
+
+class VoxelMap:
+    """Sparse map of the world fused from grid_near observations.
+
+    Cells hold block_vocabulary ids and the time they were seen last,
+    chunks of size^3 cells are created where the agent looks.
+    With path, chunks are memory-mapped .npy files in that directory and
+    at most max_loaded of them are kept open, so the map can be larger than memory.
+    Block names are saved there whenever ids unknown to the stored ones are fused;
+    close() or leaving a with block writes the chunks.
+    """
+
+    def __init__(self, size: int = 16, path: Optional[str] = None, max_loaded: int = 256):
+        self.size = size
+        self.path = path
+        self.max_loaded = max_loaded
+        self.lock = threading.RLock()
+        # chunk coordinate -> Chunk, least recently used first when on disk
+        self.chunks: 'OrderedDict[Tuple[int, int, int], Chunk]' = OrderedDict()
+        # chunk coordinates of all chunks, loaded or not
+        self.keys = set()
+        # number of block names in blocks.json
+        self.saved_names = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self.__openStored()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __enter__(self) -> 'VoxelMap':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __file(self, key: Tuple[int, int, int], name: str) -> str:
+        return os.path.join(self.path, '{}_{}_{}.{}.npy'.format(*key, name))
+
+    def __openStored(self) -> None:
+        names_file = os.path.join(self.path, 'blocks.json')
+        if not os.path.exists(names_file):
+            return
+        with open(names_file) as f:
+            stored = json.load(f)
+        for fname in os.listdir(self.path):
+            if fname.endswith('.blocks.npy'):
+                self.keys.add(tuple(int(c) for c in fname.split('.')[0].split('_')))
+        # ids of this process may differ from the stored ones
+        remap = block_vocabulary.encode(stored)
+        if (remap != numpy.arange(len(stored))).any():
+            remap = numpy.append(remap, UNKNOWN).astype(numpy.int16)
+            for key in self.keys:
+                blocks = open_memmap(self.__file(key, 'blocks'), mode='r+')
+                blocks[...] = remap[blocks]
+                blocks.flush()
+                del blocks
+        self.__saveNames()
+
+    def __saveNames(self) -> None:
+        names = list(block_vocabulary.names)
+        with open(os.path.join(self.path, 'blocks.json'), 'w') as f:
+            json.dump(names, f)
+        self.saved_names = len(names)
+
+    def __saveNewNames(self) -> None:
+        # chunk files may reach the disk any time, so their ids must be in blocks.json
+        if self.path is not None and len(block_vocabulary) > self.saved_names:
+            self.__saveNames()
+
+    def chunk(self, key: Tuple[int, int, int], create: bool = False) -> Optional[Chunk]:
+        with self.lock:
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                if self.path is not None:
+                    self.chunks.move_to_end(key)
+                return chunk
+            if key not in self.keys and not create:
+                return None
+            if self.path is None:
+                chunk = Chunk.empty(self.size)
+            else:
+                chunk = self.__load(key)
+            self.chunks[key] = chunk
+            self.keys.add(key)
+            if self.path is not None and len(self.chunks) > self.max_loaded:
+                _, old = self.chunks.popitem(last=False)
+                old.blocks.flush()
+                old.seen.flush()
+                self.__saveNewNames()
+            return chunk
+
+    def __load(self, key: Tuple[int, int, int]) -> Chunk:
+        shape = (self.size,) * 3
+        if key in self.keys:
+            return Chunk(open_memmap(self.__file(key, 'blocks'), mode='r+'),
+                         open_memmap(self.__file(key, 'seen'), mode='r+'))
+        chunk = Chunk(open_memmap(self.__file(key, 'blocks'), mode='w+', dtype=numpy.int16, shape=shape),
+                      open_memmap(self.__file(key, 'seen'), mode='w+', dtype=numpy.float64, shape=shape))
+        chunk.blocks[...] = UNKNOWN
+        return chunk
+
+    def flush(self) -> None:
+        """Write loaded chunks and block names to disk"""
+        if self.path is None:
+            return
+        with self.lock:
+            for chunk in self.chunks.values():
+                chunk.blocks.flush()
+                chunk.seen.flush()
+            self.__saveNames()
+
+    def close(self) -> None:
+        """Flush and unload all chunks, they are loaded again when used"""
+        with self.lock:
+            self.flush()
+            self.chunks.clear()
+
+    def __pieces(self, lo: Sequence[int], shape: Sequence[int]) -> Iterator[Tuple[Tuple[int, int, int], tuple, tuple]]:
+        # chunk keys with slices of the chunk and of the box [lo, lo + shape) in (y, z, x) order
+        size = self.size
+        axes = []
+        for start, length in ((lo[1], shape[0]), (lo[2], shape[1]), (lo[0], shape[2])):
+            pieces = []
+            c = start
+            while c < start + length:
+                key = c // size
+                end = min((key + 1) * size, start + length)
+                pieces.append((key, slice(c - key * size, end - key * size), slice(c - start, end - start)))
+                c = end
+            axes.append(pieces)
+        for ky, sy, by in axes[0]:
+            for kz, sz, bz in axes[1]:
+                for kx, sx, bx in axes[2]:
+                    yield (kx, ky, kz), (sy, sz, sx), (by, bz, bx)
+
+    def fuse(self, grid: numpy.ndarray, lo: Sequence[int], t: float) -> None:
+        """Write grid of block ids, shape (Y, Z, X), with its lowest corner at lo = [x, y, z]"""
+        with self.lock:
+            self.__saveNewNames()
+            for key, cell, box in self.__pieces(lo, grid.shape):
+                chunk = self.chunk(key, create=True)
+                chunk.blocks[cell] = grid[box]
+                chunk.seen[cell] = t
+
+    def fuseObservation(self, grid: numpy.ndarray, gridBox: Sequence[Sequence[int]],
+                        pos: Sequence[float], t: float) -> None:
+        """Fuse grid_near array observed at agent position pos"""
+        self.fuse(grid, [math.floor(p) + b[0] for p, b in zip(pos[:3], gridBox)], t)
+
+    def region(self, lo: Sequence[int], hi: Sequence[int]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Block ids and last seen times of cells lo <= [x, y, z] <= hi, shape (Y, Z, X),
+        UNKNOWN and 0 for cells never seen"""
+        shape = (hi[1] - lo[1] + 1, hi[2] - lo[2] + 1, hi[0] - lo[0] + 1)
+        blocks = numpy.full(shape, UNKNOWN, dtype=numpy.int16)
+        seen = numpy.zeros(shape, dtype=numpy.float64)
+        with self.lock:
+            for key, cell, box in self.__pieces(lo, shape):
+                chunk = self.chunk(key)
+                if chunk is not None:
+                    blocks[box] = chunk.blocks[cell]
+                    seen[box] = chunk.seen[cell]
+        return blocks, seen
+
+    def blockAt(self, pos: Sequence[float]) -> Optional[str]:
+        """Name of the block at pos, None if it wasn't seen"""
+        x, y, z = (math.floor(p) for p in pos[:3])
+        size = self.size
+        with self.lock:
+            chunk = self.chunk((x // size, y // size, z // size))
+            if chunk is None:
+                return None
+            i = int(chunk.blocks[y % size, z % size, x % size])
+        return None if i == UNKNOWN else block_vocabulary.name(i)
+
+    def nearest(self, names: Iterable[str], pos: Sequence[float], maxDist: float = math.inf) -> Optional[List[int]]:
+        """Integer position of the nearest cell with one of the blocks, by Euclidean
+        distance between pos and the cell center, None if there is none within maxDist"""
+        # False for UNKNOWN at index -1
+        table = block_vocabulary.mask(names)
+        size = self.size
+        p = numpy.asarray(pos[:3], dtype=float)
+        with self.lock:
+            if not self.keys:
+                return None
+            keys = list(self.keys)
+            lo = numpy.array(keys) * size
+            # chunks by the distance to their nearest point
+            gap = numpy.maximum(numpy.maximum(lo - p, p - (lo + size)), 0)
+            chunkDist = numpy.sqrt((gap * gap).sum(axis=1))
+            best, bestD = None, maxDist
+            for k in numpy.argsort(chunkDist, kind='stable').tolist():
+                if chunkDist[k] > bestD:
+                    break
+                y, z, x = numpy.nonzero(table[self.chunk(keys[k]).blocks])
+                if not len(x):
+                    continue
+                xyz = numpy.stack([x, y, z], axis=1) + lo[k]
+                d = numpy.sqrt((((xyz + 0.5) - p) ** 2).sum(axis=1))
+                j = int(numpy.argmin(d))
+                if d[j] < bestD or (best is None and d[j] == bestD):
+                    best, bestD = xyz[j].tolist(), float(d[j])
+        return best
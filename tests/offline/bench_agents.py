@@ -0,0 +1,131 @@
+"""
+memory, threads and cpu per agent with private or shared io runtime
+
+each configuration runs in a separate process, fake vereya in yet another one
+
+    python bench_agents.py --agents 1 8 32 --obs-rate 20 --duration 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import logging
+
+from tagilmo import VereyaPython as VP
+from common import init_mission
+from bench_transport import RemoteVereya, wait_mission_ended
+
+
+logger = logging.getLogger(__name__)
+
+
+def rss() -> int:
+    """resident memory of this process in bytes"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+class Counter:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def onObservation(self, obs) -> None:
+        with self.lock:
+            self.count += 1
+
+
+def run(args) -> dict:
+    vereya = RemoteVereya(args.obs_rate, 0)
+    runtime = VP.getSharedRuntime() if args.shared else None
+    rss0 = rss()
+    threads0 = threading.active_count()
+    counter = Counter()
+    agents = []
+    try:
+        t0 = time.time()
+        for _ in range(args.agents):
+            mc, rob = init_mission(vereya, runtime=runtime)
+            mc.agent_hosts[0].addOnObservationCallback(counter.onObservation)
+            assert mc.safeStart()
+            agents.append((mc, rob))
+        start_time = time.time() - t0
+        time.sleep(args.warmup)
+        with counter.lock:
+            counter.count = 0
+        cpu0 = time.process_time()
+        t0 = time.time()
+        time.sleep(args.duration)
+        cpu = time.process_time() - cpu0
+        elapsed = time.time() - t0
+        result = {'agents': args.agents,
+                  'runtime': 'shared' if args.shared else 'private',
+                  'loop': type(agents[0][0].agent_hosts[0].io_service).__name__,
+                  'start_s_per_agent': start_time / args.agents,
+                  'rss_mb_per_agent': (rss() - rss0) / args.agents / 2 ** 20,
+                  'threads_per_agent': (threading.active_count() - threads0) / args.agents,
+                  'cpu_percent_per_agent': cpu / elapsed * 100 / args.agents,
+                  'obs_per_s_per_agent': counter.count / elapsed / args.agents}
+        for mc, rob in agents:
+            rob.sendCommand('quit')
+        for mc, rob in agents:
+            wait_mission_ended(mc.agent_hosts[0])
+    finally:
+        for mc, rob in agents:
+            mc.stop()
+        vereya.stop()
+    return result
+
+
+def run_all(args) -> list:
+    results = []
+    for agents in args.agents:
+        for shared in (False, True):
+            cmd = [sys.executable, os.path.abspath(__file__), '--single', '--json',
+                   '--agents', str(agents), '--obs-rate', str(args.obs_rate),
+                   '--duration', str(args.duration), '--warmup', str(args.warmup)]
+            if shared:
+                cmd.append('--shared')
+            out = subprocess.run(cmd, check=True, capture_output=True, text=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def report(results: list) -> None:
+    print(f"{'agents':>6} {'runtime':>8} {'loop':>22} {'start s':>8} {'rss MB':>8} "
+          f"{'threads':>8} {'cpu %':>8} {'obs/s':>8}   (per agent)")
+    for r in results:
+        print(f"{r['agents']:>6} {r['runtime']:>8} {r['loop']:>22} {r['start_s_per_agent']:>8.3f} "
+              f"{r['rss_mb_per_agent']:>8.2f} {r['threads_per_agent']:>8.2f} "
+              f"{r['cpu_percent_per_agent']:>8.2f} {r['obs_per_s_per_agent']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AgentHost per agent overhead benchmark')
+    parser.add_argument('--agents', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--obs-rate', type=float, default=20.0)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--shared', action='store_true', help='use shared io runtime, with --single')
+    parser.add_argument('--single', action='store_true', help='run one configuration in this process')
+    parser.add_argument('--json', action='store_true', help='print result as json')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    if args.single:
+        args.agents = args.agents[0]
+        results = [run(args)]
+    else:
+        results = run_all(args)
+    if args.json:
+        print(json.dumps(results[0] if args.single else results))
+    else:
+        report(results)
+
+
+if __name__ == '__main__':
+    main()
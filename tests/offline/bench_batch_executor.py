@@ -0,0 +1,90 @@
+"""
+BatchExecutor compared with every agent running its own batch-size-1 forward pass
+
+torch isn't needed: the network is a numpy stand-in of two dense layers,
+frames of all agents arrive at the same rate
+
+    python bench_batch_executor.py --agents 8 --frames 100 --fps 20 --window 0.01
+"""
+import time
+import argparse
+import threading
+
+import numpy
+
+from tagilmo.utils.callback_executor import BatchExecutor
+
+
+class DenseNet:
+    """matrix products over flattened (C, H, W) frames"""
+
+    def __init__(self, shape=(3, 60, 96), hidden=512, outputs=5 * 60 * 96 // 64):
+        rng = numpy.random.default_rng(0)
+        size = int(numpy.prod(shape))
+        self.w1 = rng.standard_normal((size, hidden), dtype=numpy.float32) / numpy.sqrt(size)
+        self.w2 = rng.standard_normal((hidden, outputs), dtype=numpy.float32) / numpy.sqrt(hidden)
+
+    def __call__(self, frames):
+        x = numpy.stack(frames).reshape(len(frames), -1)
+        return list(numpy.maximum(x @ self.w1, 0) @ self.w2)
+
+
+def run_agents(args, infer):
+    """agents submit frames at fps, returns mean and max latency in ms"""
+    latencies = []
+    lock = threading.Lock()
+    frame = numpy.random.default_rng(1).standard_normal((3, 60, 96), dtype=numpy.float32)
+
+    def agent(i):
+        done = threading.Event()
+        for _ in range(args.frames):
+            t0 = time.perf_counter()
+            done.clear()
+            infer(i, frame, done)
+            done.wait()
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+            time.sleep(max(0.0, 1 / args.fps - (time.perf_counter() - t0)))
+
+    threads = [threading.Thread(target=agent, args=(i,)) for i in range(args.agents)]
+    t0 = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - t0
+    return numpy.mean(latencies) * 1e3, numpy.max(latencies) * 1e3, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='batched inference benchmark')
+    parser.add_argument('--agents', type=int, default=8)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--fps', type=float, default=20)
+    parser.add_argument('--window', type=float, default=0.01)
+    args = parser.parse_args()
+    print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+    net = DenseNet()
+
+    def single(i, frame, done):
+        net([frame])
+        done.set()
+
+    mean, worst, elapsed = run_agents(args, single)
+    print(f"{'batch of 1':<12} latency mean {mean:7.2f} ms max {worst:7.2f} ms, total {elapsed:.2f} s")
+    batcher = BatchExecutor(net, window=args.window, max_batch=args.agents)
+
+    def batched(i, frame, done):
+        batcher.submit(i, frame, lambda result, tm: done.set())
+
+    mean, worst, elapsed = run_agents(args, batched)
+    stats = batcher.getStats()
+    batcher.shutdown()
+    print(f"{'batched':<12} latency mean {mean:7.2f} ms max {worst:7.2f} ms, total {elapsed:.2f} s")
+    print(f"batch size mean {stats.batch_size:.2f} max {stats.max_batch_size}, "
+          f"queue time mean {stats.queue_time * 1e3:.2f} ms max {stats.max_queue_time * 1e3:.2f} ms, "
+          f"run time {stats.run_time * 1e3:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
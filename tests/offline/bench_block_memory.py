@@ -0,0 +1,52 @@
+"""
+NoticeBlocks spatial hash compared with the lists it replaced
+
+    python bench_block_memory.py --sizes 5 100 1000 5000 --calls 2000
+"""
+import math
+import time
+import random
+import argparse
+
+from mcdemoaux.agenttools.block_memory import NoticeBlocks
+from reference import ListNoticeBlocks, random_pos
+
+
+def fill(memory, rng, block, size, extent):
+    # sightings are spread out, most of them are kept
+    for _ in range(size * 3):
+        if block in memory.blocks and len(memory.blocks[block]) >= size:
+            break
+        memory.updateBlock(block, random_pos(rng, extent))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NoticeBlocks benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 100, 1000, 5000])
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+    print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+    print('us per call with that many remembered positions')
+    print(f"{'size':>8}{'list add':>12}{'hash add':>12}{'list near':>12}{'hash near':>12}")
+    for size in args.sizes:
+        extent = int(10 * math.sqrt(size)) + 20
+        results = []
+        for memory in (ListNoticeBlocks(max_len=size), NoticeBlocks()):
+            memory.max_len = size
+            rng = random.Random(0)
+            fill(memory, rng, 'log', size, extent)
+            queries = [random_pos(rng, extent) for _ in range(args.calls)]
+            t0 = time.perf_counter()
+            for pos in queries:
+                memory.updateBlock('log', pos)
+            add = (time.perf_counter() - t0) / args.calls * 1e6
+            t0 = time.perf_counter()
+            for pos in queries:
+                memory.recallNearest(['log'], pos)
+            near = (time.perf_counter() - t0) / args.calls * 1e6
+            results.append((add, near))
+        print(f"{size:>8}{results[0][0]:>12.1f}{results[1][0]:>12.1f}{results[0][1]:>12.1f}{results[1][1]:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
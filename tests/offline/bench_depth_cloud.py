@@ -0,0 +1,42 @@
+"""
+DepthUnprojector compared with unprojecting every pixel separately
+
+    python bench_depth_cloud.py --size 640 480 --frames 50 --strides 1 4
+"""
+import time
+import argparse
+
+import numpy
+
+from tagilmo.utils.depth_cloud import depth_unprojector
+from reference import perspective, view_rotation, render_floor, unproject_pixels
+
+
+def main():
+    parser = argparse.ArgumentParser(description='depth unprojection benchmark')
+    parser.add_argument('--size', type=int, nargs=2, default=[640, 480], help='width height')
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--strides', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+    width, height = args.size
+    projection = perspective(70, width / height, 0.05, 256)
+    frames = [(render_floor(projection, view_rotation(yaw, 30), width, height, -1.62), view_rotation(yaw, 30))
+              for yaw in numpy.linspace(0, 360, args.frames)]
+    labels = numpy.zeros((height, width), dtype=numpy.uint8)
+    origin = (0.5, 65.62, 0.5)
+    print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+    depth, modelView = frames[0]
+    t0 = time.perf_counter()
+    unproject_pixels(depth, projection, modelView, origin)
+    print(f"{'per pixel':<24}{(time.perf_counter() - t0) * 1e3:10.2f} ms")
+    for stride in args.strides:
+        for name, kwargs in (('', {}), (' + labels', {'labels': labels})):
+            depth_unprojector.unprojectDepth(depth, projection, modelView, origin, stride, **kwargs)
+            t0 = time.perf_counter()
+            for depth, modelView in frames:
+                depth_unprojector.unprojectDepth(depth, projection, modelView, origin, stride, **kwargs)
+            print(f"{f'stride {stride}{name}':<24}{(time.perf_counter() - t0) / len(frames) * 1e3:10.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
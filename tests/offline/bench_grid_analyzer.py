@@ -0,0 +1,47 @@
+"""
+rays of GridAnalyzer.analyzePaths: one marchRays call compared with the scalar analyzeGridPos
+
+    python bench_grid_analyzer.py --grid 10 2 10 --calls 500
+"""
+import time
+import random
+import argparse
+
+from reference import make_observer, random_observation, observe, \
+    analyze_paths_scalar, analyze_paths_vectorised, random_target
+
+
+def measure(rob, method, observations) -> float:
+    total = 0.0
+    for data, target in observations:
+        observe(rob, data)
+        rob.getNearGrid3D(False)
+        rob.getNearGridArray(False)
+        t0 = time.perf_counter()
+        method(rob, target)
+        total += time.perf_counter() - t0
+    return total / len(observations) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GridAnalyzer rays benchmark')
+    parser.add_argument('--grid', type=int, nargs=3, default=[10, 2, 10], help='grid radius x y z')
+    parser.add_argument('--calls', type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    mc, rob = make_observer(args.grid)
+    try:
+        observations = []
+        for _ in range(args.calls):
+            data = random_observation(rng, args.grid)
+            observations.append((data, random_target(rng, [data['XPos'], data['YPos'], data['ZPos']])))
+        print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+        print('us per analyzePaths worth of rays (5 paths x 3 rays x 5 levels)')
+        for name, method in (('scalar', analyze_paths_scalar), ('vectorised', analyze_paths_vectorised)):
+            print(f"{name:<20}{measure(rob, method, observations):>10.1f}")
+    finally:
+        mc.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+RobustObserver.gridInYaw/analyzeGridInYaw compared with the scalar implementation they replaced
+
+    python bench_grid_in_yaw.py --grid 5 2 5 --calls 2000
+"""
+import time
+import random
+import argparse
+
+from tagilmo.utils.vereya_wrapper import RobustObserver
+from reference import make_observer, random_observation, observe, grid_in_yaw, analyze_grid_in_yaw
+
+
+def scalar(rob):
+    gridSlice = grid_in_yaw(rob.getNearGrid3D(False), rob.getCachedObserve('getAgentPos'))
+    return analyze_grid_in_yaw(gridSlice, rob.passableBlocks, RobustObserver.deadlyBlocks)
+
+
+def vectorised(rob):
+    return rob.analyzeGridInYaw(False)
+
+
+def measure(rob, method, observations, same_pose=False, decoded=False) -> float:
+    total = 0.0
+    for data in observations:
+        observe(rob, data)
+        if decoded:
+            # grid_near array is already there, decoded for another consumer
+            rob.getNearGridArray(False)
+        repeat = 10 if same_pose else 1
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            method(rob)
+        total += (time.perf_counter() - t0) / repeat
+    return total / len(observations) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gridInYaw benchmark')
+    parser.add_argument('--grid', type=int, nargs=3, default=[5, 2, 5], help='grid radius x y z')
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    mc, rob = make_observer(args.grid)
+    try:
+        observations = [random_observation(rng, args.grid) for _ in range(args.calls)]
+        print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+        print('us per call: new observation; new observation, grid_near array already decoded; same pose')
+        print(f"{'analyzeGridInYaw':<20}{'new':>10}{'decoded':>10}{'same':>10}")
+        for name, method in (('scalar', scalar), ('vectorised', vectorised)):
+            print(f"{name:<20}{measure(rob, method, observations):>10.1f}"
+                  f"{measure(rob, method, observations, decoded=True):>10.1f}"
+                  f"{measure(rob, method, observations[:args.calls // 10], same_pose=True):>10.1f}")
+    finally:
+        mc.stop()
+
+
+if __name__ == '__main__':
+    main()
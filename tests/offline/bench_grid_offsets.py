@@ -0,0 +1,57 @@
+"""
+nearest block queries on the offset tables compared with the scalar loops they replaced
+
+    python bench_grid_offsets.py --grid 8 4 8 --calls 300
+"""
+import time
+import random
+import argparse
+
+import numpy
+
+from reference import make_observer, random_observation, observe, \
+    nearest_from_grid, all_positions, abs_positions
+
+
+TARGETS = ['lava', 'cactus']
+
+
+def measure(rob, method, observations) -> float:
+    total = 0.0
+    for data in observations:
+        observe(rob, data)
+        rob.getNearGridArray(False)
+        t0 = time.perf_counter()
+        method(rob)
+        total += time.perf_counter() - t0
+    return total / len(observations) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='grid offset tables benchmark')
+    parser.add_argument('--grid', type=int, nargs=3, default=[8, 4, 8], help='grid radius x y z')
+    parser.add_argument('--calls', type=int, default=300)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    mc, rob = make_observer(args.grid)
+    try:
+        observations = [random_observation(rng, args.grid) for _ in range(args.calls)]
+        print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+        print('us per call, grid_near array already decoded')
+        cases = [('nearestFromGrid', lambda rob: nearest_from_grid(rob, TARGETS),
+                  lambda rob: rob.nearestFromGrid(TARGETS, False)),
+                 ('nearest_k(k=5)', lambda rob: all_positions(rob, TARGETS)[:5],
+                  lambda rob: rob.nearest_k(TARGETS, 5, False)),
+                 ('all_positions', lambda rob: all_positions(rob, TARGETS),
+                  lambda rob: rob.all_positions(TARGETS, False)),
+                 ('cell positions', abs_positions,
+                  lambda rob: numpy.floor(rob.gridAbsPositions(False)).astype(int))]
+        print(f"{'':<20}{'scalar':>10}{'tables':>10}")
+        for name, old, new in cases:
+            print(f"{name:<20}{measure(rob, old, observations):>10.1f}{measure(rob, new, observations):>10.1f}")
+    finally:
+        mc.stop()
+
+
+if __name__ == '__main__':
+    main()
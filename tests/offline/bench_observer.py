@@ -0,0 +1,90 @@
+"""
+per-observation cost of RobustObserver.onObservationChanged
+
+compares recomputing all getters on every observation, as it used to be done,
+with recomputing only getters whose observation values changed,
+with callbacks on a few getters changed() submits them to the executor
+
+    python bench_observer.py --grid 125 --observations 2000
+"""
+import json
+import time
+import argparse
+from types import SimpleNamespace
+
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.vereya_wrapper import RobustObserver, RobustObserverWithCallbacks
+from common import init_mission
+from fake_vereya import make_observation
+
+
+def update_all(rob):
+    for method in rob.methods:
+        rob._update_cache(method)
+
+
+class PollAllObserver(RobustObserver):
+    _observeProcCached = update_all
+
+
+class PollAllObserverWithCallbacks(RobustObserverWithCallbacks):
+    _observeProcCached = update_all
+
+
+# getters agents usually react to
+CALLBACK_GETTERS = ['getNearGrid', 'getAgentPos', 'getNearEntities', 'getInventory', 'getLife']
+
+
+def measure(observer, args) -> dict:
+    vereya = SimpleNamespace(host='127.0.0.1', port=0)
+    mc, rob = init_mission(vereya, observer=observer)
+    if isinstance(rob, RobustObserverWithCallbacks):
+        for method in CALLBACK_GETTERS:
+            rob.addCallback(None, method, lambda: None)
+    changes = []
+    changed = rob.changed
+
+    def count_changed(name):
+        changes.append(name)
+        changed(name)
+
+    rob.changed = count_changed
+    try:
+        # parsing is the same for both, measure only the cache update
+        observations = []
+        for i in range(args.observations):
+            text = json.dumps(make_observation(i, args.grid))
+            observations.append(VP.TimestampedString(time.time(), text))
+        t_parse = t_cache = 0.0
+        for obs in observations:
+            t0 = time.perf_counter()
+            mc.updateObservations(obs, rob.agentId)
+            t1 = time.perf_counter()
+            rob._observeProcCached()
+            t_cache += time.perf_counter() - t1
+            t_parse += t1 - t0
+        n = len(observations)
+        return {'parse_us': t_parse / n * 1e6, 'cache_us': t_cache / n * 1e6, 'changed': len(changes) / n}
+    finally:
+        mc.stop()
+        if isinstance(rob, RobustObserverWithCallbacks):
+            rob.executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RobustObserver observation cache benchmark')
+    parser.add_argument('--grid', type=int, default=125, help='number of blocks in grid_near')
+    parser.add_argument('--observations', type=int, default=2000)
+    args = parser.parse_args()
+    print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+    print(f"{'cache':<20}{'parse us':>10}{'update us':>11}{'changed/obs':>13}")
+    for name, observer in (('all getters', PollAllObserver),
+                           ('changed only', RobustObserver),
+                           ('all, callbacks', PollAllObserverWithCallbacks),
+                           ('changed, callbacks', RobustObserverWithCallbacks)):
+        r = measure(observer, args)
+        print(f"{name:<20}{r['parse_us']:>10.1f}{r['cache_us']:>11.1f}{r['changed']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
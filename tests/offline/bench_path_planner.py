@@ -0,0 +1,70 @@
+"""
+PathPlanner plan and replan latency on synthetic worlds
+
+    python bench_path_planner.py --size 128 --plans 20
+"""
+import math
+import time
+import random
+import argparse
+
+import numpy
+
+from tagilmo.utils.block_vocabulary import block_vocabulary
+from tagilmo.utils.path_planner import PathPlanner
+from reference import tables, make_world, random_stand
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PathPlanner benchmark')
+    parser.add_argument('--size', type=int, default=128)
+    parser.add_argument('--plans', type=int, default=20)
+    parser.add_argument('--min-dist', type=int, default=60)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    passable, deadly = tables()
+    world = make_world(0, args.size)
+    t0 = time.perf_counter()
+    planner = PathPlanner(world, [0, 0, 0], passable, deadly)
+    build = time.perf_counter() - t0
+    print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+    print(f'tables for {args.size}^3 world {build * 1e3:.1f} ms')
+    plan, cached, suffix, update, replan = [], [], [], [], []
+    found = 0
+    stone = block_vocabulary.id('stone')
+    while len(plan) < args.plans:
+        start = random_stand(rng, planner, args.size)
+        goal = random_stand(rng, planner, args.size)
+        if math.dist(start, goal) < args.min_dist:
+            continue
+        t0 = time.perf_counter()
+        path = planner.plan(start, goal)
+        plan.append(time.perf_counter() - t0)
+        if path is None:
+            continue
+        found += 1
+        t0 = time.perf_counter()
+        planner.plan(start, goal)
+        cached.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        planner.plan(path[len(path) // 2], goal)
+        suffix.append(time.perf_counter() - t0)
+        # a wall across the path
+        x, y, z = path[len(path) // 2]
+        t0 = time.perf_counter()
+        planner.update(numpy.full((3, 3, 3), stone, dtype=numpy.int16), [x - 1, y, z - 1])
+        update.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        planner.plan(start, goal)
+        replan.append(time.perf_counter() - t0)
+    ms = lambda v: f'{numpy.mean(v) * 1e3:8.2f} ms' if v else '       -'
+    print(f'paths found {found} of {len(plan)}, mean over plans:')
+    print(f'{"plan":<24}{ms(plan)}')
+    print(f'{"cached":<24}{ms(cached)}')
+    print(f'{"rest of cached path":<24}{ms(suffix)}')
+    print(f'{"update 3x3x3 cells":<24}{ms(update)}')
+    print(f'{"replan after update":<24}{ms(replan)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+SegmentationDecoder compared with looking up segment_mapping for every pixel
+
+    python bench_segmentation.py --size 640 480 --frames 50
+"""
+import time
+import argparse
+
+import numpy
+
+from tagilmo.utils.segments import segmentation_decoder
+from reference import random_colour_map, decode_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(description='segmentation decoder benchmark')
+    parser.add_argument('--size', type=int, nargs=2, default=[640, 480], help='width height')
+    parser.add_argument('--frames', type=int, default=50)
+    args = parser.parse_args()
+    rng = numpy.random.default_rng(0)
+    frames = [random_colour_map(rng, *args.size) for _ in range(args.frames)]
+    segmentation_decoder.decode(frames[0])
+    print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+    t0 = time.perf_counter()
+    decode_dict(frames[0])
+    print(f"{'dict per pixel':<20}{(time.perf_counter() - t0) * 1e3:10.2f} ms")
+    for name, method in (('decode', segmentation_decoder.decode),
+                         ('decode + stats', lambda p: segmentation_decoder.stats(segmentation_decoder.decode(p)))):
+        t0 = time.perf_counter()
+        for pixels in frames:
+            method(pixels)
+        print(f"{name:<20}{(time.perf_counter() - t0) / len(frames) * 1e3:10.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
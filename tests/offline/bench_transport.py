@@ -0,0 +1,170 @@
+"""
+end-to-end transport benchmark: fake vereya -> AgentHost -> MCConnector/RobustObserver
+
+fake vereya runs in a subprocess, so cpu time is measured for the agent side only
+
+    python bench_transport.py --obs-rate 20 --video-rate 30 --width 640 --height 480 --duration 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import logging
+from collections import defaultdict
+
+import numpy
+
+from tagilmo.VereyaPython import FrameType
+from common import init_mission
+from fake_vereya import FakeVereya
+
+
+logger = logging.getLogger(__name__)
+
+
+STREAMS = {FrameType.VIDEO: 'video', FrameType.DEPTH_MAP: 'depth',
+           FrameType.LUMINANCE: 'luminance', FrameType.COLOUR_MAP: 'colourmap'}
+
+
+class Probe:
+    """records receive-to-callback latency for each stream"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+
+    def onObservation(self, obs) -> None:
+        self.record('obs', obs.timestamp)
+
+    def onFrame(self, frame) -> None:
+        self.record(STREAMS[frame.frametype], frame.timestamp)
+
+    def record(self, stream: str, timestamp: float) -> None:
+        dt = time.time() - timestamp
+        with self.lock:
+            self.latency[stream].append(dt)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.latency.clear()
+
+
+class RemoteVereya:
+    """fake vereya server running in a separate process"""
+
+    def __init__(self, obs_rate: float, video_rate: float, reward_rate: float = 0.0):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_vereya.py')
+        self.host = '127.0.0.1'
+        self.proc = subprocess.Popen([sys.executable, path, '--port', '0',
+                                      '--obs-rate', str(obs_rate),
+                                      '--video-rate', str(video_rate),
+                                      '--reward-rate', str(reward_rate)],
+                                     stdout=subprocess.PIPE, text=True)
+        line = self.proc.stdout.readline()
+        self.port = int(line.split()[-1])
+
+    def stop(self) -> None:
+        self.proc.terminate()
+        self.proc.wait()
+
+
+def wait_mission_ended(agent_host, timeout: float = 5.0) -> None:
+    # stopping the agent host while it processes MissionEnded may deadlock
+    t0 = time.time()
+    while agent_host.peekWorldState().is_mission_running and time.time() - t0 < timeout:
+        time.sleep(0.05)
+    time.sleep(0.1)
+
+
+def summarize(probe: Probe, elapsed: float, cpu: float) -> dict:
+    result = dict()
+    total = 0
+    for stream, latency in sorted(probe.latency.items()):
+        lat = numpy.asarray(latency) * 1000
+        total += len(lat)
+        result[stream] = {'messages': len(lat),
+                          'msgs_per_s': len(lat) / elapsed,
+                          'p50_ms': float(numpy.percentile(lat, 50)) if len(lat) else None,
+                          'p99_ms': float(numpy.percentile(lat, 99)) if len(lat) else None}
+    result['total'] = {'messages': total,
+                       'msgs_per_s': total / elapsed,
+                       'cpu_us_per_msg': cpu / total * 1e6 if total else None,
+                       'cpu_percent': cpu / elapsed * 100}
+    return result
+
+
+def run(args) -> dict:
+    if args.inprocess:
+        vereya = FakeVereya(port=0, obs_rate=args.obs_rate, video_rate=args.video_rate).start()
+    else:
+        vereya = RemoteVereya(args.obs_rate, args.video_rate)
+    video = (args.width, args.height) if args.video_rate > 0 else None
+    colourmap = video if args.colourmap else None
+    mc, rob = init_mission(vereya, video=video, colourmap=colourmap)
+    probe = Probe()
+    agent_host = mc.agent_hosts[mc.agentId]
+    agent_host.addOnObservationCallback(probe.onObservation)
+    agent_host.addOnNewFrameCallback(probe.onFrame)
+    try:
+        assert mc.safeStart()
+        time.sleep(args.warmup)
+        probe.reset()
+        cpu0 = time.process_time()
+        t0 = time.time()
+        time.sleep(args.duration)
+        cpu = time.process_time() - cpu0
+        elapsed = time.time() - t0
+        with probe.lock:
+            result = summarize(probe, elapsed, cpu)
+        for stream, stats in agent_host.getDispatchStats().items():
+            if stream in result:
+                result[stream]['dropped'] = stats.dropped
+                result[stream]['max_queued'] = stats.max_queued
+        rob.sendCommand('quit')
+        wait_mission_ended(agent_host)
+    finally:
+        mc.stop()
+        vereya.stop()
+    return result
+
+
+def report(config: dict, result: dict) -> None:
+    print(' '.join(f'{k}={v}' for (k, v) in config.items()))
+    print(f"{'stream':<12}{'messages':>10}{'msgs/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'dropped':>10}")
+    for stream, r in result.items():
+        if stream == 'total':
+            continue
+        print(f"{stream:<12}{r['messages']:>10}{r['msgs_per_s']:>10.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r.get('dropped', 0):>10}")
+    total = result['total']
+    cpu = total['cpu_us_per_msg']
+    print(f"{'total':<12}{total['messages']:>10}{total['msgs_per_s']:>10.1f}"
+          f"   cpu {cpu if cpu is None else round(cpu, 1)} us/msg, {total['cpu_percent']:.1f}% of one core")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AgentHost transport benchmark')
+    parser.add_argument('--obs-rate', type=float, default=20.0)
+    parser.add_argument('--video-rate', type=float, default=30.0)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--colourmap', action='store_true', help='stream colour map frames too')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--inprocess', action='store_true',
+                        help='run fake vereya in this process, cpu time will include the server')
+    parser.add_argument('--json', action='store_true', help='print result as json')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    result = run(args)
+    if args.json:
+        print(json.dumps({'config': vars(args), 'result': result}))
+    else:
+        report(vars(args), result)
+
+
+if __name__ == '__main__':
+    main()
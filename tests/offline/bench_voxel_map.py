@@ -0,0 +1,79 @@
+"""
+VoxelMap fusing grid_near observations along a walk, compared with a dict of cells
+
+    python bench_voxel_map.py --grid 5 2 5 --steps 2000
+"""
+import math
+import time
+import random
+import argparse
+import tempfile
+
+from tagilmo.utils.voxel_map import VoxelMap
+from reference import random_grid
+
+
+def walk(rng, steps):
+    pos = [0.5, 64.0, 0.5]
+    yaw = 0.0
+    for _ in range(steps):
+        yaw += rng.uniform(-0.3, 0.3)
+        pos = [pos[0] - math.sin(yaw), 64.0 + rng.choice([-1, 0, 0, 0, 1]) * 0.5, pos[2] + math.cos(yaw)]
+        yield pos
+
+
+class DictMap:
+    """cell -> (block id, time seen)"""
+    def __init__(self):
+        self.cells = dict()
+
+    def fuseObservation(self, grid, gridBox, pos, t):
+        dimY, dimZ, dimX = grid.shape
+        x0, y0, z0 = (math.floor(p) + b[0] for p, b in zip(pos, gridBox))
+        values = grid.ravel().tolist()
+        i = 0
+        for y in range(y0, y0 + dimY):
+            for z in range(z0, z0 + dimZ):
+                for x in range(x0, x0 + dimX):
+                    self.cells[(x, y, z)] = (values[i], t)
+                    i += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='VoxelMap benchmark')
+    parser.add_argument('--grid', type=int, nargs=3, default=[5, 2, 5], help='grid radius x y z')
+    parser.add_argument('--steps', type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    gridBox = [[-r, r] for r in args.grid]
+    shape = (2 * args.grid[1] + 1, 2 * args.grid[2] + 1, 2 * args.grid[0] + 1)
+    grids = [random_grid(rng, shape) for _ in range(50)]
+    poses = list(walk(rng, args.steps))
+    print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+    with tempfile.TemporaryDirectory() as path:
+        for name, vmap in (('dict of cells', DictMap()), ('VoxelMap', VoxelMap()),
+                           ('VoxelMap on disk', VoxelMap(path=path, max_loaded=32))):
+            t0 = time.perf_counter()
+            for i, pos in enumerate(poses):
+                vmap.fuseObservation(grids[i % len(grids)], gridBox, pos, float(i))
+            fuse = (time.perf_counter() - t0) / len(poses) * 1e6
+            line = f"{name:<20} fuse {fuse:8.1f} us"
+            if isinstance(vmap, VoxelMap):
+                pos = poses[-1]
+                t0 = time.perf_counter()
+                for _ in range(100):
+                    vmap.nearest(['lava'], pos)
+                near = (time.perf_counter() - t0) / 100 * 1e6
+                t0 = time.perf_counter()
+                for _ in range(100):
+                    vmap.region([math.floor(pos[0]) - 16, 56, math.floor(pos[2]) - 16],
+                                [math.floor(pos[0]) + 16, 72, math.floor(pos[2]) + 16])
+                region = (time.perf_counter() - t0) / 100 * 1e6
+                line += f", chunks {len(vmap)}, nearest lava {near:8.1f} us, 33x17x33 region {region:8.1f} us"
+            else:
+                line += f", cells {len(vmap.cells)}"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
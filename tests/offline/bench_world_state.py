@@ -0,0 +1,105 @@
+"""
+lock hold time and bytes copied by AgentHost.getWorldState/peekWorldState
+
+compares deepcopy of the world state, as it used to be done, with swap and snapshot
+
+    python bench_world_state.py --frames 1 --width 640 --height 480 --observations 20
+"""
+import copy
+import time
+import json
+import argparse
+import tracemalloc
+
+from tagilmo import VereyaPython as VP
+from tagilmo.VereyaPython.world_state import WorldState
+from fake_vereya import make_observation
+from reference import make_frame
+
+
+def fill(world_state: WorldState, args) -> None:
+    world_state.has_mission_begun = world_state.is_mission_running = True
+    world_state.video_frames.extend(make_frame(args.width, args.height) for _ in range(args.frames))
+    for i in range(args.observations):
+        text = json.dumps(make_observation(i, 125, (0.5, 4, 0.5)))
+        world_state.observations.append(VP.TimestampedString(time.time(), text))
+    world_state.number_of_observations_since_last_state = args.observations
+    world_state.number_of_video_frames_since_last_state = args.frames
+
+
+def deepcopy_peek(agent_host):
+    with agent_host.world_state_mutex:
+        return copy.deepcopy(agent_host.world_state)
+
+
+def deepcopy_get(agent_host):
+    with agent_host.world_state_mutex:
+        old_world_state = copy.deepcopy(agent_host.world_state)
+        agent_host.world_state.clear()
+        agent_host.world_state.is_mission_running = old_world_state.is_mission_running
+        agent_host.world_state.has_mission_begun = old_world_state.has_mission_begun
+        return old_world_state
+
+
+class TimedLock:
+    """measures how long the wrapped lock is held"""
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.held = 0.0
+
+    def __enter__(self):
+        self.lock.__enter__()
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.held += time.perf_counter() - self.t0
+        return self.lock.__exit__(*exc)
+
+
+def measure(agent_host, method, args) -> dict:
+    lock = TimedLock(agent_host.world_state_mutex)
+    agent_host.world_state_mutex = lock
+    copied = 0
+    try:
+        for i in range(args.repeat):
+            # refill, get empties the state
+            agent_host.world_state = WorldState()
+            fill(agent_host.world_state, args)
+            if i == 0:
+                tracemalloc.start()
+                method(agent_host)
+                copied = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                lock.held = 0.0
+            else:
+                method(agent_host)
+    finally:
+        agent_host.world_state_mutex = lock.lock
+    return {'lock_us': lock.held / (args.repeat - 1) * 1e6, 'bytes': copied}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='world state copy benchmark')
+    parser.add_argument('--frames', type=int, default=1)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--observations', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    agent_host = VP.AgentHost()
+    try:
+        print(' '.join(f'{k}={v}' for (k, v) in vars(args).items()))
+        print(f"{'call':<24}{'lock held us':>14}{'bytes copied':>14}")
+        for name, method in (('deepcopy peek', deepcopy_peek),
+                             ('peekWorldState', VP.AgentHost.peekWorldState),
+                             ('deepcopy get', deepcopy_get),
+                             ('getWorldState', VP.AgentHost.getWorldState)):
+            r = measure(agent_host, method, args)
+            print(f"{name:<24}{r['lock_us']:>14.1f}{r['bytes']:>14}")
+    finally:
+        agent_host.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import logging
+import tagilmo.utils.mission_builder as mb
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.vereya_wrapper import MCConnector, RobustObserver
+
+
+logger = logging.getLogger(__name__)
+
+
+def init_mission(vereya, video=None, colourmap=None, grid=None, observer=RobustObserver, runtime=None,
+                 command_batch_window=0.0):
+    """
+    build mission and connector which talk to fake vereya server
+
+    video, colourmap: (width, height) or None
+    runtime: VP.IoRuntime for agent host
+    command_batch_window: see MCConnector
+    """
+    obs = mb.Observations()
+    if grid is not None:
+        obs.gridNear = grid
+    video_producer = None
+    if video is not None:
+        video_producer = mb.VideoProducer(width=video[0], height=video[1])
+    colourmap_producer = None
+    if colourmap is not None:
+        colourmap_producer = mb.ColourMapProducer(width=colourmap[0], height=colourmap[1])
+    agent_handlers = mb.AgentHandlers(observations=obs, video_producer=video_producer,
+                                      colourmap_producer=colourmap_producer)
+    miss = mb.MissionXML(agentSections=[mb.AgentSection(name='Cristina',
+                                                        agenthandlers=agent_handlers)])
+    miss.setWorld(mb.flatworld(""))
+    mc = MCConnector(miss, runtime=runtime, command_batch_window=command_batch_window)
+    mc.client_pool = VP.ClientPool([VP.ClientInfo(vereya.host, vereya.port)])
+    rob = observer(mc) if observer is not None else None
+    return mc, rob
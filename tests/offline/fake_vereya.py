@@ -0,0 +1,337 @@
+"""
+pure python stand-in for the Vereya mod
+
+Speaks the same wire protocol as the mod, so AgentHost/MCConnector can
+start missions, receive observations, rewards and video frames and send
+commands without a running Minecraft client.
+
+can be started standalone:
+    python fake_vereya.py --port 10000 --obs-rate 20 --video-rate 30
+"""
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import functools
+import asyncio
+import threading
+from typing import List, Optional, Tuple
+
+from tagilmo.VereyaPython.mission_init_xml import MissionInitXML
+from tagilmo.VereyaPython.consts import MALMO_NAMESPACE
+
+
+logger = logging.getLogger(__name__)
+
+
+MALMO_OK = "MALMOOK"
+MALMO_BUSY = "MALMOBUSY"
+
+IDENTITY = [1.0, 0.0, 0.0, 0.0,
+            0.0, 1.0, 0.0, 0.0,
+            0.0, 0.0, 1.0, 0.0,
+            0.0, 0.0, 0.0, 1.0]
+
+GRID_BLOCKS = ['grass_block', 'dirt', 'stone', 'oak_log', 'oak_leaves', 'water', 'sand']
+
+
+def frame_bytes(payload: bytes) -> bytes:
+    """prepend big-endian 4 byte size header, as TCPServer expects"""
+    return len(payload).to_bytes(4, byteorder='big', signed=False) + payload
+
+
+def video_message(header: dict, pixels: bytes) -> bytes:
+    """build video message: json header length, json header, pixels"""
+    jo = json.dumps(header).encode('utf-8')
+    return len(jo).to_bytes(4, byteorder='big', signed=False) + jo + pixels
+
+
+def mission_ended_xml(status: str = 'ENDED', text: str = 'Mission ended') -> str:
+    return (f'<MissionEnded xmlns="{MALMO_NAMESPACE}">'
+            f'<Status>{status}</Status>'
+            f'<HumanReadableStatus>{text}</HumanReadableStatus>'
+            '</MissionEnded>')
+
+
+def grid_box(mission) -> List[List[int]]:
+    """read grid_near bounds from mission element, default is mission_builder's default"""
+    box = [[-5, 5], [-2, 2], [-5, 5]]
+    for grid in mission.iter():
+        if grid.tag.rpartition('}')[2] != 'Grid' or grid.attrib.get('name') != 'grid_near':
+            continue
+        bounds = {el.tag.rpartition('}')[2]: el.attrib for el in grid}
+        box = [[int(bounds['min'][c]), int(bounds['max'][c])] for c in 'xyz']
+    return box
+
+
+def video_size(mission, producer: str) -> Optional[Tuple[int, int]]:
+    for el in mission.iter():
+        if el.tag.rpartition('}')[2] != producer:
+            continue
+        size = {ch.tag.rpartition('}')[2]: int(ch.text) for ch in el if ch.text}
+        return size.get('Width', 0), size.get('Height', 0)
+    return None
+
+
+def make_observation(tick: int, grid_size: int, pos=(0.5, 64.0, 0.5)) -> dict:
+    """observation resembling the one sent by Vereya with default observation handlers"""
+    x, y, z = pos[0] + 0.05 * math.sin(tick * 0.1), pos[1], pos[2] + 0.05 * math.cos(tick * 0.1)
+    yaw = (tick * 1.5) % 360 - 180
+    grid = [GRID_BLOCKS[(i * 7 + tick // 20) % len(GRID_BLOCKS)] if i < grid_size // 2 else 'air'
+            for i in range(grid_size)]
+    return {
+        'XPos': x, 'YPos': y, 'ZPos': z, 'Pitch': 0.0, 'Yaw': yaw,
+        'Life': 20.0, 'Food': 20, 'Air': 300, 'IsAlive': True, 'XP': 0, 'Score': 0,
+        'Name': 'Cristina', 'WorldTime': 1000 + tick, 'TotalTime': 1000 + tick,
+        'DistanceTravelled': tick, 'TimeAlive': tick, 'MobsKilled': 0, 'PlayersKilled': 0,
+        'DamageTaken': 0, 'DamageDealt': 0, 'onGround': True, 'input_type': 'AI', 'isPaused': False,
+        'LineOfSight': {'hitType': 'block', 'x': x + 2.0, 'y': y, 'z': z, 'type': 'minecraft:stone',
+                        'inRange': True, 'distance': 2.0},
+        'inventory': [{'type': 'stone', 'index': i, 'quantity': 1 + i, 'inventory': 'inventory'}
+                      for i in range(4)],
+        'ents_near': [{'name': 'Cristina', 'type': 'player', 'x': x, 'y': y, 'z': z, 'yaw': yaw,
+                       'pitch': 0.0, 'id': 'agent', 'motionX': 0.0, 'motionY': 0.0, 'motionZ': 0.0, 'life': 20.0},
+                      {'name': 'Pig', 'type': 'pig', 'x': x + 3, 'y': y, 'z': z - 2, 'yaw': 0.0,
+                       'pitch': 0.0, 'id': 'pig', 'motionX': 0.0, 'motionY': 0.0, 'motionZ': 0.0, 'life': 10.0},
+                      {'name': 'Cobblestone', 'type': 'item', 'x': x - 1, 'y': y, 'z': z + 1, 'yaw': 0.0,
+                       'pitch': 0.0, 'id': 'item', 'motionX': 0.0, 'motionY': 0.0, 'motionZ': 0.0, 'quantity': 1}],
+        'grid_near': grid,
+    }
+
+
+class FakeMission:
+    """one running mission, started by a MissionInit message"""
+
+    def __init__(self, vereya: 'FakeVereya', mission_init: MissionInitXML):
+        self.vereya = vereya
+        self.mission_init = mission_init
+        self.commands: List[Tuple[float, str]] = []
+        self.sent = {'obs': 0, 'rew': 0, 'video': 0, 'colourmap': 0}
+        self.running = False
+        self.commands_server: Optional[asyncio.Server] = None
+        self.writers = dict()
+        self.tasks = []
+        self.command_task = None
+        box = grid_box(mission_init.mission)
+        self.grid_size = (box[0][1] - box[0][0] + 1) * (box[1][1] - box[1][0] + 1) * (box[2][1] - box[2][0] + 1)
+        self.video = video_size(mission_init.mission, 'VideoProducer')
+        self.colourmap = video_size(mission_init.mission, 'ColourMapProducer')
+        self.ended = asyncio.Event()
+
+    @property
+    def connection(self):
+        return self.mission_init.client_agent_connection
+
+    async def start(self) -> None:
+        self.commands_server = await asyncio.start_server(self.on_command_connection,
+                                                          self.vereya.host, 0)
+        self.connection.client_commands_port = self.commands_server.sockets[0].getsockname()[1]
+        self.running = True
+        address = self.connection.agent_ip_address
+        mcp = await self.connect('mcp', address, self.connection.agent_mission_control_port)
+        mcp.write(frame_bytes(f'<ping minecraft-version="{self.vereya.version}"/>'.encode()))
+        mcp.write(frame_bytes(self.mission_init.toXml().encode()))
+        await mcp.drain()
+        ports = [('obs', self.connection.agent_observations_port, self.vereya.obs_rate, self.observation),
+                 ('rew', self.connection.agent_rewards_port, self.vereya.reward_rate, self.reward)]
+        if self.video and self.connection.agent_video_port:
+            ports.append(('video', self.connection.agent_video_port, self.vereya.video_rate,
+                          functools.partial(self.frame, size=self.video, channels=3)))
+        if self.colourmap and self.connection.agent_colour_map_port:
+            ports.append(('colourmap', self.connection.agent_colour_map_port, self.vereya.video_rate,
+                          functools.partial(self.frame, size=self.colourmap, channels=3)))
+        for name, port, rate, produce in ports:
+            if not port or rate <= 0:
+                continue
+            writer = await self.connect(name, address, port)
+            self.tasks.append(asyncio.create_task(self.stream(name, writer, rate, produce)))
+
+    async def connect(self, name: str, address: str, port: int) -> asyncio.StreamWriter:
+        logger.debug('connecting %s stream to %s:%i', name, address, port)
+        _, writer = await asyncio.open_connection(address, port)
+        self.writers[name] = writer
+        return writer
+
+    async def stream(self, name: str, writer: asyncio.StreamWriter, rate: float, produce) -> None:
+        period = 1.0 / rate
+        loop = asyncio.get_running_loop()
+        next_t = loop.time()
+        tick = 0
+        while self.running:
+            try:
+                writer.write(frame_bytes(produce(tick)))
+                await writer.drain()
+            except (ConnectionError, RuntimeError) as e:
+                logger.debug('%s stream closed', name, exc_info=e)
+                break
+            self.sent[name] += 1
+            tick += 1
+            next_t += period
+            await asyncio.sleep(max(0.0, next_t - loop.time()))
+
+    def observation(self, tick: int) -> bytes:
+        return json.dumps(make_observation(tick, self.grid_size)).encode()
+
+    def reward(self, tick: int) -> bytes:
+        return b'0:1.0'
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def pixels(width: int, height: int, channels: int) -> bytes:
+        row = bytes(i % 256 for i in range(width * channels))
+        return row * height
+
+    def frame(self, tick: int, size: Tuple[int, int], channels: int) -> bytes:
+        width, height = size
+        pixels = self.pixels(width, height, channels)
+        header = {'x': 0.5, 'y': 64.0, 'z': 0.5, 'yaw': (tick * 1.5) % 360 - 180, 'pitch': 0.0,
+                  'img_width': width, 'img_height': height, 'img_ch': channels,
+                  'modelViewMatrix': IDENTITY, 'projectionMatrix': IDENTITY}
+        return video_message(header, pixels)
+
+    async def on_command_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.writers['commands'] = writer
+        self.command_task = asyncio.current_task()
+        while self.running:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode().strip()
+            self.commands.append((time.time(), command))
+            if command == 'quit':
+                await self.end('ENDED', 'Agent quit')
+                break
+        writer.close()
+
+    async def end(self, status: str = 'ENDED', text: str = 'Mission ended') -> None:
+        if not self.running:
+            return
+        self.running = False
+        mcp = self.writers.get('mcp')
+        try:
+            mcp.write(frame_bytes(mission_ended_xml(status, text).encode()))
+            await mcp.drain()
+        except (ConnectionError, RuntimeError) as e:
+            logger.debug('failed to send MissionEnded', exc_info=e)
+        await self.close()
+
+    async def close(self) -> None:
+        self.running = False
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+        if self.commands_server is not None:
+            self.commands_server.close()
+        # the reader gets eof once the writer is closed
+        if self.command_task is not None and self.command_task is not asyncio.current_task():
+            await asyncio.gather(self.command_task, return_exceptions=True)
+        self.ended.set()
+
+
+class FakeVereya:
+    """
+    Stand-in for the Vereya mod client.
+
+    Accepts any number of concurrent missions on one control port,
+    so a single instance can serve many AgentHosts.
+
+    port: int
+        mission control port, 0 to let the system choose one
+    obs_rate, reward_rate, video_rate: float
+        messages per second on each stream, 0 disables the stream
+    """
+    def __init__(self, port: int = 10000, obs_rate: float = 20.0,
+                 video_rate: float = 0.0, reward_rate: float = 0.0,
+                 host: str = '127.0.0.1', version: str = '1.21'):
+        self.host = host
+        self.port = port
+        self.obs_rate = obs_rate
+        self.video_rate = video_rate
+        self.reward_rate = reward_rate
+        self.version = version
+        self.missions: List[FakeMission] = []
+        self.server: Optional[asyncio.Server] = None
+        self.loop = asyncio.new_event_loop()
+        self.th = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def start(self) -> 'FakeVereya':
+        self.th.start()
+        asyncio.run_coroutine_threadsafe(self.startAccept(), self.loop).result()
+        return self
+
+    async def startAccept(self) -> None:
+        self.server = await asyncio.start_server(self.on_control, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info('fake vereya listening on %s:%i', self.host, self.port)
+
+    async def on_control(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        data = await reader.readline()
+        message = data.decode().strip()
+        if message.startswith('MALMO_REQUEST_CLIENT:'):
+            writer.write(frame_bytes(MALMO_OK.encode()))
+        elif message.startswith('MALMO_CANCEL_REQUEST'):
+            writer.write((MALMO_OK + '\n').encode())
+        elif message.startswith('<MissionInit'):
+            mission = FakeMission(self, MissionInitXML(message))
+            self.missions.append(mission)
+            writer.write(frame_bytes(MALMO_OK.encode()))
+            await writer.drain()
+            # keep a reference, otherwise the task may be garbage collected before it completes
+            mission.tasks.append(asyncio.create_task(mission.start()))
+        else:
+            logger.warning('unexpected control message %s', message[:200])
+            writer.write(frame_bytes(MALMO_BUSY.encode()))
+        await writer.drain()
+        writer.close()
+
+    def endMissions(self, status: str = 'ENDED') -> None:
+        for mission in list(self.missions):
+            asyncio.run_coroutine_threadsafe(mission.end(status), self.loop).result()
+
+    def stop(self) -> None:
+        if not self.loop.is_running():
+            return
+        async def _stop():
+            for mission in self.missions:
+                await mission.close()
+            if self.server is not None:
+                self.server.close()
+        asyncio.run_coroutine_threadsafe(_stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.th.join()
+        self.loop.close()
+
+    def commands(self) -> List[str]:
+        return [cmd for mission in self.missions for (_, cmd) in mission.commands]
+
+    def sent(self, stream: str) -> int:
+        return sum(mission.sent[stream] for mission in self.missions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='stand-in Vereya mod')
+    parser.add_argument('--port', type=int, default=10000)
+    parser.add_argument('--obs-rate', type=float, default=20.0)
+    parser.add_argument('--video-rate', type=float, default=0.0)
+    parser.add_argument('--reward-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    vereya = FakeVereya(port=args.port, obs_rate=args.obs_rate,
+                        video_rate=args.video_rate, reward_rate=args.reward_rate).start()
+    # benchmark reads this line to know the server is up
+    print(f'listening {vereya.port}', flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        vereya.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,467 @@
+"""
+reference implementations and test data shared by tests and benchmarks
+
+Scalar versions of the vectorised code, kept to check its results and to
+measure its speed-up, and generators of observations, worlds and frames.
+"""
+import json
+import math
+import time
+from types import SimpleNamespace
+
+import numpy
+
+from tagilmo import VereyaPython as VP
+from tagilmo.VereyaPython.timestamped_unsigned_char_vector import TimestampedUnsignedCharVector
+from tagilmo.VereyaPython.timestamped_video_frame import TimestampedVideoFrame
+from tagilmo.utils.vereya_wrapper import MCConnector, RobustObserver
+from tagilmo.utils.mathutils import degree2rad, int_coords
+from tagilmo.utils.block_vocabulary import block_vocabulary
+from tagilmo.utils.grid_rays import marchRays, RayStatus
+from tagilmo.utils.segments import segment_mapping, segmentation_decoder
+from common import init_mission
+from fake_vereya import video_message, IDENTITY
+
+
+# grid_near observations and the scalar gridInYaw
+
+BLOCKS = ['air', 'air', 'air', 'dirt', 'stone', 'grass', 'water', 'lava', 'leaves', 'cactus']
+
+
+PASSABLE = ['air', 'water', 'grass', 'leaves']
+
+
+def grid_in_yaw(grid3D, pos):
+    """the scalar implementation of RobustObserver.gridInYaw"""
+    deltas = MCConnector.yawDelta(degree2rad(pos[4]))
+    dimX = len(grid3D[0][0])
+    dimZ = len(grid3D[0])
+    dimY = len(grid3D)
+    deltas[0] /= 4
+    deltas[2] /= 4
+    objs = []
+    for y in range(dimY):
+        grid2D = grid3D[y]
+        line = []
+        x = pos[0]
+        z = pos[2]
+        x0int = int(x)
+        z0int = int(z)
+        for t in range(dimX + dimZ):
+            if int(x + deltas[0]) != int(x) or int(z + deltas[2]) != int(z):
+                dxGrid = int(x + deltas[0]) - x0int
+                dzGrid = int(z + deltas[2]) - z0int
+                if abs(dxGrid)*2+1 >= dimX or abs(dzGrid)*2+1 >= dimZ:
+                    break
+                line += [grid2D[dzGrid+(dimZ-1)//2][dxGrid+(dimX-1)//2]]
+            x += deltas[0]
+            z += deltas[2]
+        objs += [line]
+    return objs
+
+
+def analyze_grid_in_yaw(gridSlice, passableBlocks, deadlyBlocks):
+    """the scalar implementation of RobustObserver.analyzeGridInYaw"""
+    underground = gridSlice[(len(gridSlice) - 1) // 2 - 2]
+    ground = gridSlice[(len(gridSlice) - 1) // 2 - 1]
+    solid = all([b not in passableBlocks for b in ground])
+    wayLv0 = gridSlice[(len(gridSlice) - 1) // 2]
+    wayLv1 = gridSlice[(len(gridSlice) - 1) // 2 + 1]
+    passWay = all([b in passableBlocks for b in wayLv0]) and \
+              all([b in passableBlocks for b in wayLv1])
+    lvl = (len(gridSlice) + 1) // 2
+    for h in range(len(gridSlice)):
+        if gridSlice[-h-1][0] not in passableBlocks:
+            break
+        lvl -= 1
+    safe = all([b not in deadlyBlocks for b in ground]) and \
+           all([b not in deadlyBlocks for b in wayLv0]) and \
+           all([b not in deadlyBlocks for b in wayLv1])
+    if lvl < -1:
+        safe = safe and all([b not in deadlyBlocks for b in underground])
+        if ground[0] != 'water' and underground[0] != 'water':
+            safe = False
+    return {'solid': solid, 'passWay': passWay, 'level': lvl, 'safe': safe}
+
+
+def make_observer(radius):
+    """observer with grid of (2 * radius + 1) blocks along each axis, without a server"""
+    vereya = SimpleNamespace(host='127.0.0.1', port=0)
+    box = [[-r, r] for r in radius]
+    mc, rob = init_mission(vereya, grid=box)
+    rob.passableBlocks = PASSABLE
+    return mc, rob
+
+
+def random_observation(rng, radius, pos=None):
+    size = math.prod(2 * r + 1 for r in radius)
+    if pos is None:
+        pos = [rng.uniform(-100, 100), 64.0, rng.uniform(-100, 100), 0.0, rng.uniform(-180, 180)]
+    # a floor with random blocks above it
+    grid = []
+    for y in range(2 * radius[1] + 1):
+        layer = (2 * radius[0] + 1) * (2 * radius[2] + 1)
+        grid += ['stone'] * layer if y < radius[1] else [rng.choice(BLOCKS) for _ in range(layer)]
+    assert len(grid) == size
+    return {'XPos': pos[0], 'YPos': pos[1], 'ZPos': pos[2], 'Pitch': pos[3], 'Yaw': pos[4],
+            'grid_near': grid}
+
+
+def observe(rob, data):
+    rob.onObservationChanged(VP.TimestampedString(time.time(), json.dumps(data)))
+
+
+# GridAnalyzer path rays
+
+LEVELS = range(-2, 3)
+
+
+def grid_pos(grid3D, p0, dp, passableBlocks, pos, level):
+    """the scalar implementation of GridAnalyzer.analyzeGridPos"""
+    dimY, dimZ, dimX = len(grid3D), len(grid3D[0]), len(grid3D[0][0])
+    MAX_CNT = 100
+    for t in range(MAX_CNT):
+        xf = pos[0] + t * dp[0] * 0.1
+        zf = pos[2] + t * dp[2] * 0.1
+        xc = math.floor(xf)
+        zc = math.floor(zf)
+        x = xc - p0[0] + dimX // 2
+        z = zc - p0[2] + dimZ // 2
+        if x < 0 or x >= dimX or z < 0 or z >= dimZ:
+            return {'d': MAX_CNT, 'status': 'free'}
+        block = grid3D[dimY//2+level][z][x]
+        if block in RobustObserver.deadlyBlocks:
+            return {'d': t, 'status': 'deadly'}
+        if block not in passableBlocks and level >= 0 or \
+           block in passableBlocks and block != 'water' and level < 0:
+            return {'d': t, 'status': 'obstacle', 'o': [xf, pos[1]+level+0.5, zf]}
+    return {'d': MAX_CNT, 'status': 'clean'}
+
+
+def path_origins(pa, dp):
+    """ray origins of GridAnalyzer.analyzePaths: 5 paths with 3 rays each"""
+    positions = [pa]
+    for s in range(4):
+        positions.append([pa[0] + (1.5 - s) * dp[2] / 1.5, pa[1], pa[2] + (s - 1.5) * dp[0] / 1.5])
+    dx = 0.25 * dp[2]
+    dz = 0.25 * dp[0]
+    origins = []
+    for pos in positions:
+        origins += [pos[:3], [pos[0] + dx, pos[1], pos[2] - dz], [pos[0] - dx, pos[1], pos[2] + dz]]
+    return origins
+
+
+def direction(pa, target):
+    dp = [t - p for t, p in zip(target, pa)]
+    dist = math.hypot(dp[0], dp[2])
+    dp[0] /= dist
+    dp[2] /= dist
+    return dp
+
+
+def analyze_paths_scalar(rob, target):
+    grid3D = rob.getNearGrid3D(False)
+    pa = rob.getCachedObserve('getAgentPos')
+    p0 = [math.floor(p) for p in pa[0:3]]
+    dp = direction(pa, target)
+    return [[grid_pos(grid3D, p0, dp, rob.passableBlocks, o, level) for o in path_origins(pa, dp)]
+            for level in LEVELS]
+
+
+def analyze_paths_vectorised(rob, target):
+    grid = rob.getNearGridArray(False)
+    pa = rob.getCachedObserve('getAgentPos')
+    p0 = [math.floor(p) for p in pa[0:3]]
+    dp = direction(pa, target)
+    origins = path_origins(pa, dp)
+    d, status, xf, zf = marchRays(grid, p0, dp, origins, LEVELS,
+                                  rob.blockMask(rob.passableBlocks),
+                                  rob.blockMask(RobustObserver.deadlyBlocks),
+                                  block_vocabulary.id('water'))
+    d, status, xf, zf = d.tolist(), status.tolist(), xf.tolist(), zf.tolist()
+    res = []
+    for l, level in enumerate(LEVELS):
+        line = []
+        for i, o in enumerate(origins):
+            st = RayStatus(status[l][i])
+            r = {'d': d[l][i], 'status': st.name.lower()}
+            if st == RayStatus.OBSTACLE:
+                r['o'] = [xf[l][i], o[1]+level+0.5, zf[l][i]]
+            line.append(r)
+        res.append(line)
+    return res
+
+
+def random_target(rng, pos):
+    angle = rng.uniform(-math.pi, math.pi)
+    dist = rng.uniform(2, 20)
+    return [pos[0] + dist * math.cos(angle), pos[1] + rng.uniform(-3, 3), pos[2] + dist * math.sin(angle)]
+
+
+# grid cell positions
+
+def grid_index_to_pos(gridBox, index):
+    """the scalar implementation of MCConnector.gridIndexToPos"""
+    gridSz = [gridBox[i][1]-gridBox[i][0]+1 for i in range(3)]
+    y = index // (gridSz[0] * gridSz[2])
+    index -= y * (gridSz[0] * gridSz[2])
+    y += gridBox[1][0]
+    z = index // gridSz[0] + gridBox[2][0]
+    x = index % gridSz[0] + gridBox[0][0]
+    return [x, y, z]
+
+
+def grid_distance(gridBox, index):
+    [x, y, z] = grid_index_to_pos(gridBox, index)
+    return x * x + (y - 1.66) * (y - 1.66) * 4 + z * z
+
+
+def nearest_from_grid(rob, objs, return_target_block=False):
+    """the scalar implementation of RobustObserver.nearestFromGrid"""
+    grid = rob.getCachedObserve('getNearGrid')
+    pos = rob.getCachedObserve('getAgentPos')
+    gridBox = rob.mc.getGridBox()
+    d2 = 10000
+    target = None
+    for i in range(len(grid)):
+        if grid[i] not in objs: continue
+        [x, y, z] = grid_index_to_pos(gridBox, i)
+        d2c = x * x + (y - 1.66) * (y - 1.66) * 4 + z * z
+        if d2c < d2:
+            d2 = d2c
+            target = [x + pos[0], y + pos[1], z + pos[2]]
+            if return_target_block:
+                target = [target, grid[i]]
+    return target
+
+
+def all_positions(rob, objs):
+    """positions of objs sorted by distance, ties by index, with scalar loops"""
+    grid = rob.getCachedObserve('getNearGrid')
+    pos = rob.getCachedObserve('getAgentPos')
+    gridBox = rob.mc.getGridBox()
+    indices = sorted((i for i in range(len(grid)) if grid[i] in objs), key=lambda i: grid_distance(gridBox, i))
+    return [[x + p for x, p in zip(grid_index_to_pos(gridBox, i), pos)] for i in indices]
+
+
+def abs_positions(rob):
+    """int positions of all cells as NoticeBlocks.updateBlocks found them"""
+    return [int_coords(rob.gridIndexToAbsPos(i, observeReq=False))
+            for i in range(len(rob.getCachedObserve('getNearGrid')))]
+
+
+# NoticeBlocks
+
+class ListNoticeBlocks:
+    """the list implementation of NoticeBlocks memory"""
+
+    def __init__(self, max_len=5, dx=4):
+        self.blocks = {}
+        self.max_len = max_len
+        self.ignore_blocks = ['air', 'grass', 'tallgrass', 'double_plant', 'dirt', 'stone']
+        self.dx = dx
+        self.focus_blocks = set()
+
+    def updateBlock(self, block, pos):
+        if block not in self.blocks:
+            self.blocks[block] = []
+        ps = self.blocks[block]
+        for p in ps:
+            if abs(p[0] - pos[0]) <= self.dx and \
+               abs(p[1] - pos[1]) <= self.dx and \
+               abs(p[2] - pos[2]) <= self.dx:
+                   return
+        ps.append(pos)
+        self.blocks[block] = ps[1:] if len(ps) > self.max_len else ps
+
+    def removeIfMissing(self, current_block, blocks, pos):
+        for block in blocks:
+            if block not in self.blocks or block == current_block:
+                continue
+            if pos in self.blocks[block]:
+                self.blocks[block].remove(pos)
+
+    def updateBlocks(self, rob):
+        grid = rob.cached['getNearGrid'][0]
+        for i in range(len(grid)):
+            bUpdate = grid[i] not in self.ignore_blocks or grid[i] in self.focus_blocks
+            if bUpdate or self.focus_blocks != set():
+                pos = rob.gridIndexToAbsPos(i, observeReq=False)
+                pos = int_coords(pos)
+            if self.focus_blocks != set():
+                self.removeIfMissing(grid[i], self.focus_blocks, pos)
+            if bUpdate:
+                self.updateBlock(grid[i], pos)
+
+    def recallNearest(self, targets, aPos=None, return_target_block=False):
+        if aPos is None: aPos = [0,0,0]
+        dist = 1e+16
+        res = None
+        target_block = 'None'
+        for b in targets:
+            if b in self.blocks:
+                for pos in self.blocks[b]:
+                    dy = aPos[1] + 0.5 - pos[1]
+                    dr = math.hypot(aPos[0] - pos[0], aPos[2] - pos[2])
+                    if dr < 1 and dy < 0: dr += 2 # avoid blocks under feet
+                    d = dr + abs(dy)*10 # y direction is more difficult
+                    if d < dist:
+                        dist = d
+                        res = pos
+                        target_block = b
+        return res if not return_target_block else [res, target_block]
+
+
+def random_pos(rng, extent):
+    return [rng.randint(-extent, extent), rng.randint(50, 70), rng.randint(-extent, extent)]
+
+
+# VoxelMap
+
+def random_grid(rng, shape):
+    ids = block_vocabulary.encode(BLOCKS)
+    return ids[numpy.array([rng.randrange(len(BLOCKS)) for _ in range(math.prod(shape))])].reshape(shape)
+
+
+# PathPlanner worlds
+
+PLANNER_PASSABLE = ['air', 'water', 'tallgrass']
+
+
+PLANNER_DEADLY = ['lava']
+
+
+def tables():
+    names = ['air', 'stone', 'dirt', 'water', 'lava', 'tallgrass', 'log']
+    block_vocabulary.encode(names)
+    return block_vocabulary.mask(PLANNER_PASSABLE), block_vocabulary.mask(PLANNER_DEADLY)
+
+
+def make_world(seed, size, height=None):
+    """hills of stone and dirt with lava pools, trees and grass, air above"""
+    rng = numpy.random.default_rng(seed)
+    height = size if height is None else height
+    ids = {name: block_vocabulary.id(name) for name in ['air', 'stone', 'dirt', 'water', 'lava', 'tallgrass', 'log']}
+    x, z = numpy.meshgrid(numpy.arange(size), numpy.arange(size))
+    surface = numpy.full((size, size), height / 2)
+    for _ in range(6):
+        f = rng.uniform(0.02, 0.15, 2)
+        surface += rng.uniform(1, 4) * numpy.sin(f[0] * x + rng.uniform(0, 6)) * numpy.cos(f[1] * z + rng.uniform(0, 6))
+    surface = numpy.clip(surface.astype(int), 2, height - 6)
+    y = numpy.arange(height)[:, None, None]
+    world = numpy.where(y < surface - 2, ids['stone'], numpy.where(y < surface, ids['dirt'], ids['air']))
+    top = (surface[None] == y)
+    grass = top & (rng.random((size, size)) < 0.2)
+    world[grass] = ids['tallgrass']
+    # lava pools and trees
+    for name, count in (('lava', size // 8), ('log', size // 2)):
+        for _ in range(count):
+            cx, cz = rng.integers(2, size - 2, 2)
+            h = surface[cz, cx]
+            if name == 'lava':
+                world[h - 1, cz - 1:cz + 2, cx - 1:cx + 2] = ids['lava']
+            else:
+                world[h:h + 4, cz, cx] = ids['log']
+    return world.astype(numpy.int16)
+
+
+def random_stand(rng, planner, size):
+    while True:
+        x, z = rng.randrange(size), rng.randrange(size)
+        for y in range(planner.dimY - 1, 0, -1):
+            if planner.canStand([x, y, z]):
+                return (x, y, z)
+
+
+# WorldState
+
+def make_frame(width: int, height: int) -> TimestampedVideoFrame:
+    header = {'x': 0, 'y': 0, 'z': 0, 'yaw': 0, 'pitch': 0,
+              'img_width': width, 'img_height': height, 'img_ch': 3,
+              'modelViewMatrix': IDENTITY, 'projectionMatrix': IDENTITY}
+    # frames are received into bytearrays, see VideoServer
+    data = memoryview(bytearray(video_message(header, bytes(width * height * 3))))
+    return TimestampedVideoFrame(TimestampedUnsignedCharVector(timestamp=time.time(), data=data))
+
+
+# colour maps
+
+def random_colour_map(rng, width, height, unknown=200):
+    """blocks of known colours and of unknown ones, like other blocks and entities"""
+    colours = numpy.array(list(segment_mapping), dtype=numpy.uint8)
+    colours = numpy.concatenate([colours, rng.integers(0, 256, (unknown, 3), dtype=numpy.uint8)])
+    # coarse cells scaled up, like objects on a frame
+    cells = rng.integers(0, len(colours), (height // 8 + 1, width // 8 + 1))
+    pixels = colours[cells].repeat(8, axis=0).repeat(8, axis=1)[:height, :width]
+    return numpy.ascontiguousarray(pixels)
+
+
+def decode_dict(pixels):
+    """labels of segmentation_decoder with a dict lookup for every pixel"""
+    labels = {colour: segmentation_decoder.label(name) for colour, name in segment_mapping.items()}
+    h, w = pixels.shape[:2]
+    result = numpy.zeros((h, w), dtype=segmentation_decoder.dtype)
+    for y, row in enumerate(pixels.tolist()):
+        for x, colour in enumerate(row):
+            result[y, x] = labels.get(tuple(colour[:3]), 0)
+    return result
+
+
+# depth frames
+
+def perspective(fovy, aspect, near, far):
+    """opengl projection matrix as sent in frame headers, column-major"""
+    f = 1 / math.tan(math.radians(fovy) / 2)
+    m = numpy.zeros((4, 4))
+    m[0, 0] = f / aspect
+    m[1, 1] = f
+    m[2, 2] = (far + near) / (near - far)
+    m[2, 3] = 2 * far * near / (near - far)
+    m[3, 2] = -1
+    return m.T.astype(numpy.float32)
+
+
+def view_rotation(yaw, pitch):
+    """camera rotation of the model-view matrix, column-major"""
+    p, y = math.radians(pitch), math.radians(yaw + 180)
+    rx = numpy.array([[1, 0, 0, 0], [0, math.cos(p), -math.sin(p), 0],
+                      [0, math.sin(p), math.cos(p), 0], [0, 0, 0, 1]])
+    ry = numpy.array([[math.cos(y), 0, math.sin(y), 0], [0, 1, 0, 0],
+                      [-math.sin(y), 0, math.cos(y), 0], [0, 0, 0, 1]])
+    return (rx @ ry).T.astype(numpy.float32)
+
+
+def render_floor(projection, modelView, width, height, floor):
+    """depth buffer, top row first, of the plane y = floor relative to the eye, 1 for the sky"""
+    m = projection.astype(numpy.float64).T @ modelView.astype(numpy.float64).T
+    inverse = numpy.linalg.inv(m)
+    y, x = numpy.mgrid[0:height, 0:width]
+    ndc = numpy.stack([(x + 0.5) * 2 / width - 1, 1 - (y + 0.5) * 2 / height], axis=-1)
+    ends = []
+    for z in (-1, 1):
+        h = numpy.concatenate([ndc, numpy.full(ndc.shape[:2] + (1,), z), numpy.ones(ndc.shape[:2] + (1,))], axis=-1)
+        h = h @ inverse.T
+        ends.append(h[..., :3] / h[..., 3:])
+    near, far = ends
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        t = (floor - near[..., 1]) / (far[..., 1] - near[..., 1])
+    hit = (t > 0) & (t < 1)
+    p = near + numpy.where(hit, t, 0)[..., None] * (far - near)
+    clip = numpy.concatenate([p, numpy.ones(p.shape[:2] + (1,))], axis=-1) @ m.T
+    depth = (clip[..., 2] / clip[..., 3] + 1) / 2
+    return numpy.where(hit, depth, 1).astype(numpy.float32)
+
+
+def unproject_pixels(depth, projection, modelView, origin):
+    """points of pixels with depth below 1, one pixel at a time"""
+    inverse = numpy.linalg.inv(projection.astype(numpy.float64).T @ modelView.astype(numpy.float64).T)
+    height, width = depth.shape
+    points = []
+    for row in range(height):
+        for col in range(width):
+            d = depth[row, col]
+            if d >= 1:
+                continue
+            h = inverse @ [(col + 0.5) * 2 / width - 1, 1 - (row + 0.5) * 2 / height, d * 2 - 1, 1]
+            points.append(h[:3] / h[3] + origin)
+    return numpy.array(points).reshape(-1, 3)
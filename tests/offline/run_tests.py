@@ -0,0 +1,22 @@
+"""
+tests which don't require running minecraft, fake vereya server is used instead
+"""
+import sys
+import unittest
+import logging
+from tagilmo import VereyaPython
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    VereyaPython.setupLogger()
+    test_files = ['test_fake_vereya', 'test_dispatch', 'test_buffer_pool', 'test_video_frame', 'test_commands', 'test_client_pool', 'test_io_runtime', 'test_world_state', 'test_ring_buffer', 'test_frame_publisher', 'test_robust_observer', 'test_async_observer', 'test_observation_history', 'test_callback_executor', 'test_block_vocabulary', 'test_grid_in_yaw', 'test_grid_rays', 'test_grid_offsets', 'test_block_memory', 'test_voxel_map', 'test_path_planner', 'test_segmentation', 'test_depth_cloud', 'test_neural_server']
+    suite = unittest.defaultTestLoader.loadTestsFromNames(test_files)
+    result = unittest.TextTestRunner().run(suite)
+    if not result.wasSuccessful():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import time
+import asyncio
+import unittest
+from tagilmo import VereyaPython
+from tagilmo.utils.vereya_wrapper import AsyncRobustObserver
+from fake_vereya import FakeVereya
+from common import init_mission
+
+
+class TestAsyncObserver(unittest.TestCase):
+
+    def setUp(self):
+        self.vereya = FakeVereya(port=0, obs_rate=20, video_rate=20).start()
+        self.agents = []
+
+    def tearDown(self):
+        for mc, rob in self.agents:
+            mc.stop()
+        self.vereya.stop()
+
+    def start(self, **kwargs):
+        mc, rob = init_mission(self.vereya, observer=AsyncRobustObserver, **kwargs)
+        self.agents.append((mc, rob))
+        self.assertTrue(mc.safeStart())
+        return mc, rob
+
+    def test_observations(self):
+        mc, rob = self.start(video=(32, 24))
+
+        async def run():
+            pos = await rob.wait_for('getAgentPos', timeout=2)
+            self.assertEqual(len(pos), 5)
+            version = rob.getCacheVersion('getAgentPos')
+            await rob.wait_for('getAgentPos', newer_than=version, timeout=2)
+            self.assertGreater(rob.getCacheVersion('getAgentPos'), version)
+            with self.assertRaises(asyncio.TimeoutError):
+                await rob.wait_for('getChat', timeout=0.1)
+            observations = []
+            async for obs in rob.observations():
+                observations.append(obs)
+                if len(observations) == 3:
+                    break
+            self.assertTrue(all('XPos' in obs for obs in observations))
+            async for frame in rob.frames(VereyaPython.FrameType.VIDEO):
+                self.assertEqual(frame.iWidth, 32)
+                break
+            await rob.send_commands(['move 0', 'quit'])
+
+        t0 = time.time()
+        asyncio.run(asyncio.wait_for(run(), 5))
+        self.assertLess(time.time() - t0, 3)
+        self.assertEqual(rob._observation_queues, [])
+        self.assertEqual(rob._async_waiters.get('getChat', []), [])
+        while time.time() - t0 < 2 and 'quit' not in self.vereya.commands():
+            time.sleep(0.01)
+        self.assertEqual(self.vereya.commands()[-2:], ['move 0', 'quit'])
+
+    def test_agents_in_one_thread(self):
+        robs = [self.start()[1] for _ in range(2)]
+
+        async def agent(rob):
+            count = 0
+            async for obs in rob.observations():
+                count += 1
+                if count == 5:
+                    return count
+
+        async def run():
+            return await asyncio.gather(*(agent(rob) for rob in robs))
+
+        self.assertEqual(asyncio.run(asyncio.wait_for(run(), 5)), [5, 5])
+
+
+def main():
+    VereyaPython.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import random
+import unittest
+
+from tagilmo import VereyaPython as VP
+from mcdemoaux.agenttools.block_memory import NoticeBlocks, BlockPositions
+from reference import ListNoticeBlocks, random_pos, make_observer, random_observation, observe
+
+
+class TestBlockMemory(unittest.TestCase):
+
+    def test_positions(self):
+        memory = BlockPositions(dx=4, max_len=3)
+        self.assertTrue(memory.add([0, 0, 0]))
+        self.assertFalse(memory.add([4, -4, 4]))
+        self.assertEqual(memory.findNear([3, 1, -4]), [0, 0, 0])
+        for pos in ([5, 0, 0], [-5, 0, 0], [0, 10, 0]):
+            self.assertTrue(memory.add(pos))
+        # the oldest one is forgotten
+        self.assertEqual(list(memory), [[5, 0, 0], [-5, 0, 0], [0, 10, 0]])
+        self.assertEqual(memory[-1], [0, 10, 0])
+        self.assertNotIn([0, 0, 0], memory)
+        self.assertEqual(memory.within([-5, 0, -1], [5, 0, 1]), [[5, 0, 0], [-5, 0, 0]])
+        self.assertEqual(memory.removeAll([[5, 0, 0], [1, 1, 1], [0, 10, 0]]), 2)
+        self.assertEqual(len(memory), 1)
+        pos, d = memory.nearest([0, 0, 0], lambda a, p: abs(a[0] - p[0]), maxDist=4)
+        self.assertIsNone(pos)
+        self.assertEqual(memory.nearest([0, 0, 0], lambda a, p: abs(a[0] - p[0])), ([-5, 0, 0], 5))
+
+    def test_random(self):
+        # the same as lists with large enough max_len
+        rng = random.Random(0)
+        for extent in (10, 60, 400):
+            expected, memory = ListNoticeBlocks(max_len=10000), NoticeBlocks()
+            for step in range(3000):
+                block = rng.choice(['log', 'leaves', 'water'])
+                pos = random_pos(rng, extent)
+                if step % 10 == 9:
+                    expected.removeIfMissing('leaves', ['log', 'water'], pos)
+                    memory.removeIfMissing('leaves', ['log', 'water'], pos)
+                else:
+                    expected.updateBlock(block, pos)
+                    memory.updateBlock(block, pos)
+                if step % 50 == 0:
+                    aPos = [rng.uniform(-extent, extent), rng.uniform(0, 80), rng.uniform(-extent, extent)]
+                    targets = rng.choice([['log'], ['water', 'log'], ['leaves', 'diamond_ore']])
+                    self.assertEqual(memory.recallNearest(targets, aPos, True),
+                                     expected.recallNearest(targets, aPos, True))
+            for block in expected.blocks:
+                self.assertEqual(list(memory.blocks[block]), expected.blocks[block])
+
+    def test_recall_limit(self):
+        memory = NoticeBlocks()
+        memory.updateBlock('log', [10, 0, 0])
+        memory.updateBlock('coal_ore', [0, 1, 30])
+        self.assertEqual(memory.recallNearest(['coal_ore', 'log'], [0, 0, 0], True, maxDist=20),
+                         [[10, 0, 0], 'log'])
+        self.assertEqual(memory.recallNearest(['coal_ore'], [0, 0, 0], maxDist=20), None)
+
+    def test_update_blocks(self):
+        rng = random.Random(1)
+        radius = [5, 2, 5]
+        mc, rob = make_observer(radius)
+        try:
+            expected, memory = ListNoticeBlocks(max_len=10000), NoticeBlocks()
+            for memo in (expected, memory):
+                memo.focus_blocks = {'lava', 'leaves'}
+            for step in range(30):
+                pos = [rng.uniform(-3, 3) + step, 64.0, rng.uniform(-3, 3), 0.0, 0.0]
+                observe(rob, random_observation(rng, radius, pos))
+                expected.updateBlocks(rob)
+                memory.updateBlocks(rob)
+                for block in expected.blocks:
+                    self.assertEqual(list(memory.blocks[block]), expected.blocks[block], (step, block))
+        finally:
+            mc.stop()
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import unittest
+import numpy
+from types import SimpleNamespace
+
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.block_vocabulary import BlockVocabulary, block_vocabulary, MAX_BLOCKS
+from common import init_mission
+from fake_vereya import make_observation
+from test_robust_observer import observe
+
+
+class TestBlockVocabulary(unittest.TestCase):
+
+    def test_ids(self):
+        vocabulary = BlockVocabulary()
+        self.assertEqual(vocabulary.id('air'), 0)
+        ids = vocabulary.encode(['air', 'stone', 'dirt', 'stone'])
+        self.assertEqual(ids.dtype, numpy.int16)
+        self.assertEqual(ids.tolist(), [0, 1, 2, 1])
+        self.assertEqual(vocabulary.decode(ids.reshape(2, 2)), ['air', 'stone', 'dirt', 'stone'])
+        self.assertEqual(len(vocabulary), 3)
+
+    def test_mask(self):
+        vocabulary = BlockVocabulary()
+        grid = vocabulary.encode(['air', 'stone', 'water', 'lava', 'sand'])
+        self.assertEqual(vocabulary.mask(['sand', 'air'])[grid].tolist(), [True, False, False, False, True])
+        # new names are added
+        mask = vocabulary.mask(['cactus'])
+        self.assertEqual(len(mask), MAX_BLOCKS + 1)
+        self.assertTrue(mask[vocabulary.id('cactus')])
+        # ids added later are in range and not in the set, nor is UNKNOWN at -1
+        self.assertFalse(mask[vocabulary.id('gravel')])
+        self.assertEqual(mask[vocabulary.encode(['obsidian', 'cactus'])].tolist(), [False, True])
+        self.assertFalse(mask[-1])
+
+    def test_connector(self):
+        vereya = SimpleNamespace(host='127.0.0.1', port=0)
+        mc, rob = init_mission(vereya, grid=[[-2, 2], [-1, 1], [-3, 3]])
+        try:
+            data = make_observation(0, 5 * 3 * 7)
+            observe(rob, data)
+            grid = rob.getNearGridArray()
+            self.assertEqual(grid.shape, (3, 7, 5))
+            self.assertIs(mc.getNearGridArray(), grid)
+            # same layout as getNearGrid3D
+            self.assertEqual(block_vocabulary.decode(grid[1, 2]), rob.getNearGrid3D()[1][2])
+            # masks of the observer's own block sets, stone is interned first
+            stone = block_vocabulary.id('stone')
+            deadly = rob.blockMask(rob.deadlyBlocks)
+            self.assertTrue(deadly[block_vocabulary.id('lava')])
+            self.assertFalse(deadly[stone])
+            self.assertIs(rob.blockMask(rob.deadlyBlocks), deadly)
+            self.assertFalse(deadly.flags.writeable)
+            # still in range for names added after the mask was built
+            self.assertFalse(deadly[block_vocabulary.id('cobblestone_wall')])
+        finally:
+            mc.stop()
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
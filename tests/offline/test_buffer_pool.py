@@ -0,0 +1,96 @@
+import time
+import unittest
+import numpy
+from tagilmo import VereyaPython
+from tagilmo.VereyaPython.buffer_pool import BufferPool
+from tagilmo.VereyaPython.timestamped_unsigned_char_vector import TimestampedUnsignedCharVector
+from tagilmo.VereyaPython.timestamped_video_frame import TimestampedVideoFrame
+from fake_vereya import FakeVereya, video_message, IDENTITY
+from common import init_mission
+
+
+def make_frame(pool, width, height, value):
+    header = {'x': 0, 'y': 0, 'z': 0, 'yaw': 0, 'pitch': 0,
+              'img_width': width, 'img_height': height, 'img_ch': 3,
+              'modelViewMatrix': IDENTITY, 'projectionMatrix': IDENTITY}
+    data = video_message(header, bytes([value]) * (width * height * 3))
+    buf = pool.acquire(len(data))
+    buf[:len(data)] = data
+    message = TimestampedUnsignedCharVector(timestamp=time.time(), data=memoryview(buf)[:len(data)])
+    return TimestampedVideoFrame(message, release=pool.release)
+
+
+class TestBufferPool(unittest.TestCase):
+
+    def test_reuse(self):
+        pool = BufferPool(1000, count=0)
+        buf = pool.acquire(100)
+        self.assertTrue(pool.release(buf))
+        self.assertIs(pool.acquire(100), buf)
+        self.assertEqual(pool.getStats().allocated, 1)
+        self.assertEqual(pool.getStats().reused, 1)
+
+    def test_in_use(self):
+        pool = BufferPool(1000, count=0)
+        buf = pool.acquire(100)
+        arr = numpy.frombuffer(memoryview(buf)[:10], dtype=numpy.uint8)
+        self.assertFalse(pool.release(buf))
+        del arr
+        self.assertTrue(pool.release(buf))
+        # released twice
+        self.assertFalse(pool.release(buf))
+
+    def test_oversize(self):
+        pool = BufferPool(100, count=0)
+        buf = pool.acquire(200)
+        self.assertEqual(len(buf), 200)
+        self.assertFalse(pool.release(buf))
+
+    def test_frame_release(self):
+        pool = BufferPool(8 * 4 * 3 + 4096, count=0)
+        frame = make_frame(pool, 8, 4, 7)
+        self.assertEqual(frame.pixels.shape, (4, 8, 3))
+        self.assertTrue((frame.pixels == 7).all())
+        frame.release()
+        self.assertEqual(pool.getStats().free, 1)
+        frame = make_frame(pool, 8, 4, 9)
+        self.assertEqual(pool.getStats().reused, 1)
+        # view is still referenced, buffer must not be reused
+        pixels = frame.pixelsView
+        del frame
+        self.assertEqual(pool.getStats().free, 0)
+        make_frame(pool, 8, 4, 11)
+        self.assertTrue((pixels == 9).all())
+
+    def test_cached_pixels(self):
+        pool = BufferPool(8 * 4 * 3 + 4096, count=0)
+        frame = make_frame(pool, 8, 4, 5)
+        pixels = frame.pixels
+        # cached copy doesn't hold the buffer
+        del frame
+        self.assertEqual(pool.getStats().free, 1)
+        self.assertTrue((pixels == 5).all())
+
+    def test_video_server(self):
+        vereya = FakeVereya(port=0, obs_rate=10, video_rate=50).start()
+        mc, rob = init_mission(vereya, video=(320, 240))
+        try:
+            self.assertTrue(mc.safeStart())
+            time.sleep(1)
+            frame = rob.waitNotNoneObserve('getImageFrame')
+            self.assertEqual(frame.pixels.shape, (240, 320, 3))
+            self.assertEqual(list(frame.pixels[0, :3, 0]), [0, 3, 6])
+            stats = mc.agent_hosts[0].video_server.buffer_pool.getStats()
+            self.assertGreater(stats.reused, stats.allocated)
+        finally:
+            mc.stop()
+            vereya.stop()
+
+
+def main():
+    VereyaPython.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+import time
+import threading
+import unittest
+from functools import partial
+from types import SimpleNamespace
+
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.callback_executor import CallbackExecutor, CallbackPolicy, Priority, BatchExecutor
+from tagilmo.utils.vereya_wrapper import RobustObserverWithCallbacks
+from common import init_mission
+from test_robust_observer import observe
+from fake_vereya import make_observation, FakeVereya
+
+
+def frame_row(frame):
+    # runs in another process, gets a pickled copy of the frame
+    if frame is None:
+        return None
+    return frame.pixels.shape, frame.pixels[0, :3, 0].tolist()
+
+
+class Results:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = []
+        self.event = threading.Event()
+
+    def __call__(self, result, tm):
+        with self.lock:
+            self.items.append(result)
+        self.event.set()
+
+
+class TestCallbackExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = CallbackExecutor(max_workers=1, process_workers=1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def wait_idle(self, *tasks, timeout=2):
+        t0 = time.time()
+        while any(task.queued or task.running for task in tasks) and time.time() - t0 < timeout:
+            time.sleep(0.01)
+
+    def test_coalesce(self):
+        data = {'value': 0}
+        results = Results()
+
+        def slow():
+            value = data['value']
+            time.sleep(0.1)
+            return value
+
+        task = self.executor.add(slow, CallbackPolicy(), results)
+        for i in range(5):
+            data['value'] = i
+            self.executor.trigger(task)
+            time.sleep(0.01)
+        self.wait_idle(task)
+        # the first run and one more on the newest value
+        self.assertEqual(results.items, [0, 4])
+        stats = self.executor.getStats(task)
+        self.assertEqual((stats.triggered, stats.runs, stats.coalesced), (5, 2, 3))
+        self.assertGreaterEqual(stats.run_time, 0.1)
+
+    def test_drop(self):
+        results = Results()
+        task = self.executor.add(lambda: time.sleep(0.1), CallbackPolicy(coalesce=False), results)
+        self.executor.trigger(task)
+        time.sleep(0.02)
+        self.executor.trigger(task)
+        self.wait_idle(task)
+        self.assertEqual(self.executor.getStats(task).dropped, 1)
+        self.assertEqual(len(results.items), 1)
+
+    def test_priority(self):
+        order = []
+        blocker = self.executor.add(lambda: time.sleep(0.1), CallbackPolicy(), Results())
+        low = self.executor.add(lambda: order.append('low'), CallbackPolicy(Priority.LOW), Results())
+        high = self.executor.add(lambda: order.append('high'), CallbackPolicy(Priority.HIGH), Results())
+        self.executor.trigger(blocker)
+        time.sleep(0.02)
+        self.executor.trigger(low)
+        self.executor.trigger(high)
+        self.wait_idle(blocker, low, high)
+        self.assertEqual(order, ['high', 'low'])
+        self.assertGreater(self.executor.getStats(low).queue_time, 0.05)
+
+    def test_deadline(self):
+        results = Results()
+        task = self.executor.add(lambda: time.sleep(0.1), CallbackPolicy(deadline=0.05), results)
+        self.executor.trigger(task)
+        self.wait_idle(task)
+        self.assertEqual(results.items, [])
+        self.assertEqual(self.executor.getStats(task).expired, 1)
+
+    def test_failed(self):
+        def fail():
+            raise KeyError('missing')
+        task = self.executor.add(fail, CallbackPolicy(), Results())
+        with self.assertLogs('vereya', 'ERROR') as logs:
+            self.executor.trigger(task)
+            self.wait_idle(task)
+        self.assertEqual(self.executor.getStats(task).failed, 1)
+        # the traceback of the failure is logged
+        self.assertIsInstance(logs.records[0].exc_info[1], KeyError)
+        self.assertIn('fail', logs.output[0])
+
+    def test_process(self):
+        results = Results()
+        task = self.executor.add(abs, CallbackPolicy(process=True), results, lambda: (-3,))
+        self.executor.trigger(task)
+        self.assertTrue(results.event.wait(10))
+        self.assertEqual(results.items, [3])
+        with self.assertRaises(ValueError):
+            CallbackExecutor(max_workers=0).add(abs, CallbackPolicy(process=True), results)
+
+
+class TestBatchExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.sizes = []
+
+    def double(self, items):
+        self.sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    def wait_items(self, batcher, n, timeout=2):
+        t0 = time.time()
+        while batcher.getStats().items < n and time.time() - t0 < timeout:
+            time.sleep(0.01)
+
+    def test_batch(self):
+        batcher = BatchExecutor(self.double, window=0.2, max_batch=8)
+        try:
+            results = [Results() for _ in range(5)]
+            for i, result in enumerate(results):
+                batcher.submit(i, i, result)
+            for result in results:
+                self.assertTrue(result.event.wait(2))
+            self.assertEqual([result.items for result in results], [[0], [2], [4], [6], [8]])
+            self.assertEqual(self.sizes, [5])
+            stats = batcher.getStats()
+            self.assertEqual((stats.batches, stats.items, stats.batch_size, stats.max_batch_size), (1, 5, 5, 5))
+            self.assertLess(stats.max_queue_time, 1)
+        finally:
+            batcher.shutdown()
+
+    def test_max_batch(self):
+        batcher = BatchExecutor(self.double, window=0.2, max_batch=2)
+        try:
+            results = Results()
+            for i in range(5):
+                batcher.submit(i, i, results)
+            self.wait_items(batcher, 5)
+            self.assertEqual(sorted(results.items), [0, 2, 4, 6, 8])
+            self.assertEqual(self.sizes, [2, 2, 1])
+        finally:
+            batcher.shutdown()
+
+    def test_replace(self):
+        batcher = BatchExecutor(self.double, window=0.2)
+        try:
+            results = Results()
+            # a client's newer item replaces its waiting one
+            batcher.submit('agent', 1, results)
+            batcher.submit('agent', 3, results)
+            self.wait_items(batcher, 1)
+            self.assertEqual(results.items, [6])
+            self.assertEqual(batcher.getStats().replaced, 1)
+        finally:
+            batcher.shutdown()
+
+    def test_failed(self):
+        batcher = BatchExecutor(lambda items: items[:1], window=0.05)
+        try:
+            results = Results()
+            with self.assertLogs('vereya', 'ERROR') as logs:
+                batcher.submit(0, 0, results)
+                batcher.submit(1, 1, results)
+                self.wait_items(batcher, 2)
+            # results must match the items
+            self.assertEqual(results.items, [])
+            self.assertIsInstance(logs.records[0].exc_info[1], ValueError)
+            self.assertEqual(batcher.getStats().failed, 1)
+        finally:
+            batcher.shutdown()
+
+
+class TestObserverCallbacks(unittest.TestCase):
+
+    def setUp(self):
+        vereya = SimpleNamespace(host='127.0.0.1', port=0)
+        self.mc, self.rob = init_mission(vereya, observer=RobustObserverWithCallbacks)
+
+    def tearDown(self):
+        self.rob.executor.shutdown()
+        self.mc.stop()
+
+    def test_named(self):
+        def life():
+            return self.rob.getCachedObserve('getLife') * 2
+        self.rob.addCallback('doubleLife', 'getLife', life)
+        self.rob.addCallback(None, 'getAgentPos', lambda: None, CallbackPolicy(Priority.HIGH))
+        version = self.rob.getCacheVersion('doubleLife')
+        observe(self.rob, make_observation(0, 125))
+        self.rob.waitCacheUpdate('doubleLife', version, 2)
+        self.assertEqual(self.rob.getCachedObserve('doubleLife'), 40.0)
+        stats = self.rob.getCallbackStats()
+        self.assertEqual(stats['doubleLife'].runs, 1)
+        self.assertIn('<lambda>', stats)
+
+    def test_batched(self):
+        batcher = BatchExecutor(lambda items: [item * 3 for item in items], window=0.01)
+        try:
+            self.rob.addBatchedCallback('tripleLife', 'getLife', lambda: self.rob.getCachedObserve('getLife'), batcher)
+            self.assertIsNone(self.rob.getCachedObserve('tripleLife'))
+            version = self.rob.getCacheVersion('tripleLife')
+            observe(self.rob, make_observation(0, 125))
+            self.rob.waitCacheUpdate('tripleLife', version, 2)
+            self.assertEqual(self.rob.getCachedObserve('tripleLife'), 60.0)
+            self.assertEqual(batcher.getStats().batches, 1)
+        finally:
+            batcher.shutdown()
+
+
+class TestProcessFrameCallback(unittest.TestCase):
+
+    def test_frame(self):
+        vereya = FakeVereya(port=0, obs_rate=10, video_rate=50).start()
+        observer = partial(RobustObserverWithCallbacks, process_workers=1)
+        mc, rob = init_mission(vereya, video=(320, 240), observer=observer)
+        try:
+            rob.addCallback('frameRow', 'getImageFrame', frame_row, CallbackPolicy(process=True))
+            self.assertTrue(mc.safeStart())
+            t0 = time.time()
+            while rob.getCachedObserve('frameRow') is None and time.time() - t0 < 10:
+                rob.waitCacheUpdate('frameRow', rob.getCacheVersion('frameRow'), 1)
+            self.assertEqual(rob.getCachedObserve('frameRow'), ((240, 320, 3), [0, 3, 6]))
+            self.assertEqual(rob.getCallbackStats()['frameRow'].failed, 0)
+        finally:
+            rob.executor.shutdown()
+            mc.stop()
+            vereya.stop()
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
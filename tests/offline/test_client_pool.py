@@ -0,0 +1,78 @@
+import time
+import socket
+import unittest
+from tagilmo import VereyaPython as VP
+from tagilmo.VereyaPython.client_liveness import ClientLiveness, client_liveness
+from fake_vereya import FakeVereya
+from common import init_mission
+
+
+def silent_client():
+    """accepts connections but never replies, like a hung client"""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(8)
+    return sock
+
+
+def closed_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class TestClientLiveness(unittest.TestCase):
+
+    def test_dead_timeout(self):
+        liveness = ClientLiveness(dead_timeout=0.1)
+        a, b = VP.ClientInfo('127.0.0.1', 1), VP.ClientInfo('127.0.0.1', 2)
+        liveness.markDead(a)
+        self.assertTrue(liveness.isDead(a))
+        self.assertEqual(liveness.filterAlive([a, b]), [b])
+        # all dead, try them anyway
+        liveness.markDead(b)
+        self.assertEqual(liveness.filterAlive([a, b]), [a, b])
+        liveness.markAlive(b)
+        self.assertEqual(liveness.filterAlive([a, b]), [b])
+        time.sleep(0.15)
+        self.assertFalse(liveness.isDead(a))
+
+
+class TestClientPool(unittest.TestCase):
+
+    def setUp(self):
+        client_liveness.clear()
+        self.vereya = FakeVereya(port=0, obs_rate=20).start()
+        self.silent = [silent_client() for _ in range(4)]
+        self.refused = [closed_port() for _ in range(4)]
+        self.mc, self.rob = init_mission(self.vereya)
+        ports = [s.getsockname()[1] for s in self.silent] + self.refused + [self.vereya.port]
+        self.pool = [VP.ClientInfo('127.0.0.1', port) for port in ports]
+        self.mc.client_pool = VP.ClientPool(self.pool)
+
+    def tearDown(self):
+        self.mc.stop()
+        self.vereya.stop()
+        for sock in self.silent:
+            sock.close()
+        client_liveness.clear()
+
+    def test_concurrent_reservation(self):
+        t0 = time.time()
+        self.assertTrue(self.mc.safeStart())
+        # sequential probing would wait 3 s for each silent client
+        self.assertLess(time.time() - t0, 2.5)
+        for port in self.refused:
+            self.assertTrue(client_liveness.isDead(VP.ClientInfo('127.0.0.1', port)))
+        self.assertFalse(client_liveness.isDead(self.pool[-1]))
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import time
+import threading
+import unittest
+from tagilmo import VereyaPython
+from fake_vereya import FakeVereya
+from common import init_mission
+
+
+class TestCommands(unittest.TestCase):
+
+    def setUp(self):
+        self.vereya = FakeVereya(port=0, obs_rate=20).start()
+        self.mc, self.rob = init_mission(self.vereya)
+        self.assertTrue(self.mc.safeStart())
+        self.connection = self.mc.agent_hosts[0].commands_connection
+
+    def tearDown(self):
+        self.mc.stop()
+        self.vereya.stop()
+
+    def wait_commands(self, count):
+        t0 = time.time()
+        while len(self.vereya.commands()) < count and time.time() - t0 < 2:
+            time.sleep(0.01)
+        return self.vereya.commands()
+
+    def test_stop_move(self):
+        self.rob.stopMove()
+        self.assertEqual(self.wait_commands(5), ['move 0', 'turn 0', 'pitch 0', 'jump 0', 'strafe 0'])
+        stats = self.connection.getStats()
+        self.assertEqual(stats.commands, 5)
+        self.assertEqual(stats.writes, 1)
+
+    def test_back_to_back(self):
+        batch = ['move 1', 'turn 0.5', 'attack 1']
+        def send(i):
+            for _ in range(20):
+                self.mc.sendCommand(f'jump {i}')
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(3)]
+        for th in threads:
+            th.start()
+        self.rob.sendCommands(batch)
+        for th in threads:
+            th.join()
+        commands = self.wait_commands(63)
+        self.assertEqual(len(commands), 63)
+        start = commands.index('move 1')
+        self.assertEqual(commands[start:start + 3], batch)
+        self.assertLessEqual(self.connection.getStats().writes, 61)
+
+    def test_batch_window(self):
+        self.mc.agent_hosts[0].setCommandBatchWindow(0.05)
+        for i in range(10):
+            self.mc.sendCommand(f'turn {i}')
+        self.assertEqual(self.wait_commands(10), [f'turn {i}' for i in range(10)])
+        self.assertEqual(self.connection.getStats().writes, 1)
+        mc, _ = init_mission(self.vereya, observer=None, command_batch_window=0.05)
+        try:
+            self.assertEqual(mc.agent_hosts[0].command_batch_window, 0.05)
+        finally:
+            mc.stop()
+
+    def test_close_flushes(self):
+        self.mc.agent_hosts[0].setCommandBatchWindow(10)
+        self.rob.sendCommands(['move 1', 'jump 1'])
+        self.connection.close()
+        self.assertEqual(self.wait_commands(2), ['move 1', 'jump 1'])
+        self.assertEqual(self.connection.getStats().writes, 1)
+
+
+def main():
+    VereyaPython.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import time
+import unittest
+
+import numpy
+
+from tagilmo import VereyaPython as VP
+from tagilmo.VereyaPython.timestamped_unsigned_char_vector import TimestampedUnsignedCharVector
+from tagilmo.VereyaPython.timestamped_video_frame import TimestampedVideoFrame, FrameType
+from tagilmo.utils.depth_cloud import DepthUnprojector, depthImage, EYE_HEIGHT
+from fake_vereya import video_message
+from reference import perspective, view_rotation, render_floor, unproject_pixels
+
+
+WIDTH, HEIGHT = 64, 48
+
+
+def make_depth_frame(depth, projection, modelView, pos):
+    header = {'x': pos[0], 'y': pos[1], 'z': pos[2], 'yaw': 0, 'pitch': 0,
+              'img_width': depth.shape[1], 'img_height': depth.shape[0], 'img_ch': 4,
+              'modelViewMatrix': modelView.ravel().tolist(), 'projectionMatrix': projection.ravel().tolist()}
+    # bottom row first
+    data = numpy.ascontiguousarray(depth[::-1], dtype=numpy.float32).tobytes()
+    message = TimestampedUnsignedCharVector(timestamp=time.time(), data=video_message(header, data))
+    return TimestampedVideoFrame(message, FrameType.DEPTH_MAP)
+
+
+class TestDepthCloud(unittest.TestCase):
+
+    def setUp(self):
+        self.projection = perspective(70, WIDTH / HEIGHT, 0.05, 256)
+        self.modelView = view_rotation(40, 20)
+        self.depth = render_floor(self.projection, self.modelView, WIDTH, HEIGHT, -EYE_HEIGHT)
+        self.unprojector = DepthUnprojector()
+
+    def test_reference(self):
+        origin = (10.5, 64 + EYE_HEIGHT, -3.5)
+        cloud = self.unprojector.unprojectDepth(self.depth, self.projection, self.modelView, origin)
+        self.assertEqual(cloud.points.dtype, numpy.float32)
+        self.assertIsNone(cloud.labels)
+        # the sky is dropped
+        self.assertTrue(0 < len(cloud.points) < self.depth.size)
+        expected = unproject_pixels(self.depth, self.projection, self.modelView, origin)
+        numpy.testing.assert_allclose(cloud.points, expected, atol=0.02)
+        # all of them on the floor under the eye
+        numpy.testing.assert_allclose(cloud.points[:, 1], 64, atol=0.02)
+
+    def test_stride_roi(self):
+        # every pixel is in front of the far plane
+        depth = numpy.full((HEIGHT, WIDTH), 0.99, dtype=numpy.float32)
+        full = self.unprojector.unprojectDepth(depth, self.projection, self.modelView)
+        full = full.points.reshape(HEIGHT, WIDTH, 3)
+        cloud = self.unprojector.unprojectDepth(depth, self.projection, self.modelView, stride=3, roi=(10, 5, 40, 30))
+        numpy.testing.assert_array_equal(cloud.points, full[5:31:3, 10:41:3].reshape(-1, 3))
+        cloud = self.unprojector.unprojectDepth(depth, self.projection, self.modelView, stride=4)
+        numpy.testing.assert_array_equal(cloud.points, full[::4, ::4].reshape(-1, 3))
+        # sampling is computed once for each resolution, stride and roi
+        self.assertIs(self.unprojector.sampling(HEIGHT, WIDTH, 4), self.unprojector.sampling(HEIGHT, WIDTH, 4))
+        self.assertEqual(len(self.unprojector.rays), 3)
+
+    def test_labels(self):
+        labels = numpy.arange(HEIGHT * WIDTH, dtype=numpy.int32).reshape(HEIGHT, WIDTH)
+        cloud = self.unprojector.unprojectDepth(self.depth, self.projection, self.modelView, labels=labels)
+        numpy.testing.assert_array_equal(cloud.labels, labels[self.depth < 1])
+        self.assertEqual(len(cloud.labels), len(cloud.points))
+        cloud = self.unprojector.unprojectDepth(self.depth, self.projection, self.modelView,
+                                                stride=2, roi=(0, 20, 63, 47), labels=labels)
+        numpy.testing.assert_array_equal(cloud.labels, labels[20::2, ::2][self.depth[20::2, ::2] < 1])
+
+    def test_frame(self):
+        pos = (0.5, 70, 2.5)
+        frame = make_depth_frame(self.depth, self.projection, self.modelView, pos)
+        numpy.testing.assert_array_equal(depthImage(frame), self.depth)
+        cloud = self.unprojector.unproject(frame, stride=2)
+        expected = self.unprojector.unprojectDepth(self.depth, self.projection, self.modelView,
+                                                   (0.5, 70 + EYE_HEIGHT, 2.5), stride=2)
+        numpy.testing.assert_array_equal(cloud.points, expected.points)
+        numpy.testing.assert_allclose(cloud.points[:, 1], 70, atol=0.02)
+
+    def test_eye_height(self):
+        self.assertEqual(EYE_HEIGHT, 1.62)
+        # looking horizontally, a pixel 10 blocks away along the view axis
+        near, far, distance = 0.05, 256, 10.0
+        modelView = view_rotation(0, 0)
+        depth = numpy.ones((HEIGHT, WIDTH), dtype=numpy.float32)
+        row, col = 40, 32
+        ndc_z = ((far + near) * distance - 2 * far * near) / ((far - near) * distance)
+        depth[row, col] = (ndc_z + 1) / 2
+        frame = make_depth_frame(depth, self.projection, modelView, (0.5, 64, 0.5))
+        cloud = self.unprojector.unproject(frame)
+        self.assertEqual(len(cloud.points), 1)
+        # below the eye by the ray's slope times the distance
+        f = 1 / numpy.tan(numpy.radians(70) / 2)
+        ndc_y = 1 - (row + 0.5) * 2 / HEIGHT
+        self.assertAlmostEqual(float(cloud.points[0, 1]), 64 + 1.62 + ndc_y * distance / f, places=2)
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
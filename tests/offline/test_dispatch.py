@@ -0,0 +1,134 @@
+import time
+import socket
+import asyncio
+import threading
+import unittest
+from tagilmo import VereyaPython
+from tagilmo.VereyaPython.tcp_server import TCPServer, DispatchMode
+from tagilmo.VereyaPython.world_state_policy import ObservationsPolicy
+from fake_vereya import frame_bytes
+
+
+class TestDispatch(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.th = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.th.start()
+        self.received = []
+        self.delay = 0.0
+
+    def tearDown(self):
+        self.server.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.th.join()
+        self.loop.close()
+
+    def callback(self, message):
+        time.sleep(self.delay)
+        self.received.append(int(message.data))
+
+    def start(self, dispatch, queue_size=64):
+        self.server = TCPServer(self.loop, 0, self.callback, 'test', dispatch, queue_size)
+        self.server.start()
+        sock = socket.create_connection(('127.0.0.1', self.server.getPort()))
+        return sock
+
+    def wait_processed(self, count, timeout=5):
+        t0 = time.time()
+        while self.server.getDispatchStats().processed < count and time.time() - t0 < timeout:
+            time.sleep(0.01)
+
+    def test_ordered(self):
+        sock = self.start(DispatchMode.ORDERED)
+        n = 200
+        sock.sendall(b''.join(frame_bytes(str(i).encode()) for i in range(n)))
+        self.wait_processed(n)
+        sock.close()
+        self.assertEqual(self.received, list(range(n)))
+        stats = self.server.getDispatchStats()
+        self.assertEqual(stats.received, n)
+        self.assertEqual(stats.dropped, 0)
+        self.assertEqual(stats.queued, 0)
+
+    def test_ordered_bounded(self):
+        self.delay = 0.01
+        sock = self.start(DispatchMode.ORDERED, queue_size=4)
+        n = 30
+        sock.sendall(b''.join(frame_bytes(str(i).encode()) for i in range(n)))
+        self.wait_processed(n)
+        sock.close()
+        self.assertEqual(self.received, list(range(n)))
+        self.assertLessEqual(self.server.getDispatchStats().max_queued, 4)
+
+    def test_latest_only(self):
+        self.delay = 0.05
+        sock = self.start(DispatchMode.LATEST_ONLY)
+        n = 50
+        sock.sendall(b''.join(frame_bytes(str(i).encode()) for i in range(n)))
+        t0 = time.time()
+        while self.server.getDispatchStats().received < n and time.time() - t0 < 5:
+            time.sleep(0.01)
+        stats = self.server.getDispatchStats()
+        self.wait_processed(stats.received - stats.dropped)
+        sock.close()
+        stats = self.server.getDispatchStats()
+        self.assertGreater(stats.dropped, 0)
+        self.assertEqual(stats.processed + stats.dropped, n)
+        # newest message is always delivered, order is kept
+        self.assertEqual(self.received[-1], n - 1)
+        self.assertEqual(self.received, sorted(self.received))
+
+    def test_eof(self):
+        sock = self.start(DispatchMode.ORDERED)
+        sock.sendall(frame_bytes(b'1'))
+        self.wait_processed(1)
+        sock.close()
+        # the handler is done with the connection right away
+        t0 = time.time()
+        while not self.server.writer[0].is_closing() and time.time() - t0 < 0.5:
+            time.sleep(0.01)
+        self.assertTrue(self.server.writer[0].is_closing())
+
+    def test_cancel(self):
+        sock = self.start(DispatchMode.ORDERED)
+        sock.sendall(frame_bytes(b'1'))
+        self.wait_processed(1)
+
+        async def cancel():
+            # as AgentHost.stop does
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        with self.assertNoLogs('asyncio', level='ERROR'):
+            asyncio.run_coroutine_threadsafe(cancel(), self.loop).result(5)
+            time.sleep(0.1)
+        sock.close()
+
+
+class TestAgentHostDispatch(unittest.TestCase):
+
+    def test_modes(self):
+        agent_host = VereyaPython.AgentHost()
+        try:
+            self.assertEqual(agent_host.videoDispatchMode(), DispatchMode.LATEST_ONLY)
+            # observations carry events, none of them is dropped unless asked for
+            self.assertEqual(agent_host.observationsDispatchMode(), DispatchMode.ORDERED)
+            agent_host.setObservationsPolicy(ObservationsPolicy.KEEP_ALL_OBSERVATIONS)
+            agent_host.setObservationsPolicy(ObservationsPolicy.LATEST_OBSERVATION_ONLY)
+            self.assertEqual(agent_host.observationsDispatchMode(), DispatchMode.ORDERED)
+            agent_host.setObservationsDispatchMode(DispatchMode.LATEST_ONLY)
+            self.assertEqual(agent_host.observationsDispatchMode(), DispatchMode.LATEST_ONLY)
+        finally:
+            agent_host.stop()
+
+
+def main():
+    VereyaPython.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import time
+import unittest
+import logging
+from tagilmo import VereyaPython
+from fake_vereya import FakeVereya
+from common import init_mission
+
+
+logger = logging.getLogger(__name__)
+
+
+class TestFakeVereya(unittest.TestCase):
+
+    def setUp(self):
+        self.vereya = FakeVereya(port=0, obs_rate=50, video_rate=20).start()
+        self.mc, self.rob = init_mission(self.vereya, video=(320, 240), grid=[[-2, 2], [-1, 1], [-2, 2]])
+        self.assertTrue(self.mc.safeStart())
+
+    def tearDown(self):
+        self.mc.stop()
+        self.vereya.stop()
+
+    def test_observation(self):
+        pos = self.rob.waitNotNoneObserve('getAgentPos')
+        self.assertEqual(len(pos), 5)
+        grid = self.rob.waitNotNoneObserve('getNearGrid')
+        self.assertEqual(len(grid), 5 * 3 * 5)
+        self.assertEqual(self.mc.getVersion(), self.vereya.version)
+
+    def test_video(self):
+        frame = self.rob.waitNotNoneObserve('getImageFrame')
+        self.assertEqual(frame.pixels.shape, (240, 320, 3))
+        self.assertEqual(frame.iWidth, 320)
+
+    def test_commands(self):
+        self.rob.sendCommand('move 1')
+        self.rob.sendCommand('turn 0.1')
+        time.sleep(0.2)
+        self.assertEqual(self.vereya.commands(), ['move 1', 'turn 0.1'])
+
+    def test_quit(self):
+        self.assertTrue(self.mc.is_mission_running())
+        self.rob.sendCommand('quit')
+        time.sleep(0.3)
+        self.assertFalse(self.mc.is_mission_running())
+
+
+def main():
+    VereyaPython.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import time
+import unittest
+import multiprocessing
+import numpy
+from tagilmo import VereyaPython as VP
+from tagilmo.VereyaPython import FramePublisher, FrameSubscriber
+from fake_vereya import FakeVereya
+from common import init_mission
+from test_video_frame import make_frame
+
+
+def consume(name, count, queue, ready):
+    subscriber = FrameSubscriber(name)
+    ready.set()
+    seqs = []
+    ok = True
+    for frame in subscriber.frames(timeout=5):
+        ok = ok and frame.pixels.shape == (4, 6, 3) and frame.xPos == 1.5
+        seqs.append(frame.seq)
+        if len(seqs) == count:
+            break
+    queue.put((seqs, ok, subscriber.missed))
+    del frame
+    subscriber.close()
+
+
+class TestFramePublisher(unittest.TestCase):
+
+    def setUp(self):
+        self.publisher = FramePublisher(6 * 4 * 4, slots=4)
+        self.subscriber = FrameSubscriber(self.publisher.name)
+
+    def tearDown(self):
+        self.subscriber.close()
+        self.publisher.close()
+
+    def test_publish(self):
+        frame = make_frame(6, 4, 4)
+        self.assertIsNone(self.subscriber.next())
+        self.assertTrue(self.publisher.publish(frame))
+        shared = self.subscriber.next()
+        self.assertEqual(shared.seq, 1)
+        self.assertEqual((shared.xPos, shared.yaw, shared.timestamp), (1.5, 90, frame.timestamp))
+        numpy.testing.assert_array_equal(shared.calibrationMatrix, frame.calibrationMatrix)
+        numpy.testing.assert_array_equal(shared.pixels, frame.pixels)
+        numpy.testing.assert_array_equal(shared.rawPixels, frame.rawPixels)
+        self.assertIsNone(self.subscriber.next())
+        self.assertFalse(self.publisher.publish(make_frame(8, 8, 4)))
+
+    def test_missed(self):
+        for _ in range(10):
+            self.publisher.publish(make_frame(6, 4, 4))
+        # the last slots - 1 frames are still available
+        seqs = []
+        while (shared := self.subscriber.next()) is not None:
+            seqs.append(shared.seq)
+        self.assertEqual(seqs, [8, 9, 10])
+        self.assertEqual(self.subscriber.missed, 7)
+        self.publisher.publish(make_frame(6, 4, 4))
+        latest = self.subscriber.latest()
+        self.assertEqual(latest.seq, 11)
+        # overwritten while held
+        for _ in range(4):
+            self.publisher.publish(make_frame(6, 4, 4))
+        self.assertFalse(latest.isValid())
+
+    def test_process(self):
+        ctx = multiprocessing.get_context('spawn')
+        queue = ctx.Queue()
+        ready = ctx.Event()
+        proc = ctx.Process(target=consume, args=(self.publisher.name, 20, queue, ready))
+        proc.start()
+        self.assertTrue(ready.wait(30))
+        for _ in range(20):
+            self.publisher.publish(make_frame(6, 4, 4))
+            time.sleep(0.01)
+        seqs, ok, missed = queue.get(timeout=10)
+        proc.join()
+        self.assertTrue(ok)
+        self.assertEqual(seqs, list(range(1, 21)))
+        self.assertEqual(missed, 0)
+
+
+class TestAgentHostPublisher(unittest.TestCase):
+
+    def test_fake_vereya(self):
+        vereya = FakeVereya(port=0, obs_rate=10, video_rate=50).start()
+        mc, rob = init_mission(vereya, video=(64, 32))
+        try:
+            publisher = mc.agent_hosts[0].publishFrames(64, 32)
+            subscriber = FrameSubscriber(publisher.name)
+            self.assertTrue(mc.safeStart())
+            frames = []
+            for frame in subscriber.frames(timeout=2):
+                frames.append(frame.seq)
+                self.assertEqual(frame.pixels.shape, (32, 64, 3))
+                self.assertEqual(list(frame.pixels[0, :3, 0]), [0, 3, 6])
+                if len(frames) == 5:
+                    break
+            self.assertEqual(len(frames), 5)
+            del frame
+            subscriber.close()
+        finally:
+            mc.stop()
+            vereya.stop()
+        self.assertEqual(mc.agent_hosts[0].frame_publishers, {})
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import random
+import unittest
+
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.vereya_wrapper import RobustObserver
+from reference import (grid_in_yaw, analyze_grid_in_yaw, make_observer,
+                       random_observation, observe)
+
+
+class TestGridInYaw(unittest.TestCase):
+
+    def check(self, radius, poses):
+        rng = random.Random(1)
+        mc, rob = make_observer(radius)
+        try:
+            for pos in poses:
+                observe(rob, random_observation(rng, radius, pos))
+                expected = grid_in_yaw(rob.getNearGrid3D(False), rob.getCachedObserve('getAgentPos'))
+                self.assertEqual(rob.gridInYaw(False), expected, pos)
+                self.assertEqual(rob.analyzeGridInYaw(False),
+                                 analyze_grid_in_yaw(expected, rob.passableBlocks, RobustObserver.deadlyBlocks),
+                                 pos)
+        finally:
+            mc.stop()
+
+    def test_random(self):
+        rng = random.Random(0)
+        poses = [[rng.uniform(-50, 50), 64.0, rng.uniform(-50, 50), 0.0, rng.uniform(-360, 360)]
+                 for _ in range(300)]
+        self.check([5, 2, 5], poses)
+        self.check([3, 3, 4], poses[:100])
+
+    def test_edges(self):
+        # block boundaries, axis aligned and diagonal directions, around zero
+        poses = [[x, 4.0, z, 0.0, yaw]
+                 for x in (0.0, 0.5, -0.5, 1.0, -1.0, 0.25, 12.75)
+                 for z in (0.0, 0.5, -0.5, -3.0, 7.999)
+                 for yaw in (0.0, 90.0, -90.0, 180.0, -180.0, 45.0, -135.0, 30.0)]
+        self.check([5, 2, 5], poses)
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
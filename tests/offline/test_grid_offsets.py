@@ -0,0 +1,52 @@
+import random
+import unittest
+
+import numpy
+
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.grid_offsets import GridOffsets
+from reference import (make_observer, random_observation, observe,
+                       grid_index_to_pos, nearest_from_grid, all_positions, abs_positions)
+
+
+class TestGridOffsets(unittest.TestCase):
+
+    def test_index_to_pos(self):
+        box = [[-3, 2], [-1, 4], [-5, 5]]
+        offsets = GridOffsets(box)
+        self.assertEqual(len(offsets), 6 * 6 * 11)
+        for i in range(len(offsets)):
+            self.assertEqual(offsets.indexToPos(i), grid_index_to_pos(box, i))
+        mask = numpy.zeros(len(offsets), dtype=bool)
+        self.assertEqual(offsets.nearest(mask), -1)
+        self.assertEqual(len(offsets.nearestK(mask, 3)), 0)
+
+    def test_queries(self):
+        rng = random.Random(0)
+        for radius in ([5, 2, 5], [3, 4, 6]):
+            mc, rob = make_observer(radius)
+            try:
+                for _ in range(50):
+                    observe(rob, random_observation(rng, radius))
+                    for objs in (['lava'], ['cactus', 'water'], ['diamond_ore']):
+                        self.assertEqual(rob.nearestFromGrid(objs, False), nearest_from_grid(rob, objs))
+                        self.assertEqual(rob.nearestFromGrid(objs, False, True),
+                                         nearest_from_grid(rob, objs, True))
+                        expected = all_positions(rob, objs)
+                        self.assertEqual(rob.all_positions(objs, False), expected)
+                        self.assertEqual(rob.nearest_k(objs, 3, False), expected[:3])
+                    self.assertEqual(rob.nearest_k('water', 1, False), all_positions(rob, ['water'])[:1])
+                    self.assertEqual(numpy.floor(rob.gridAbsPositions(False)).astype(int).tolist(),
+                                     abs_positions(rob))
+                    self.assertEqual(rob.mc.gridIndexToPos(7), grid_index_to_pos(rob.mc.getGridBox(), 7))
+            finally:
+                mc.stop()
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
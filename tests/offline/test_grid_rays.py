@@ -0,0 +1,68 @@
+import random
+import unittest
+
+import numpy
+
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.grid_rays import marchRays, RayStatus
+from reference import (make_observer, random_observation, observe,
+                       analyze_paths_scalar, analyze_paths_vectorised, random_target)
+
+
+class TestGridRays(unittest.TestCase):
+
+    def check(self, radius, cases):
+        rng = random.Random(1)
+        mc, rob = make_observer(radius)
+        try:
+            for pos, target in cases:
+                observe(rob, random_observation(rng, radius, pos))
+                self.assertEqual(analyze_paths_vectorised(rob, target), analyze_paths_scalar(rob, target), (pos, target))
+        finally:
+            mc.stop()
+
+    def test_random(self):
+        rng = random.Random(0)
+        cases = []
+        for _ in range(200):
+            pos = [rng.uniform(-50, 50), 64.0, rng.uniform(-50, 50), 0.0, 0.0]
+            cases.append((pos, random_target(rng, pos)))
+        self.check([10, 2, 10], cases)
+        self.check([3, 3, 6], cases[:50])
+
+    def test_axes(self):
+        # rays along block boundaries
+        cases = [([x, 4.0, z, 0.0, 0.0], [x + dx, 4.0, z + dz])
+                 for x in (0.0, 0.5, -1.0)
+                 for z in (0.0, 0.5, -3.0)
+                 for dx, dz in ((5, 0), (-5, 0), (0, 5), (0, -5), (3, 3), (-3, 3))]
+        self.check([5, 2, 5], cases)
+
+    def test_status_order(self):
+        # 1x1x3 grid along x: 0 air, 1 stone, 2 lava
+        passable = numpy.array([True, False, False])
+        deadly = numpy.array([False, False, True])
+        grid = numpy.zeros((1, 1, 3), dtype=numpy.int16)
+        grid[0, 0] = [0, 0, 2]
+        args = ([0, 0, 0], [1, 0, 0], [[0.5, 0, 0.5]], [0], passable, deadly, -1)
+        d, status, xf, _ = marchRays(grid, *args)
+        self.assertEqual(status[0, 0], RayStatus.DEADLY)
+        self.assertEqual(d[0, 0], 5)
+        self.assertAlmostEqual(xf[0, 0], 1.0)
+        grid[0, 0] = [0, 0, 1]
+        d, status, _, _ = marchRays(grid, *args)
+        self.assertEqual((d[0, 0], status[0, 0]), (5, RayStatus.OBSTACLE))
+        grid[0, 0] = [0, 0, 0]
+        d, status, _, _ = marchRays(grid, *args)
+        self.assertEqual((d[0, 0], status[0, 0]), (100, RayStatus.FREE))
+        d, status, _, _ = marchRays(grid, *args, max_steps=5)
+        self.assertEqual((d[0, 0], status[0, 0]), (5, RayStatus.CLEAN))
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
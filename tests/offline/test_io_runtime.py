@@ -0,0 +1,54 @@
+import time
+import threading
+import unittest
+from tagilmo import VereyaPython as VP
+from fake_vereya import FakeVereya
+from common import init_mission
+
+
+class TestIoRuntime(unittest.TestCase):
+
+    def setUp(self):
+        self.vereya = FakeVereya(port=0, obs_rate=50).start()
+        self.runtime = VP.IoRuntime(max_workers=4)
+
+    def tearDown(self):
+        self.vereya.stop()
+        self.runtime.stop()
+
+    def test_shared_loop(self):
+        threads = threading.active_count()
+        agents = [init_mission(self.vereya, runtime=self.runtime) for _ in range(4)]
+        try:
+            for mc, rob in agents:
+                self.assertTrue(mc.safeStart())
+                self.assertIs(mc.agent_hosts[0].io_service, self.runtime.loop)
+            for mc, rob in agents:
+                self.assertIsNotNone(rob.waitNotNoneObserve('getAgentPos'))
+            self.assertEqual(self.runtime.getStats().attached, 4)
+            # no loop thread per agent, executor is bounded
+            self.assertLessEqual(threading.active_count() - threads, 4)
+            # stopping one agent keeps the others running
+            agents[0][0].stop()
+            self.assertEqual(self.runtime.getStats().attached, 3)
+            mc, rob = agents[1]
+            rob.sendCommands(['move 1', 'turn 1'])
+            agent_host = mc.agent_hosts[0]
+            count = agent_host.peekWorldState().number_of_observations_since_last_state
+            time.sleep(0.2)
+            self.assertGreater(agent_host.peekWorldState().number_of_observations_since_last_state, count)
+            self.assertEqual(self.vereya.commands(), ['move 1', 'turn 1'])
+        finally:
+            for mc, rob in agents:
+                mc.stop()
+        self.assertEqual(self.runtime.getStats().attached, 0)
+        self.assertTrue(self.runtime.isRunning())
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import threading
+import unittest
+
+from tagilmo import VereyaPython as VP
+
+try:
+    import torch
+    from mcdemoaux.vision.neural import NeuralServer
+except ImportError:
+    # torch and cv2 are optional
+    torch = None
+
+
+class StubNet:
+    """mean over channels, records batch sizes"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, images):
+        self.batches.append(tuple(images.shape))
+        return images.mean(dim=1, keepdim=True) * 2
+
+
+@unittest.skipIf(torch is None, 'torch and cv2 are needed')
+class TestNeuralServer(unittest.TestCase):
+
+    def setUp(self):
+        self.net = StubNet()
+        self.server = NeuralServer(self.net, window=0.2, max_batch=8)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_forward(self):
+        images = [torch.rand(1, 3, 8, 8), torch.rand(1, 3, 8, 16), torch.rand(1, 3, 8, 8)]
+        results = self.server.forward(images)
+        # one pass for each frame size
+        self.assertEqual(sorted(self.net.batches), [(1, 3, 8, 16), (2, 3, 8, 8)])
+        for img, (heatmaps, result_img) in zip(images, results):
+            self.assertIs(result_img, img)
+            self.assertEqual(tuple(heatmaps.shape), (1, 1) + tuple(img.shape[2:]))
+            self.assertTrue(torch.allclose(heatmaps, img.mean(dim=1, keepdim=True) * 2))
+
+    def test_batched(self):
+        images = [torch.rand(1, 3, 8, 8) for _ in range(4)]
+        results = dict()
+        done = threading.Event()
+
+        def on_result(agent, result, tm):
+            results[agent] = result
+            if len(results) == len(images):
+                done.set()
+
+        for agent, img in enumerate(images):
+            self.server.batcher.submit(agent, img, lambda result, tm, agent=agent: on_result(agent, result, tm))
+        self.assertTrue(done.wait(5))
+        self.assertEqual(self.net.batches, [(4, 3, 8, 8)])
+        for agent, img in enumerate(images):
+            self.assertIs(results[agent][1], img)
+        stats = self.server.getStats()
+        self.assertEqual((stats.batches, stats.items, stats.max_batch_size), (1, 4, 4))
+
+    def test_num_threads(self):
+        threads = torch.get_num_threads()
+        try:
+            NeuralServer(self.net, num_threads=1).shutdown()
+            self.assertEqual(torch.get_num_threads(), 1)
+            # left alone by default
+            torch.set_num_threads(2)
+            NeuralServer(self.net).shutdown()
+            self.assertEqual(torch.get_num_threads(), 2)
+        finally:
+            torch.set_num_threads(threads)
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import unittest
+import numpy
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.observation_history import TimeSeries, ObservationHistory
+
+
+class TestTimeSeries(unittest.TestCase):
+
+    def test_bounded(self):
+        series = TimeSeries(4, 1)
+        buffers = series._times, series._values
+        for i in range(10):
+            self.assertTrue(series.append(float(i), [i * 2.0]))
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series.times.tolist(), [6.0, 7.0, 8.0, 9.0])
+        self.assertEqual(series.values[:, 0].tolist(), [12.0, 14.0, 16.0, 18.0])
+        # no reallocation
+        self.assertIs(series._times, buffers[0])
+        self.assertIs(series._values, buffers[1])
+        # out of order sample
+        self.assertFalse(series.append(8.5, [0.0]))
+        self.assertEqual(series.latest()[0], 9.0)
+
+    def test_interpolation(self):
+        series = TimeSeries(8, 2, angular=(1,))
+        series.append(1.0, [0.0, 170.0])
+        series.append(2.0, [10.0, -170.0])
+        self.assertEqual(series.index(1.5), 0)
+        self.assertEqual(series.index(0.5), -1)
+        value = series.at(1.5)
+        self.assertAlmostEqual(value[0], 5.0)
+        # along the shortest arc, through 180
+        self.assertAlmostEqual(value[1], 180.0)
+        # clamped
+        self.assertEqual(series.at(0.0).tolist(), [0.0, 170.0])
+        self.assertEqual(series.at(3.0).tolist(), [10.0, -170.0])
+
+    def test_velocity(self):
+        series = TimeSeries(64, 2, angular=(1,))
+        self.assertIsNone(series.velocity())
+        for i in range(20):
+            t = i * 0.05
+            series.append(t, [2.0 * t, (170 + 30 * t + 180) % 360 - 180])
+        velocity = series.velocity(dt=0.2)
+        numpy.testing.assert_allclose(velocity, [2.0, 30.0])
+        numpy.testing.assert_allclose(series.velocity(t=0.5, dt=0.5), [2.0, 30.0])
+
+
+class TestObservationHistory(unittest.TestCase):
+
+    def test_streams(self):
+        history = ObservationHistory(capacity=16)
+        history.append(1.0, {'XPos': 1.0, 'YPos': 2.0, 'ZPos': 3.0, 'Pitch': 0.0, 'Yaw': 90.0,
+                             'Life': 20.0, 'Food': 18})
+        history.append(2.0, {'Life': 19.0})
+        self.assertEqual(len(history['pose']), 1)
+        self.assertEqual(history['pose'].latest()[1].tolist(), [1.0, 2.0, 3.0, 0.0, 90.0])
+        self.assertEqual(history['life'].times.tolist(), [1.0, 2.0])
+        self.assertEqual(len(history['air']), 0)
+        self.assertEqual(history['food'].latest()[1].tolist(), [18.0])
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import heapq
+import math
+import random
+import unittest
+
+import numpy
+
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.block_vocabulary import block_vocabulary
+from tagilmo.utils.path_planner import PathPlanner
+from tagilmo.utils.voxel_map import VoxelMap
+from reference import tables, make_world, random_stand
+
+
+def moves(blocks, passable, deadly, cell, max_fall):
+    """reference moves with costs, straight from the rules"""
+    dimY, dimZ, dimX = blocks.shape
+
+    def inside(x, y, z):
+        return 0 <= x < dimX and 0 <= y < dimY and 0 <= z < dimZ
+
+    def clear(x, y, z):
+        if not inside(x, y, z):
+            return False
+        b = blocks[y, z, x]
+        return b < 0 or (passable[b] and not deadly[b])
+
+    def stand(x, y, z):
+        if not (inside(x, y, z) and y > 0 and clear(x, y, z) and clear(x, y + 1, z)):
+            return False
+        b = blocks[y - 1, z, x]
+        return b >= 0 and not passable[b] and not deadly[b]
+
+    x, y, z = cell
+    for dx, dz in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        nx, nz = x + dx, z + dz
+        if not inside(nx, y, nz):
+            continue
+        if stand(nx, y, nz):
+            yield (nx, y, nz), 1.0
+        elif clear(x, y + 2, z) and stand(nx, y + 1, nz):
+            yield (nx, y + 1, nz), PathPlanner.STEP_UP_COST
+        elif clear(nx, y, nz) and clear(nx, y + 1, nz):
+            for k in range(1, max_fall + 1):
+                if stand(nx, y - k, nz):
+                    yield (nx, y - k, nz), PathPlanner.FALL_COST
+                    break
+                if not clear(nx, y - k, nz):
+                    break
+
+
+def dijkstra(blocks, passable, deadly, start, goal, max_fall):
+    dist = {start: 0.0}
+    heap = [(0.0, start)]
+    while heap:
+        d, cell = heapq.heappop(heap)
+        if cell == goal:
+            return d
+        if d > dist[cell]:
+            continue
+        for nxt, cost in moves(blocks, passable, deadly, cell, max_fall):
+            if d + cost < dist.get(nxt, math.inf):
+                dist[nxt] = d + cost
+                heapq.heappush(heap, (d + cost, nxt))
+    return None
+
+
+def cost(blocks, passable, deadly, path, max_fall):
+    total = 0.0
+    for a, b in zip(path, path[1:]):
+        costs = dict(moves(blocks, passable, deadly, a, max_fall))
+        assert b in costs, (a, b)
+        total += costs[b]
+    return total
+
+
+class TestPathPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.passable, self.deadly = tables()
+        self.ids = {name: block_vocabulary.id(name) for name in ('air', 'stone', 'lava')}
+
+    def flat(self, shape=(6, 1, 8)):
+        blocks = numpy.full(shape, self.ids['air'], dtype=numpy.int16)
+        blocks[0] = self.ids['stone']
+        return blocks
+
+    def test_rules(self):
+        air, stone, lava = self.ids['air'], self.ids['stone'], self.ids['lava']
+        blocks = self.flat()
+        # one step up, two are too high
+        blocks[1, 0, 2] = stone
+        planner = PathPlanner(blocks, [0, 0, 0], self.passable, self.deadly)
+        self.assertEqual(planner.plan([0.5, 1, 0.5], [3, 1, 0]),
+                         [(0, 1, 0), (1, 1, 0), (2, 2, 0), (3, 1, 0)])
+        blocks[2, 0, 2] = stone
+        planner = PathPlanner(blocks, [0, 0, 0], self.passable, self.deadly)
+        self.assertIsNone(planner.plan([0, 1, 0], [3, 1, 0]))
+        # no headroom for the step
+        blocks = self.flat()
+        blocks[1, 0, 2] = stone
+        blocks[3, 0, 1] = stone
+        planner = PathPlanner(blocks, [0, 0, 0], self.passable, self.deadly)
+        self.assertIsNone(planner.plan([1, 1, 0], [2, 2, 0]))
+        # fall of 3 is fine, 4 is not
+        blocks = self.flat()
+        blocks[1:4, 0, :3] = stone
+        planner = PathPlanner(blocks, [0, 0, 0], self.passable, self.deadly)
+        self.assertEqual(planner.plan([2, 4, 0], [4, 1, 0]), [(2, 4, 0), (3, 1, 0), (4, 1, 0)])
+        self.assertIsNone(planner.plan([4, 1, 0], [2, 4, 0]))
+        planner = PathPlanner(blocks, [0, 0, 0], self.passable, self.deadly, max_fall=2)
+        self.assertIsNone(planner.plan([2, 4, 0], [4, 1, 0]))
+        # deadly floor and goals which can't be stood on
+        blocks = self.flat()
+        blocks[0, 0, 3] = lava
+        planner = PathPlanner(blocks, [10, 20, 30], self.passable, self.deadly)
+        self.assertIsNone(planner.plan([10, 21, 30], [15, 21, 30]))
+        self.assertIsNone(planner.plan([10, 21, 30], [11, 23, 30]))
+        self.assertIsNone(planner.plan([10, 21, 30], [100, 21, 30]))
+
+    def test_optimal(self):
+        rng = random.Random(0)
+        for seed in range(3):
+            world = make_world(seed, 24)
+            planner = PathPlanner(world, [0, 0, 0], self.passable, self.deadly)
+            for _ in range(15):
+                start, goal = random_stand(rng, planner, 24), random_stand(rng, planner, 24)
+                path = planner.plan(start, goal)
+                expected = dijkstra(world, self.passable, self.deadly, start, goal, planner.max_fall)
+                if expected is None:
+                    self.assertIsNone(path)
+                    continue
+                self.assertEqual((path[0], path[-1]), (start, goal))
+                self.assertAlmostEqual(cost(world, self.passable, self.deadly, path, planner.max_fall), expected)
+
+    def test_cache_and_update(self):
+        stone = self.ids['stone']
+        blocks = self.flat((6, 5, 10))
+        planner = PathPlanner(blocks, [0, 0, 0], self.passable, self.deadly)
+        path = planner.plan([0, 1, 2], [9, 1, 2])
+        self.assertEqual(len(path), 10)
+        self.assertEqual(planner.plan([0, 1, 2], [9, 1, 2]), path)
+        self.assertEqual(planner.plan(path[4], [9, 1, 2]), path[4:])
+        self.assertEqual((planner.searches, planner.hits), (1, 2))
+        # a wall across the way with a gap at z = 4
+        planner.update(numpy.full((2, 4, 1), stone, dtype=numpy.int16), [5, 1, 0])
+        self.assertFalse(planner.paths)
+        detour = planner.plan([0, 1, 2], [9, 1, 2])
+        self.assertIn((5, 1, 4), detour)
+        self.assertEqual(planner.searches, 2)
+        # changes far from the path keep it
+        planner.update(numpy.full((1, 1, 1), stone, dtype=numpy.int16), [1, 1, 0])
+        self.assertEqual(planner.plan([0, 1, 2], [9, 1, 2]), detour)
+        self.assertEqual(planner.searches, 2)
+        self.assertTrue((planner.stand_array == PathPlanner(planner.blocks, [0, 0, 0], self.passable,
+                                                            self.deadly).stand_array).all())
+
+    def test_new_block(self):
+        blocks = self.flat((6, 5, 10))
+        # tables of different lengths, built before the wall block is known
+        passable = self.passable[:len(block_vocabulary)]
+        planner = PathPlanner(blocks, [0, 0, 0], passable, self.deadly)
+        self.assertEqual(len(planner.plan([0, 1, 2], [9, 1, 2])), 10)
+        wall = block_vocabulary.id('gravel')
+        self.assertFalse(self.passable[wall])
+        planner.update(numpy.full((2, 5, 1), wall, dtype=numpy.int16), [5, 1, 0])
+        self.assertIsNone(planner.plan([0, 1, 2], [9, 1, 2]))
+        # and it can be stood on
+        self.assertTrue(planner.canStand([5, 3, 2]))
+
+    def test_voxel_map(self):
+        vmap = VoxelMap(size=4)
+        blocks = self.flat((4, 3, 9))
+        vmap.fuse(blocks, [-2, 60, 5], 0.0)
+        planner = PathPlanner.fromVoxelMap(vmap, [-3, 59, 4], [8, 66, 9], self.passable, self.deadly)
+        # unknown cells around can't be stood on
+        self.assertEqual(len(planner.plan([-2, 61, 6], [6, 61, 6])), 9)
+        self.assertIsNone(planner.plan([-2, 61, 6], [7, 61, 6]))
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
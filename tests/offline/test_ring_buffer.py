@@ -0,0 +1,81 @@
+import time
+import unittest
+from tagilmo import VereyaPython as VP
+from tagilmo.VereyaPython.ring_buffer import RingBuffer
+from tagilmo.VereyaPython.world_state_policy import VideoPolicy, ObservationsPolicy
+from fake_vereya import FakeVereya
+from common import init_mission
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_count(self):
+        buffer = RingBuffer(len, max_count=3)
+        for i in range(5):
+            buffer.append(str(i))
+        self.assertEqual(list(buffer), ['2', '3', '4'])
+        stats = buffer.getStats()
+        self.assertEqual((stats.count, stats.size, stats.appended, stats.dropped), (3, 3, 5, 2))
+        self.assertEqual(buffer.drain(), ['2', '3', '4'])
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.getStats().size, 0)
+
+    def test_bytes(self):
+        buffer = RingBuffer(len, max_bytes=10)
+        buffer.append('aaaa')
+        buffer.append('bbbb')
+        buffer.append('cccc')
+        self.assertEqual(list(buffer), ['bbbb', 'cccc'])
+        # the newest one is kept
+        buffer.append('d' * 20)
+        self.assertEqual(list(buffer), ['d' * 20])
+        self.assertEqual(buffer.getStats().dropped, 3)
+
+    def test_set_capacity(self):
+        buffer = RingBuffer(len)
+        for i in range(10):
+            buffer.append(str(i))
+        buffer.setCapacity(max_count=4)
+        self.assertEqual(list(buffer), ['6', '7', '8', '9'])
+
+
+class TestBufferPolicies(unittest.TestCase):
+
+    def setUp(self):
+        self.vereya = FakeVereya(port=0, obs_rate=100, video_rate=100).start()
+        self.mc, self.rob = init_mission(self.vereya, video=(64, 32))
+        self.agent_host = self.mc.agent_hosts[0]
+        self.agent_host.setVideoPolicy(VideoPolicy.KEEP_RECENT_FRAMES)
+        self.agent_host.setObservationsPolicy(ObservationsPolicy.KEEP_RECENT_OBSERVATIONS)
+        self.agent_host.setFrameBufferCapacity(max_count=5, frametype=VP.FrameType.VIDEO)
+        self.agent_host.setObservationBufferCapacity(max_bytes=10 ** 6)
+
+    def tearDown(self):
+        self.mc.stop()
+        self.vereya.stop()
+
+    def test_drain(self):
+        self.assertTrue(self.mc.safeStart())
+        time.sleep(0.5)
+        frames = self.agent_host.drainFrames()
+        self.assertEqual(len(frames), 5)
+        self.assertEqual(frames, sorted(frames, key=lambda f: f.timestamp))
+        stats = self.agent_host.getBufferStats()
+        self.assertGreater(stats['video'].dropped, 0)
+        self.assertEqual(stats['video'].count, 0)
+        observations = self.agent_host.drainObservations()
+        self.assertGreater(len(observations), 10)
+        self.assertEqual(stats['obs'].dropped, 0)
+        # world state has only the latest ones
+        world_state = self.agent_host.peekWorldState()
+        self.assertEqual(len(world_state.video_frames), 1)
+        self.assertEqual(len(world_state.observations), 1)
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import json
+import time
+import threading
+import unittest
+from types import SimpleNamespace
+
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.vereya_wrapper import RobustObserver
+from common import init_mission
+from fake_vereya import make_observation
+
+
+class RecordingObserver(RobustObserver):
+
+    def __init__(self, mc, agentId=0):
+        super().__init__(mc, agentId)
+        self.changes = []
+
+    def changed(self, name):
+        self.changes.append(name)
+
+
+def observe(rob, data):
+    rob.onObservationChanged(VP.TimestampedString(time.time(), json.dumps(data)))
+
+
+class TestRobustObserver(unittest.TestCase):
+
+    def setUp(self):
+        vereya = SimpleNamespace(host='127.0.0.1', port=0)
+        self.mc, self.rob = init_mission(vereya, observer=RecordingObserver)
+
+    def tearDown(self):
+        self.mc.stop()
+
+    def test_changed_getters(self):
+        data = make_observation(0, 125)
+        observe(self.rob, data)
+        self.assertIn('getAgentPos', self.rob.changes)
+        self.assertIn('getNearGrid', self.rob.changes)
+        self.assertEqual(self.rob.getCachedObserve('getNearEntities')[1]['name'], 'pig')
+        # only the position changed
+        self.rob.changes.clear()
+        t = self.rob.cached['getNearGrid'][1]
+        data['XPos'] += 1
+        observe(self.rob, data)
+        self.assertEqual(self.rob.changes, ['getAgentPos'])
+        self.assertEqual(self.rob.getCachedObserve('getAgentPos')[0], data['XPos'])
+        # unchanged results are still fresh
+        self.assertGreaterEqual(self.rob.cached['getNearGrid'][1], t)
+        # entities are compared with raw observation, not with lowercased names
+        self.rob.changes.clear()
+        data['XPos'] += 1
+        data['ents_near'][1]['x'] += 1
+        observe(self.rob, data)
+        self.assertEqual(sorted(self.rob.changes),
+                         ['getAgentPos', 'getNearEntities', 'getNearPickableEntities'])
+
+    def test_events(self):
+        data = make_observation(0, 125)
+        data['Chat'] = ['hello']
+        observe(self.rob, data)
+        self.rob.observeProcCached()
+        # the event is cached once, polling doesn't repeat it
+        chat = self.rob.getCachedObserve('getChat')
+        self.assertEqual([v for (v, t) in chat], [None, ['hello']])
+        self.rob.changes.clear()
+        del data['Chat']
+        data['XPos'] += 1
+        observe(self.rob, data)
+        self.assertNotIn('getChat', self.rob.changes)
+
+    def test_missing_key(self):
+        data = make_observation(0, 125)
+        observe(self.rob, data)
+        del data['Life']
+        data['XPos'] += 1
+        self.rob.changes.clear()
+        observe(self.rob, data)
+        # kept until outdated
+        self.assertEqual(self.rob.getCachedObserve('getLife'), 20.0)
+        self.assertNotIn('getLife', self.rob.changes)
+        self.rob.cached['getLife'] = (20.0, time.time() - 2 * self.rob.max_dt)
+        self.rob.observeProcCached()
+        self.assertIsNone(self.rob.getCachedObserve('getLife'))
+        self.assertIn('getLife', self.rob.changes)
+
+    def observe_later(self, data, delay):
+        timer = threading.Timer(delay, observe, (self.rob, data))
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def test_wait_update(self):
+        data = make_observation(0, 125)
+        observe(self.rob, data)
+        version = self.rob.getCacheVersion('getInventory')
+        self.observe_later(make_observation(1, 125), 0.2)
+        t0 = time.time()
+        inventory = self.rob.waitNotNoneObserve('getInventory', True)
+        self.assertAlmostEqual(time.time() - t0, 0.2, delta=0.1)
+        self.assertEqual(inventory, data['inventory'])
+        self.assertGreater(self.rob.getCacheVersion('getInventory'), version)
+
+    def test_wait_timeout(self):
+        self.rob.max_dt = 0.2
+        t0 = time.time()
+        self.assertIsNone(self.rob.waitNotNoneObserve('getNearGrid'))
+        self.assertAlmostEqual(time.time() - t0, 0.2, delta=0.1)
+        version = self.rob.getCacheVersion('getLife')
+        self.assertEqual(self.rob.waitCacheUpdate('getLife', version, 0.01), version)
+
+    def test_update_all(self):
+        self.observe_later(make_observation(0, 125), 0.2)
+        t0 = time.time()
+        self.rob.updateAllObservations()
+        self.assertAlmostEqual(time.time() - t0, 0.2, delta=0.1)
+        self.assertIsNotNone(self.rob.getCachedObserve('getAgentPos'))
+
+    def test_history(self):
+        t0 = time.time()
+        for i in range(5):
+            data = make_observation(0, 125)
+            data['XPos'] = float(i)
+            self.rob.onObservationChanged(VP.TimestampedString(t0 + i * 0.1, json.dumps(data)))
+        self.assertAlmostEqual(self.rob.getPoseAt(t0 + 0.25)[0], 2.5)
+        self.assertAlmostEqual(self.rob.getVelocity()[0], 10.0, places=3)
+        self.assertEqual(len(self.rob.history['life']), 5)
+        self.rob.clear()
+        self.assertIsNone(self.rob.getPoseAt(t0))
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+import numpy
+
+from tagilmo import VereyaPython as VP
+from tagilmo.VereyaPython.timestamped_unsigned_char_vector import TimestampedUnsignedCharVector
+from tagilmo.VereyaPython.timestamped_video_frame import TimestampedVideoFrame
+from tagilmo.utils.segments import segment_mapping, segmentation_decoder, SegmentationDecoder
+from fake_vereya import video_message, IDENTITY
+from common import init_mission
+from reference import random_colour_map, decode_dict
+
+
+def make_frame(pixels):
+    height, width, channels = pixels.shape
+    header = {'x': 0, 'y': 0, 'z': 0, 'yaw': 0, 'pitch': 0,
+              'img_width': width, 'img_height': height, 'img_ch': channels,
+              'modelViewMatrix': IDENTITY, 'projectionMatrix': IDENTITY}
+    # frames are sent bottom row first
+    message = TimestampedUnsignedCharVector(timestamp=time.time(),
+                                            data=video_message(header, pixels[::-1].tobytes()))
+    return TimestampedVideoFrame(message)
+
+
+class TestSegmentation(unittest.TestCase):
+
+    def test_decode(self):
+        rng = numpy.random.default_rng(1)
+        pixels = random_colour_map(rng, 64, 48)
+        labels = segmentation_decoder.decode(pixels)
+        self.assertEqual(labels.shape, (48, 64))
+        numpy.testing.assert_array_equal(labels, decode_dict(pixels))
+        # alpha is ignored
+        rgba = numpy.concatenate([pixels, numpy.full((48, 64, 1), 255, dtype=numpy.uint8)], axis=2)
+        numpy.testing.assert_array_equal(segmentation_decoder.decode(rgba), labels)
+
+    def test_names(self):
+        decoder = SegmentationDecoder({(1, 2, 3): 'a', (4, 5, 6): 'b', (7, 8, 9): 'a'})
+        self.assertEqual(decoder.names, ['unknown', 'a', 'b'])
+        pixels = numpy.array([[[1, 2, 3], [4, 5, 6], [7, 8, 9], [3, 2, 1]]], dtype=numpy.uint8)
+        self.assertEqual(decoder.decode(pixels).tolist(), [[1, 2, 1, 0]])
+        colour, name = next(iter(segment_mapping.items()))
+        self.assertEqual(segmentation_decoder.names[segmentation_decoder.decode(
+            numpy.array([[colour]], dtype=numpy.uint8))[0, 0]], name)
+
+    def test_stats(self):
+        rng = numpy.random.default_rng(2)
+        labels = segmentation_decoder.decode(random_colour_map(rng, 40, 30, unknown=5))
+        stats = segmentation_decoder.stats(labels)
+        n = len(segmentation_decoder.names)
+        self.assertEqual(stats.counts.shape, (n,))
+        self.assertEqual(stats.boxes.shape, (n, 4))
+        for label in range(n):
+            y, x = numpy.nonzero(labels == label)
+            self.assertEqual(stats.counts[label], len(x))
+            if len(x):
+                self.assertEqual(stats.boxes[label].tolist(), [x.min(), y.min(), x.max(), y.max()])
+            else:
+                self.assertEqual(stats.boxes[label].tolist(), [-1, -1, -1, -1])
+
+    def test_connector(self):
+        vereya = SimpleNamespace(host='127.0.0.1', port=0)
+        mc, rob = init_mission(vereya)
+        try:
+            self.assertIsNone(mc.getSegmentationLabels(0))
+            pixels = random_colour_map(numpy.random.default_rng(3), 32, 16)
+            mc.updateSegmentation(make_frame(pixels), 0)
+            labels = mc.getSegmentationLabels(0)
+            numpy.testing.assert_array_equal(labels, decode_dict(pixels))
+            self.assertFalse(labels.flags['WRITEABLE'])
+            self.assertIs(mc.getSegmentationLabels(0), labels)
+            mc.updateSegmentation(make_frame(pixels), 0)
+            self.assertIsNot(mc.getSegmentationLabels(0), labels)
+        finally:
+            mc.stop()
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
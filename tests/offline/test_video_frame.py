@@ -0,0 +1,78 @@
+import time
+import pickle
+import unittest
+import numpy
+from tagilmo import VereyaPython
+from tagilmo.VereyaPython.timestamped_unsigned_char_vector import TimestampedUnsignedCharVector
+from tagilmo.VereyaPython.timestamped_video_frame import TimestampedVideoFrame
+from fake_vereya import video_message, IDENTITY
+
+
+def make_frame(width, height, channels):
+    header = {'x': 1.5, 'y': 2, 'z': 3, 'yaw': 90, 'pitch': 10,
+              'img_width': width, 'img_height': height, 'img_ch': channels,
+              'modelViewMatrix': IDENTITY, 'projectionMatrix': list(range(16))}
+    # each row filled with its index, each channel with its number
+    pixels = numpy.zeros((height, width, channels), dtype=numpy.uint8)
+    pixels += numpy.arange(height, dtype=numpy.uint8)[:, None, None] * 10
+    pixels += numpy.arange(channels, dtype=numpy.uint8)
+    message = TimestampedUnsignedCharVector(timestamp=time.time(),
+                                            data=video_message(header, pixels.tobytes()))
+    return TimestampedVideoFrame(message)
+
+
+class TestVideoFrame(unittest.TestCase):
+
+    def test_lazy_header(self):
+        frame = make_frame(6, 4, 3)
+        self.assertTrue(frame._header)
+        self.assertEqual(frame.iWidth, 6)
+        self.assertFalse(frame._header)
+        self.assertEqual((frame.xPos, frame.yPos, frame.zPos), (1.5, 2, 3))
+        self.assertEqual((frame.yaw, frame.pitch, frame.iHeight, frame.iCh), (90, 10, 4, 3))
+        self.assertEqual(frame.calibrationMatrix[1, 0], 4)
+        self.assertEqual(frame.modelViewMatrix.dtype, numpy.float32)
+
+    def test_pixels(self):
+        frame = make_frame(6, 4, 4)
+        pixels = frame.pixels
+        self.assertIs(frame.pixels, pixels)
+        self.assertEqual(pixels.shape, (4, 6, 3))
+        self.assertTrue(pixels.flags['C_CONTIGUOUS'])
+        self.assertFalse(pixels.flags['WRITEABLE'])
+        # bottom row comes first
+        self.assertEqual(list(pixels[:, 0, 0]), [30, 20, 10, 0])
+        self.assertEqual(list(pixels[0, 0]), [30, 31, 32])
+
+    def test_layouts(self):
+        frame = make_frame(6, 4, 4)
+        raw = frame.rawPixels
+        self.assertEqual(raw.shape, (4, 6, 4))
+        self.assertEqual(list(raw[:, 0, 3]), [3, 13, 23, 33])
+        view = frame.pixelsView
+        self.assertLess(view.strides[0], 0)
+        numpy.testing.assert_array_equal(view, frame.pixels)
+        copy = frame.copyPixels()
+        self.assertTrue(copy.flags['C_CONTIGUOUS'] and copy.flags['WRITEABLE'])
+        copy[:] = 0
+        self.assertEqual(frame.pixels[0, 0, 0], 30)
+
+    def test_pickle(self):
+        frame = make_frame(6, 4, 3)
+        # as if the pixels were a view over a pooled receive buffer
+        frame._pixels = memoryview(bytearray(frame._pixels))
+        frame._release = lambda pixels: True
+        copy = pickle.loads(pickle.dumps(frame))
+        self.assertIsInstance(copy._pixels, bytes)
+        self.assertIsNone(copy._release)
+        numpy.testing.assert_array_equal(copy.pixels, frame.pixels)
+        self.assertEqual((copy.iWidth, copy.xPos), (6, 1.5))
+
+
+def main():
+    VereyaPython.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
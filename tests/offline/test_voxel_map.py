@@ -0,0 +1,129 @@
+import json
+import math
+import os
+import random
+import tempfile
+import unittest
+
+import numpy
+from numpy.lib.format import open_memmap
+
+from tagilmo import VereyaPython as VP
+from tagilmo.utils.block_vocabulary import block_vocabulary
+from tagilmo.utils.voxel_map import VoxelMap, UNKNOWN
+from reference import make_observer, random_observation, observe, random_grid
+
+
+class TestVoxelMap(unittest.TestCase):
+
+    def test_fuse_region(self):
+        rng = random.Random(0)
+        vmap = VoxelMap(size=4)
+        grid = random_grid(rng, (3, 5, 7))
+        # crosses chunk borders at negative coordinates
+        vmap.fuse(grid, [-5, -2, 2], 1.0)
+        blocks, seen = vmap.region([-6, -3, 1], [2, 1, 7])
+        self.assertTrue((blocks[1:4, 1:6, 1:8] == grid).all())
+        self.assertTrue((seen[1:4, 1:6, 1:8] == 1.0).all())
+        self.assertEqual(int((blocks != UNKNOWN).sum()), grid.size)
+        self.assertEqual(int((seen > 0).sum()), grid.size)
+        self.assertEqual(vmap.blockAt([-3.5, -0.2, 3.9]), block_vocabulary.name(grid[1, 1, 1]))
+        self.assertIsNone(vmap.blockAt([100, 0, 0]))
+        # newer observation overwrites a part
+        vmap.fuse(grid[:1, :1, :1], [-5, -2, 2], 2.0)
+        _, seen = vmap.region([-5, -2, 2], [-4, -2, 2])
+        self.assertEqual(seen.tolist(), [[[2.0, 1.0]]])
+
+    def test_nearest(self):
+        rng = random.Random(1)
+        vmap = VoxelMap(size=8)
+        cells = dict()
+        for _ in range(20):
+            lo = [rng.randint(-40, 40), rng.randint(-10, 10), rng.randint(-40, 40)]
+            grid = random_grid(rng, (2, 3, 4))
+            vmap.fuse(grid, lo, 0.0)
+            for (y, z, x), b in numpy.ndenumerate(grid):
+                cells[(lo[0] + x, lo[1] + y, lo[2] + z)] = block_vocabulary.name(b)
+        for _ in range(30):
+            pos = [rng.uniform(-50, 50), rng.uniform(-12, 12), rng.uniform(-50, 50)]
+            for names in (['lava'], ['cactus', 'water'], ['diamond_ore']):
+                found = [c for c, b in cells.items() if b in names]
+                result = vmap.nearest(names, pos)
+                if not found:
+                    self.assertIsNone(result)
+                    continue
+                dist = lambda c: math.dist([v + 0.5 for v in c], pos)
+                self.assertAlmostEqual(dist(result), min(map(dist, found)))
+                self.assertIsNone(vmap.nearest(names, pos, maxDist=dist(result) - 0.01))
+
+    def test_on_disk(self):
+        rng = random.Random(2)
+        with tempfile.TemporaryDirectory() as path:
+            vmap = VoxelMap(size=4, path=path, max_loaded=2)
+            grids = [(random_grid(rng, (3, 3, 3)), [4 * i, 0, -4 * i]) for i in range(6)]
+            for i, (grid, lo) in enumerate(grids):
+                vmap.fuse(grid, lo, float(i))
+            self.assertEqual(len(vmap.chunks), 2)
+            self.assertEqual(len(vmap), 6)
+            vmap.flush()
+            # ids of another process: one more name before the stored ones
+            with open(os.path.join(path, 'blocks.json')) as f:
+                names = json.load(f)
+            with open(os.path.join(path, 'blocks.json'), 'w') as f:
+                json.dump(['voxel_map_test_block'] + names, f)
+            for fname in os.listdir(path):
+                if fname.endswith('.blocks.npy'):
+                    blocks = open_memmap(os.path.join(path, fname), mode='r+')
+                    blocks[blocks != UNKNOWN] += 1
+                    blocks.flush()
+                    del blocks
+            del vmap
+            vmap = VoxelMap(size=4, path=path, max_loaded=2)
+            for i, (grid, lo) in enumerate(grids):
+                blocks, seen = vmap.region(lo, [c + 2 for c in lo])
+                self.assertTrue((blocks == grid).all())
+                self.assertTrue((seen == float(i)).all())
+
+    def test_reopen_without_flush(self):
+        rng = random.Random(4)
+        with tempfile.TemporaryDirectory() as path:
+            vmap = VoxelMap(size=4, path=path, max_loaded=1)
+            grid = random_grid(rng, (3, 3, 3))
+            # a block name the stored vocabulary doesn't have yet
+            grid[1, 1, 1] = block_vocabulary.id('voxel_map_unsaved_block')
+            vmap.fuse(grid, [2, 0, 2], 1.0)
+            # the process exits without flush()
+            del vmap
+            with open(os.path.join(path, 'blocks.json')) as f:
+                names = json.load(f)
+            self.assertEqual(names[int(grid[1, 1, 1])], 'voxel_map_unsaved_block')
+            with VoxelMap(size=4, path=path, max_loaded=1) as vmap:
+                blocks, _ = vmap.region([2, 0, 2], [4, 2, 4])
+                self.assertTrue((blocks == grid).all())
+                self.assertEqual(vmap.blockAt([3, 1, 3]), 'voxel_map_unsaved_block')
+            self.assertEqual(len(vmap.chunks), 0)
+
+    def test_observer(self):
+        rng = random.Random(3)
+        radius = [5, 2, 5]
+        mc, rob = make_observer(radius)
+        try:
+            vmap = rob.enableVoxelMap()
+            for step in range(20):
+                pos = [rng.uniform(-3, 3) + step, 64.0 + rng.uniform(-1, 1), rng.uniform(-3, 3), 0.0, 0.0]
+                observe(rob, random_observation(rng, radius, pos))
+                center = [math.floor(p) for p in pos[:3]]
+                blocks, _ = vmap.region([c - r for c, r in zip(center, radius)],
+                                        [c + r for c, r in zip(center, radius)])
+                self.assertTrue((blocks == rob.getNearGridArray(False)).all())
+        finally:
+            mc.stop()
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
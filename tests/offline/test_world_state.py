@@ -0,0 +1,51 @@
+import time
+import dataclasses
+import unittest
+from tagilmo import VereyaPython as VP
+from reference import make_frame
+
+
+class TestWorldState(unittest.TestCase):
+
+    def setUp(self):
+        self.agent_host = VP.AgentHost()
+        world_state = self.agent_host.world_state
+        world_state.has_mission_begun = world_state.is_mission_running = True
+        world_state.video_frames.append(make_frame(8, 4))
+        world_state.observations.append(VP.TimestampedString(time.time(), '{}'))
+        world_state.number_of_observations_since_last_state = 1
+
+    def tearDown(self):
+        self.agent_host.stop()
+
+    def test_peek(self):
+        frame = self.agent_host.world_state.video_frames[0]
+        snapshot = self.agent_host.peekWorldState()
+        self.assertIs(snapshot.video_frames[0], frame)
+        self.assertEqual(len(snapshot.observations), 1)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            snapshot.is_mission_running = False
+        # later messages don't change the snapshot
+        self.agent_host.world_state.observations.append(VP.TimestampedString(time.time(), '{}'))
+        self.assertEqual(len(snapshot.observations), 1)
+        self.assertEqual(len(self.agent_host.peekWorldState().observations), 2)
+
+    def test_get(self):
+        frame = self.agent_host.world_state.video_frames[0]
+        world_state = self.agent_host.getWorldState()
+        self.assertIs(world_state.video_frames[0], frame)
+        self.assertEqual(world_state.number_of_observations_since_last_state, 1)
+        current = self.agent_host.peekWorldState()
+        self.assertTrue(current.is_mission_running and current.has_mission_begun)
+        self.assertEqual(current.video_frames, ())
+        self.assertEqual(current.number_of_observations_since_last_state, 0)
+        self.assertIsNot(self.agent_host.world_state, world_state)
+
+
+def main():
+    VP.setupLogger()
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()